@@ -41,7 +41,7 @@ class Nab8Balld(NabService):
                 '"events":["asr/nab8balld","rfid/nab8balld"],'
                 '"request_id":"idle-disabled"}\r\n'
             )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
 
     async def perform(self, lang):
         if lang is None or lang == "default":
@@ -54,7 +54,7 @@ class Nab8Balld(NabService):
             f'"body":[{{"audio":["{path}"]}}],'
             f'"request_id":"play-answer"}}\r\n'
         )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     async def process_nabd_packet(self, packet: NabdPacket):
@@ -86,7 +86,7 @@ class Nab8Balld(NabService):
             '"events":["button"],'
             '"request_id":"set-interactive"}\r\n'
         )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     async def entered_interactive(self):
@@ -99,7 +99,7 @@ class Nab8Balld(NabService):
             "}],"
             '"request_id":"play-listen"}\r\n'
         )
-        self.writer.write(resp.encode("utf8"))
+        self.write_packet(resp)
         await self.writer.drain()
 
     async def exit_interactive(self):
@@ -108,7 +108,7 @@ class Nab8Balld(NabService):
             '"sequence":[{"audio":["nab8balld/acquired.mp3"]}],'
             '"request_id":"play-acquired"}\r\n'
         )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.perform(None)
         self._interactive = False
         await self.setup_listener()
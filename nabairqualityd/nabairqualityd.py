@@ -144,7 +144,7 @@ class NabAirqualityd(NabInfoCachedService):
                 '"body":[{"audio":["nabairqualityd/no-data-error.mp3"]}],'
                 '"expiration":"' + expiration.isoformat() + '"}\r\n'
             )
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
             await self.writer.drain()
         elif type == "today":
             message = NabAirqualityd.MESSAGES[info_data["data"]]
@@ -154,7 +154,7 @@ class NabAirqualityd(NabInfoCachedService):
                 '"body":[{"audio":["nabairqualityd/' + message + '.mp3"]}],'
                 '"expiration":"' + expiration.isoformat() + '"}\r\n'
             )
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
             await self.writer.drain()
 
     async def process_nabd_packet(self, packet):
@@ -59,7 +59,7 @@ class NabBookd(NabService):
                 f'"choreography":"nabbookd/{outro}.chor"}}],'
                 f'"request_id":"outro"}}\r\n'
             )
-        self.writer.write(packet.encode())
+        self.write_packet(packet)
         await self.writer.drain()
 
     async def exit_interactive(self, abort_sound):
@@ -68,17 +68,17 @@ class NabBookd(NabService):
                 '{"type":"command","sequence":['
                 '{"audio":"nabd/abort.wav"}]}\r\n'
             )
-            self.writer.write(packet.encode())
+            self.write_packet(packet)
             await self.writer.drain()
         packet = (
             '{"type":"mode","mode":"idle",' '"events":["rfid/nabbookd"]}\r\n'
         )
-        self.writer.write(packet.encode())
+        self.write_packet(packet)
         await self.writer.drain()
 
     async def cancel_command(self, request_id):
         packet = f'{{"type":"cancel","request_id":"{request_id}"}}\r\n'
-        self.writer.write(packet.encode())
+        self.write_packet(packet)
         await self.writer.drain()
 
     async def process_nabd_packet(self, packet: NabdPacket):
@@ -106,7 +106,7 @@ class NabBookd(NabService):
                 '"events":["button","ears"],'
                 '"request_id":"mode"}\r\n'
             )
-            self.writer.write(packet.encode())
+            self.write_packet(packet)
             await self.writer.drain()
         elif type == "response":
             # Ignore responses, as we can transition to idle state with several
@@ -138,7 +138,7 @@ class NabBookd(NabService):
                 '"choreography":"nabbookd/intro.chor"}],'
                 '"request_id":"intro"}\r\n'
             )
-            self.writer.write(command_packet.encode())
+            self.write_packet(command_packet)
             await self.writer.drain()
         elif packet["type"] == "button_event" and packet["event"] == "click":
             self.__state_handler = self.process_nabd_packet_idle
@@ -185,7 +185,7 @@ class NabBookd(NabService):
                 '"choreography":"nabbookd/interrupt.chor"}],'
                 '"request_id":"outro"}\r\n'
             )
-            self.writer.write(command_packet.encode())
+            self.write_packet(command_packet)
             await self.writer.drain()
         elif packet["type"] == "button_event":
             pass
@@ -208,7 +208,7 @@ class NabBookd(NabService):
                 '{"audio":"nabbookd/previous.mp3"}],'
                 '"request_id":"feedback"}\r\n'
             )
-            self.writer.write(command_packet.encode())
+            self.write_packet(command_packet)
             await self.writer.drain()
         elif (
             packet["type"] == "response"
@@ -235,7 +235,7 @@ class NabBookd(NabService):
                 '{"audio":"nabbookd/next.mp3"}],'
                 '"request_id":"feedback"}\r\n'
             )
-            self.writer.write(command_packet.encode())
+            self.write_packet(command_packet)
             await self.writer.drain()
         elif (
             packet["type"] == "response"
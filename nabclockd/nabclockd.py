@@ -79,7 +79,7 @@ class NabClockd(nabservice.NabService):
             '"body":[{"audio":["nabclockd/' + str(hour) + '/*.mp3"]}],'
             '"expiration":"' + expiration.isoformat() + '"}\r\n'
         )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     def clock_response(self, now: datetime.datetime) -> List[str]:
@@ -202,12 +202,10 @@ class NabClockd(nabservice.NabService):
                                             '"choreography":null}],'
                                             '"request_id":"sleep_sound"}\r\n'
                                         )
-                                        self.writer.write(
-                                            packet.encode("utf8")
-                                        )
+                                        self.write_packet(packet)
                                         await self.writer.drain()
 
-                                self.writer.write(b'{"type":"sleep"}\r\n')
+                                self.write_packet(b'{"type":"sleep"}\r\n')
                                 await self.writer.drain()
                                 self.asleep = None
 
@@ -224,10 +222,10 @@ class NabClockd(nabservice.NabService):
                                         '"choreography":null}],'
                                         '"request_id":"wakeup_sound"}\r\n'
                                     )
-                                    self.writer.write(packet.encode("utf8"))
+                                    self.write_packet(packet)
                                     await self.writer.drain()
 
-                                self.writer.write(b'{"type":"wakeup"}\r\n')
+                                self.write_packet(b'{"type":"wakeup"}\r\n')
                                 await self.writer.drain()
                                 self.asleep = None
                             elif r == "chime":
@@ -0,0 +1,195 @@
+"""
+Codecs for packets exchanged between nabd and services.
+
+By default, each packet is a JSON object on a CRLF-terminated line. orjson
+is used if it is installed, as it is much faster than the standard library.
+It is optional as wheels are not available on every platform.
+
+A connection can switch to length-prefixed MessagePack frames with a hello
+packet: each packet is then preceded by its length as a 32 bits big-endian
+unsigned integer.
+"""
+
+import asyncio
+import json
+import struct
+from typing import Any, Dict, Union
+
+try:
+    import orjson  # type: ignore
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack  # type: ignore
+except ImportError:
+    msgpack = None
+
+NAME = "orjson" if orjson is not None else "json"
+
+
+class DecodeError(ValueError):
+    """
+    Raised when a packet cannot be decoded.
+    """
+
+
+class BufferedReader:
+    """
+    Reader of a stream keeping data received but not read yet in a buffer
+    of its own, so that it can be handed off with the connection.
+    Data is moved from the stream to the buffer only while reading.
+    """
+
+    # Maximum length of a line, as with StreamReader
+    LIMIT = 2**16
+    # Read all data buffered by the stream at once
+    CHUNK_SIZE = 2**20
+
+    def __init__(self, reader: asyncio.StreamReader, data: bytes = b""):
+        self.reader = reader
+        self.buffer = bytearray(data)
+
+    def at_eof(self) -> bool:
+        return not self.buffer and self.reader.at_eof()
+
+    def unread(self) -> bytes:
+        """
+        Return data received but not read yet.
+        """
+        return bytes(self.buffer)
+
+    async def readline(self) -> bytes:
+        """
+        Read a line, or data received before end of stream.
+        Raise ValueError if the line is longer than LIMIT.
+        """
+        start = 0
+        while True:
+            end = self.buffer.find(b"\n", start)
+            if end >= 0:
+                return self._take(end + 1)
+            if len(self.buffer) > BufferedReader.LIMIT:
+                raise ValueError("Line is too long")
+            start = len(self.buffer)
+            if not await self._fill():
+                return self._take(len(self.buffer))
+
+    async def readexactly(self, n: int) -> bytes:
+        while len(self.buffer) < n:
+            if not await self._fill():
+                raise asyncio.IncompleteReadError(
+                    self._take(len(self.buffer)), n
+                )
+        return self._take(n)
+
+    async def _fill(self) -> bool:
+        data = await self.reader.read(BufferedReader.CHUNK_SIZE)
+        self.buffer.extend(data)
+        return data != b""
+
+    def _take(self, size: int) -> bytes:
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+Reader = Union[asyncio.StreamReader, BufferedReader]
+
+
+class Framing:
+    """
+    How packets are delimited and encoded on a connection.
+    """
+
+    NAME = ""
+    # Class of the error reported to services sending invalid packets
+    ERROR_CLASS = "DecodeError"
+
+    def encode(self, packet: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+    async def read(self, reader: Reader) -> bytes:
+        """
+        Read next packet data, or return b"" at end of stream.
+        """
+        raise NotImplementedError
+
+
+class JSONLines(Framing):
+    NAME = "json"
+    ERROR_CLASS = "JSONDecodeError"
+
+    def encode(self, packet: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(packet) + b"\r\n"
+        return (json.dumps(packet) + "\r\n").encode("utf8")
+
+    def decode(self, data: bytes) -> Any:
+        """
+        Raise DecodeError if data is not valid JSON, or UnicodeDecodeError
+        if it is not valid UTF-8 (orjson reports the latter as a
+        DecodeError).
+        """
+        try:
+            if orjson is not None:
+                return orjson.loads(data)
+            return json.loads(data.decode("utf8"))
+        except json.JSONDecodeError as err:
+            # orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+            raise DecodeError(str(err)) from err
+
+    async def read(self, reader: Reader) -> bytes:
+        return await reader.readline()
+
+
+class MessagePackFrames(Framing):
+    NAME = "msgpack"
+    MAX_FRAME_SIZE = 1024 * 1024
+    HEADER = struct.Struct(">I")
+
+    def encode(self, packet: Any) -> bytes:
+        data = msgpack.packb(packet)
+        return self.HEADER.pack(len(data)) + data
+
+    def decode(self, data: bytes) -> Any:
+        try:
+            return msgpack.unpackb(data)
+        except (ValueError, msgpack.UnpackException) as err:
+            raise DecodeError(str(err)) from err
+
+    async def read(self, reader: Reader) -> bytes:
+        try:
+            header = await reader.readexactly(self.HEADER.size)
+            (size,) = self.HEADER.unpack(header)
+            if size > self.MAX_FRAME_SIZE:
+                # Stream cannot be resynchronized
+                raise ConnectionAbortedError(f"Frame too large ({size})")
+            return await reader.readexactly(size)
+        except asyncio.IncompleteReadError:
+            return b""
+
+
+JSON_LINES = JSONLines()
+
+# Framings that can be negotiated with a hello packet
+FRAMINGS: Dict[str, Framing] = {JSON_LINES.NAME: JSON_LINES}
+if msgpack is not None:
+    FRAMINGS[MessagePackFrames.NAME] = MessagePackFrames()
+
+
+def encode(packet: Any) -> bytes:
+    """
+    Serialize a packet into a CRLF-terminated JSON line.
+    """
+    return JSON_LINES.encode(packet)
+
+
+def decode(line: bytes) -> Any:
+    """
+    Deserialize a packet from a JSON line.
+    """
+    return JSON_LINES.decode(line)
@@ -2,7 +2,6 @@ import asyncio
 import datetime
 import getopt
 import inspect
-import json
 import logging
 import os
 import signal
@@ -16,7 +15,7 @@ from typing import Any, List, Optional, Tuple, cast
 from lockfile import AlreadyLocked, LockFailed  # type: ignore
 from lockfile.pidlockfile import PIDLockFile  # type: ignore
 
-from nabcommon import nablogging, settings
+from nabcommon import codec, nablogging, settings
 
 from .typing import NabdPacket
 
@@ -24,11 +23,19 @@ from .typing import NabdPacket
 class NabService(ABC):
     PORT_NUMBER = int(os.getenv("NABD_PORT_NUMBER", "10543"))
     HOST = os.getenv("NABD_HOST", "127.0.0.1")
+    # Unix socket path, abstract if it starts with @, disabled if empty.
+    SOCKET = os.getenv("NABD_SOCKET", "@nabd")
+    # Framing to negotiate with nabd. Services sending many packets can
+    # use "msgpack": packets are written with write_packet.
+    FRAMING = "json"
 
     def __init__(self):
         settings.configure(type(self).__name__.lower())
         self.reader = None
         self.writer = None
+        self.framing = codec.JSON_LINES
+        # Packets received while negotiating framing
+        self.pending_packets: List[NabdPacket] = []
         self.loop = None
         self.running = True
         signal.signal(signal.SIGUSR1, self.signal_handler)
@@ -58,33 +65,28 @@ class NabService(ABC):
             if hasattr(package, "NABAZTAG_RFID_APPLICATION_ID"):
                 rfid_support = True
             if hasattr(package, "NABAZTAG_EVENTS_SUBSCRIPTION"):
-                events = [
-                    json.dumps(event)
-                    for event in package.NABAZTAG_EVENTS_SUBSCRIPTION
-                ]
+                events = list(package.NABAZTAG_EVENTS_SUBSCRIPTION)
             if events != [] or asr_support or rfid_support:
                 service_name = self.__class__.__name__.lower()
                 if asr_support:
-                    events.append(f'"asr/{service_name}"')
+                    events.append(f"asr/{service_name}")
                 if rfid_support:
-                    events.append(f'"rfid/{service_name}"')
-                events_str = ",".join(events)
-                idle_packet = (
-                    '{"type":"mode","mode":"idle","events":['
-                    + events_str
-                    + "]}\r\n"
+                    events.append(f"rfid/{service_name}")
+                self.write_packet(
+                    {"type": "mode", "mode": "idle", "events": events}
                 )
-                self.writer.write(idle_packet.encode("utf8"))
+            while self.pending_packets:
+                await self.process_nabd_packet(self.pending_packets.pop(0))
             while self.running and not self.reader.at_eof():
-                line = await self.reader.readline()
+                line = await self.framing.read(self.reader)
                 if line != b"" and line != b"\r\n":
                     try:
-                        packet = json.loads(line.decode("utf8"))
+                        packet = self.framing.decode(line)
                         logging.debug(f"process nabd packet: {packet}")
                         await self.process_nabd_packet(
                             cast(NabdPacket, packet)
                         )
-                    except json.decoder.JSONDecodeError as e:
+                    except (codec.DecodeError, UnicodeDecodeError) as e:
                         logging.error(
                             f"Invalid JSON packet from nabd: {line}\n{e}"
                         )
@@ -102,12 +104,89 @@ class NabService(ABC):
     def connect(self):
         self.loop = asyncio.get_event_loop()
         self._do_connect(NabService.MAX_RETRY)
+        if self.FRAMING != self.framing.NAME:
+            self.loop.run_until_complete(self.negotiate_framing())
         self.loop.create_task(self.client_loop())
 
-    def _do_connect(self, retry_count: int) -> None:
-        connection = asyncio.open_connection(
+    def write_packet(self, packet: Any) -> None:
+        """
+        Write a packet to nabd with the negotiated framing.
+        Packet can also be a JSON line, as str or bytes, which is converted
+        if another framing was negotiated.
+        """
+        if isinstance(packet, str):
+            packet = packet.encode("utf8")
+        if isinstance(packet, bytes):
+            if self.framing is codec.JSON_LINES:
+                self.writer.write(packet)
+                return
+            packet = codec.decode(packet)
+        self.writer.write(self.framing.encode(packet))
+
+    async def negotiate_framing(self) -> None:
+        """
+        Switch connection to FRAMING with a hello packet. Packets received
+        in the meantime are kept for client_loop.
+        """
+        if self.FRAMING not in codec.FRAMINGS:
+            logging.warning(f"Framing {self.FRAMING} is not available")
+            return
+        self.write_packet(
+            {"type": "hello", "framing": self.FRAMING, "request_id": "hello"}
+        )
+        while not self.reader.at_eof():
+            line = await self.framing.read(self.reader)
+            if line == b"" or line == b"\r\n":
+                continue
+            packet = self.framing.decode(line)
+            if (
+                packet["type"] == "response"
+                and packet.get("request_id") == "hello"
+            ):
+                if packet["status"] == "ok":
+                    self.framing = codec.FRAMINGS[self.FRAMING]
+                else:
+                    logging.warning(
+                        f"Could not switch to {self.FRAMING} framing: "
+                        f"{packet.get('message')}"
+                    )
+                return
+            self.pending_packets.append(cast(NabdPacket, packet))
+
+    @staticmethod
+    def socket_address(unix_socket: Optional[str] = None) -> str:
+        """
+        Return the address of nabd Unix socket (NabService.SOCKET by
+        default), as expected by asyncio. Names starting with "@" are in the
+        abstract namespace.
+        """
+        if unix_socket is None:
+            unix_socket = NabService.SOCKET
+        if unix_socket.startswith("@"):
+            return "\0" + unix_socket[1:]
+        return unix_socket
+
+    @staticmethod
+    async def open_connection() -> (
+        Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+    ):
+        """
+        Open a connection to nabd, through its Unix socket if available or
+        else through TCP/IP.
+        """
+        if NabService.SOCKET:
+            try:
+                return await asyncio.open_unix_connection(
+                    NabService.socket_address()
+                )
+            except (ConnectionRefusedError, FileNotFoundError):
+                pass
+        return await asyncio.open_connection(
             host=NabService.HOST, port=NabService.PORT_NUMBER
         )
+
+    def _do_connect(self, retry_count: int) -> None:
+        connection = NabService.open_connection()
         try:
             (reader, writer) = self.loop.run_until_complete(connection)
             self.reader = reader
@@ -479,7 +558,7 @@ class NabInfoService(NabRecurrentService, ABC):
             info_packet = (
                 '{"type":"info","info_id":"' + service_name + '"}\r\n'
             )
-        self.writer.write(info_packet.encode("utf8"))
+        self.write_packet(info_packet)
         if type != "info":
             await self.perform_additional(
                 expiration_date, type, info_data, config
@@ -1,7 +1,21 @@
+import asyncio
 import fcntl
+import logging
 import re
 import socket
 import struct
+from enum import Enum
+
+DNS_SERVER_LIST = [
+    "1.1.1.1",  # Cloudflare
+    "208.67.222.222",  # Open DNS
+    "8.8.8.8",  # Google DNS
+    "1.0.0.1",  # Cloudflare
+    "208.67.220.220",  # Open DNS
+    "8.8.4.4",  # Google DNS
+]
+DNS_PORT = 53
+CONNECT_TIMEOUT = 3.0
 
 
 def ip_address(ifname="wlan0"):
@@ -31,22 +45,91 @@ def internet_connection():
     """
     Return True if connected to Internet, False otherwise
     """
-    DNS_SERVER_LIST = [
-        "1.1.1.1",  # Cloudflare
-        "208.67.222.222",  # Open DNS
-        "8.8.8.8",  # Google DNS
-        "1.0.0.1",  # Cloudflare
-        "208.67.220.220",  # Open DNS
-        "8.8.4.4",  # Google DNS
-    ]
-    dns_port = 53
-    timeout = 3.0
     for dns_server in DNS_SERVER_LIST:
         try:
             with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                s.settimeout(timeout)
-                s.connect((dns_server, dns_port))
+                s.settimeout(CONNECT_TIMEOUT)
+                s.connect((dns_server, DNS_PORT))
                 return True
         except OSError:
             pass
     return False
+
+
+async def internet_connection_async():
+    """
+    Return True if connected to Internet, False otherwise
+    Asynchronous version of internet_connection.
+    """
+    for dns_server in DNS_SERVER_LIST:
+        try:
+            connection = asyncio.open_connection(dns_server, DNS_PORT)
+            _, writer = await asyncio.wait_for(connection, CONNECT_TIMEOUT)
+            writer.close()
+            return True
+        except (OSError, asyncio.TimeoutError):
+            pass
+    return False
+
+
+class Connectivity(Enum):
+    UNKNOWN = "unknown"
+    NONE = "none"  # no local network
+    LOCAL = "local"  # local network without Internet access
+    INTERNET = "internet"
+
+
+class ConnectivityMonitor:
+    """
+    Monitor network connectivity in the background, on the asyncio loop.
+    The last known state is cached and can be read without any I/O.
+    The callback, if any, is invoked with the new state on every change.
+    """
+
+    CHECK_INTERVAL = 60.0
+    RETRY_INTERVAL = 10.0
+
+    def __init__(self, ifname, callback=None):
+        self.ifname = ifname
+        self.callback = callback
+        self.state = Connectivity.UNKNOWN
+        self.task = None
+
+    def start(self, loop):
+        """
+        Start monitoring, with a first check right away (e.g. on resume
+        from sleep).
+        """
+        self.task = loop.create_task(self.monitor_loop())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def check(self):
+        if ip_address(self.ifname) is None:
+            new_state = Connectivity.NONE
+        elif await internet_connection_async():
+            new_state = Connectivity.INTERNET
+        else:
+            new_state = Connectivity.LOCAL
+        if new_state != self.state:
+            logging.info(f"network connectivity: {new_state.value}")
+            self.state = new_state
+            if self.callback is not None:
+                self.callback(new_state)
+        return new_state
+
+    async def monitor_loop(self):
+        while True:
+            state = await self.check()
+            if state == Connectivity.INTERNET:
+                interval = ConnectivityMonitor.CHECK_INTERVAL
+            else:
+                interval = ConnectivityMonitor.RETRY_INTERVAL
+            await asyncio.sleep(interval)
@@ -1,7 +1,8 @@
 import datetime
-import sys
 from typing import Any, Dict, List, Union
 
+from typing_extensions import Literal, TypedDict
+
 AnyPacket = Dict[str, Any]
 
 PaletteColor = int
@@ -13,361 +14,478 @@ _Number = Union[int, float]
 
 NLUIntent = Dict[str, Any]
 
-if sys.version_info < (3, 8):
-    StatePacket = Dict[str, str]
-    AnimationItem = Dict[str, Color]
-    Animation = Dict[str, Any]
-    InfoPacket = Dict[str, Any]
-    EarsPacket = Dict[str, Any]
-    ChoreographyURN = str
-    CommandSequenceItem = Dict[str, Any]
-    CommandPacket = Dict[str, Any]
-    MessagePacket = Dict[str, Any]
-    CancelPacket = Dict[str, str]
-    WakeupPacket = Dict[str, str]
-    SleepPacket = Dict[str, str]
-    EventTypes = str
-    ModePacket = Dict[str, Any]
-    TestPacket = Dict[str, str]
-    RfidWritePacket = Dict[str, Any]
-
-    ResponseNFCOKPacketProto = Dict[str, str]
-    ResponseNFCErrorPacketProto = Dict[str, str]
-    ResponseNFCTimeoutPacketProto = Dict[str, str]
-
-    ResponseOKPacketProto = Dict[str, str]
-    ResponseErrorPacketProto = Dict[str, str]
-    ResponseCanceledPacketProto = Dict[str, str]
-    ResponseExpiredPacketProto = Dict[str, str]
-    ResponseFailurePacketProto = Dict[str, str]
-    ResponseGestaltPacketProto = Dict[str, Any]
-
-    ResponseNFCOKPacket = Dict[str, str]
-    ResponseNFCErrorPacket = Dict[str, str]
-    ResponseNFCTimeoutPacket = Dict[str, str]
-
-    ResponseOKPacket = Dict[str, str]
-    ResponseErrorPacket = Dict[str, str]
-    ResponseCanceledPacket = Dict[str, str]
-    ResponseExpiredPacket = Dict[str, str]
-    ResponseFailurePacket = Dict[str, str]
-    ResponseGestaltPacket = Dict[str, Any]
-
-    ServiceRequestPacket = Dict[str, str]
-
-    ServicePacket = Dict[str, Any]
-
-    ButtonEventType = str
-
-    ASREventPacket = Dict[str, Any]
-    ButtonEventPacket = Dict[str, Any]
-    EarEventPacket = Dict[str, Any]
-    EarsEventPacket = Dict[str, Any]
-    RfidEventPacket = Dict[str, Any]
-
-    ResponsePacketProto = Dict[str, Any]
-    ResponsePacket = Dict[str, Any]
-    EventPacket = Dict[str, Any]
-
-    NabdPacket = Dict[str, Any]
-else:
-    from typing import Literal, TypedDict
-
-    StateName = Literal[
-        "asleep", "idle", "interactive", "playing", "recording"
-    ]
-
-    class StatePacket(TypedDict):
-        type: Literal["state"]
-        state: StateName
-
-    class _InfoPacketBase(TypedDict):
-        type: Literal["info"]
-        info_id: str
-
-    class AnimationItem(TypedDict, total=False):
-        left: Color
-        center: Color
-        right: Color
-
-    class Animation(TypedDict):
-        tempo: _Number
-        colors: List[AnimationItem]
-
-    class InfoPacket(_InfoPacketBase, total=False):
-        request_id: str
-        animation: Animation
-
-    class _EarsPacketBase(TypedDict):
-        type: Literal["ears"]
-
-    class EarsPacket(_EarsPacketBase, total=False):
-        request_id: str
-        left: int
-        right: int
-        event: bool
-
-    ChoreographyURN = Union[Literal["urn:x-chor:streaming"], str]
-
-    class CommandSequenceItem(TypedDict, total=False):
-        audio: List[Resources]
-        choreography: Union[Resources, ChoreographyURN]
-
-    class _CommandPacketBase(TypedDict):
-        type: Literal["command"]
-        sequence: List[CommandSequenceItem]
-
-    class CommandPacket(_CommandPacketBase, total=False):
-        request_id: str
-        expiration: datetime.datetime
-        cancelable: bool
+StateName = Literal["asleep", "idle", "interactive", "playing", "recording"]
+
+
+class StatePacket(TypedDict):
+    type: Literal["state"]
+    state: StateName
+
+
+class _InfoPacketBase(TypedDict):
+    type: Literal["info"]
+    info_id: str
+
+
+class AnimationItem(TypedDict, total=False):
+    left: Color
+    center: Color
+    right: Color
+
+
+class Animation(TypedDict):
+    tempo: _Number
+    colors: List[AnimationItem]
+
+
+class InfoPacket(_InfoPacketBase, total=False):
+    request_id: str
+    # Animation or hash of a registered animation
+    animation: Union[Animation, str]
+    expiration: datetime.datetime
+    priority: int
+
+
+class _EarsPacketBase(TypedDict):
+    type: Literal["ears"]
+
+
+class EarsPacket(_EarsPacketBase, total=False):
+    request_id: str
+    left: int
+    right: int
+    event: bool
+
+
+ChoreographyURN = Union[Literal["urn:x-chor:streaming"], str]
+
+
+class CommandSequenceItem(TypedDict, total=False):
+    # A single resource is still accepted for audio, with a warning.
+    audio: Union[List[Resources], Resources]
+    choreography: Union[Resources, ChoreographyURN]
+
+
+class _CommandPacketBase(TypedDict):
+    type: Literal["command"]
+    # Sequence or handle of a prepared sequence
+    sequence: Union[List[CommandSequenceItem], str]
+
+
+class CommandPacket(_CommandPacketBase, total=False):
+    request_id: str
+    at: datetime.datetime
+    expiration: datetime.datetime
+    cancelable: bool
+    priority: int
+    coalesce: bool
+
+
+class _MessagePacketBase(TypedDict):
+    type: Literal["message"]
+    # Sequence or handle of a prepared sequence
+    body: Union[List[CommandSequenceItem], str]
+
+
+class MessagePacket(_MessagePacketBase, total=False):
+    request_id: str
+    signature: CommandSequenceItem
+    at: datetime.datetime
+    expiration: datetime.datetime
+    cancelable: bool
+    priority: int
+    coalesce: bool
+
+
+class _BatchPacketBase(TypedDict):
+    type: Literal["batch"]
+    packets: List[Union[InfoPacket, EarsPacket, CommandPacket, MessagePacket]]
+
+
+class BatchPacket(_BatchPacketBase, total=False):
+    request_id: str
+    expiration: datetime.datetime
+    priority: int
+    coalesce: bool
+
+
+class _RegisterPacketBase(TypedDict):
+    type: Literal["register"]
+
+
+class RegisterPacket(_RegisterPacketBase, total=False):
+    request_id: str
+    animation: Animation
+    choreography: str
+
+
+class _PreparePacketBase(TypedDict):
+    type: Literal["prepare"]
+    sequence: List[CommandSequenceItem]
+
+
+class PreparePacket(_PreparePacketBase, total=False):
+    request_id: str
+
+
+class CancelPacket(TypedDict):
+    type: Literal["cancel"]
+    request_id: str
+
+
+class _WakeupPacketBase(TypedDict):
+    type: Literal["wakeup"]
+
+
+class WakeupPacket(_WakeupPacketBase, total=False):
+    request_id: str
+
+
+class _SleepPacketBase(TypedDict):
+    type: Literal["sleep"]
+
+
+class SleepPacket(_SleepPacketBase, total=False):
+    request_id: str
+
+
+class _ModePacketBase(TypedDict):
+    type: Literal["mode"]
+    mode: Literal["idle", "interactive"]
+
+
+EventTypes = Union[Literal["asr", "button", "ears", "rfid/*", "sleep"], str]
+
+
+class ModePacket(_ModePacketBase, total=False):
+    events: List[EventTypes]
+    request_id: str
+
+
+class _TestPacketBase(TypedDict):
+    type: Literal["test"]
+    test: str
+
+
+class TestPacket(_TestPacketBase, total=False):
+    request_id: str
+
+
+class _HelloPacketBase(TypedDict):
+    type: Literal["hello"]
+    framing: Literal["json", "msgpack"]
+
+
+class HelloPacket(_HelloPacketBase, total=False):
+    request_id: str
+
+
+class _RfidWritePacketBase(TypedDict):
+    type: Literal["rfid_write"]
+    uid: str
+    picture: int
+    app: Union[int, str]
+    tech: str
+
+
+class RfidWritePacket(_RfidWritePacketBase, total=False):
+    request_id: str
+    timeout: _Number
+    data: str
+
+
+class ResponseOKPacketProto(TypedDict):
+    status: Literal["ok"]
+
+
+class _ResponseOKPacketBase(ResponseOKPacketProto):
+    type: Literal["response"]
+
+
+class ResponseOKPacket(_ResponseOKPacketBase, total=False):
+    request_id: str
+
+
+class ResponseCanceledPacketProto(TypedDict):
+    status: Literal["canceled"]
+
+
+class _ResponseCanceledPacketBase(ResponseCanceledPacketProto):
+    type: Literal["response"]
+
+
+class ResponseCanceledPacket(_ResponseCanceledPacketBase, total=False):
+    request_id: str
+
+
+class ResponseExpiredPacketProto(TypedDict):
+    status: Literal["expired"]
+
+
+class _ResponseExpiredPacketBase(ResponseExpiredPacketProto):
+    type: Literal["response"]
+
+
+class ResponseExpiredPacket(_ResponseExpiredPacketBase, total=False):
+    request_id: str
+
+
+ResponseErrorPacketProto = TypedDict(
+    "ResponseErrorPacketProto",
+    {"status": Literal["error"], "class": str, "message": str},
+)
+
+
+class _ResponseErrorPacketBase(ResponseErrorPacketProto):
+    type: Literal["response"]
+
+
+class ResponseErrorPacket(_ResponseErrorPacketBase, total=False):
+    request_id: str
+
+
+class ResponseFailurePacketProto(TypedDict):
+    status: Literal["failure"]
+
+
+class _ResponseFailurePacketBase(ResponseFailurePacketProto):
+    type: Literal["response"]
+
+
+class ResponseFailurePacket(_ResponseFailurePacketBase, total=False):
+    request_id: str
+
+
+class ResponseNFCOKPacketProto(ResponseOKPacketProto, total=False):
+    uid: str
+
+
+class _ResponseNFCOKPacketBase(ResponseNFCOKPacketProto):
+    type: Literal["response"]
+
+
+class ResponseNFCOKPacket(_ResponseNFCOKPacketBase, total=False):
+    request_id: str
+
+
+class ResponseNFCErrorPacketProto(ResponseErrorPacketProto, total=False):
+    uid: str
+
+
+class _ResponseNFCErrorPacketBase(ResponseNFCErrorPacketProto):
+    type: Literal["response"]
+
+
+class ResponseNFCErrorPacket(_ResponseNFCErrorPacketBase, total=False):
+    request_id: str
+
+
+class ResponseNFCTimeoutPacketProto(TypedDict):
+    status: Literal["timeout"]
+    message: str
+
+
+class _ResponseNFCTimeoutPacketBase(ResponseNFCTimeoutPacketProto):
+    type: Literal["response"]
+
+
+class ResponseNFCTimeoutPacket(_ResponseNFCTimeoutPacketBase, total=False):
+    request_id: str
+
+
+class ResponseRegisterPacketProto(ResponseOKPacketProto):
+    hash: str
+
+
+class _ResponseRegisterPacketBase(ResponseRegisterPacketProto):
+    type: Literal["response"]
+
+
+class ResponseRegisterPacket(_ResponseRegisterPacketBase, total=False):
+    request_id: str
+
+
+class ResponsePreparePacketProto(ResponseOKPacketProto):
+    handle: str
+
+
+class _ResponsePreparePacketBase(ResponsePreparePacketProto):
+    type: Literal["response"]
+
+
+class ResponsePreparePacket(_ResponsePreparePacketBase, total=False):
+    request_id: str
+
 
-    class _MessagePacketBase(TypedDict):
-        type: Literal["message"]
-        body: List[CommandSequenceItem]
+class _ResponseThrottledPacketProtoBase(TypedDict):
+    status: Literal["throttled"]
+    message: str
 
-    class MessagePacket(_MessagePacketBase, total=False):
-        request_id: str
-        signature: CommandSequenceItem
-        expiration: datetime.datetime
-        cancelable: bool
 
-    class CancelPacket(TypedDict):
-        type: Literal["cancel"]
-        request_id: str
+class ResponseThrottledPacketProto(
+    _ResponseThrottledPacketProtoBase, total=False
+):
+    retry_after: float
 
-    class _WakeupPacketBase(TypedDict):
-        type: Literal["wakeup"]
 
-    class WakeupPacket(_WakeupPacketBase, total=False):
-        request_id: str
+class _ResponseThrottledPacketBase(ResponseThrottledPacketProto):
+    type: Literal["response"]
 
-    class _SleepPacketBase(TypedDict):
-        type: Literal["sleep"]
 
-    class SleepPacket(_SleepPacketBase, total=False):
-        request_id: str
+class ResponseThrottledPacket(_ResponseThrottledPacketBase, total=False):
+    request_id: str
 
-    class _ModePacketBase(TypedDict):
-        type: Literal["mode"]
-        mode: Literal["idle", "interactive"]
 
-    EventTypes = Union[Literal["asr", "button", "ears", "rfid/*"], str]
+class _ResponseGestaltPacketProtoBase(TypedDict):
+    state: StateName
+    connections: int
+    hardware: str
 
-    class ModePacket(_ModePacketBase, total=False):
-        events: List[EventTypes]
-        request_id: str
 
-    class _TestPacketBase(TypedDict):
-        type: Literal["test"]
-        test: str
+class ResponseGestaltPacketProto(_ResponseGestaltPacketProtoBase, total=False):
+    uptime: int
+    network: Literal["unknown", "none", "local", "internet"]
+    dropped_events: int
+    coalesced_states: int
+    queue_depth: int
+    queue_wait: float
+    throttled: Dict[str, int]
+    asleep_time: float
+    asleep_cpu_time: float
 
-    class TestPacket(_TestPacketBase, total=False):
-        request_id: str
 
-    class _RfidWritePacketBase(TypedDict):
-        type: Literal["rfid_write"]
-        uid: str
-        picture: int
-        app: int
-        tech: str
+class _ResponseGestaltPacketBase(ResponseGestaltPacketProto):
+    type: Literal["response"]
 
-    class RfidWritePacket(_RfidWritePacketBase, total=False):
-        request_id: str
-        timeout: _Number
-        data: str
 
-    class ResponseOKPacketProto(TypedDict):
-        status: Literal["ok"]
+class ResponseGestaltPacket(_ResponseGestaltPacketBase, total=False):
+    request_id: str
 
-    class _ResponseOKPacketBase(ResponseOKPacketProto):
-        type: Literal["response"]
 
-    class ResponseOKPacket(_ResponseOKPacketBase, total=False):
-        request_id: str
+class ServiceRequestPacket(TypedDict, total=False):
+    request_id: str
 
-    class ResponseCanceledPacketProto(TypedDict):
-        status: Literal["canceled"]
 
-    class _ResponseCanceledPacketBase(ResponseCanceledPacketProto):
-        type: Literal["response"]
+ServicePacket = Union[
+    InfoPacket,
+    EarsPacket,
+    CommandPacket,
+    MessagePacket,
+    BatchPacket,
+    RegisterPacket,
+    PreparePacket,
+    CancelPacket,
+    WakeupPacket,
+    SleepPacket,
+    ModePacket,
+    RfidWritePacket,
+    TestPacket,
+    HelloPacket,
+]
 
-    class ResponseCanceledPacket(_ResponseCanceledPacketBase, total=False):
-        request_id: str
 
-    class ResponseExpiredPacketProto(TypedDict):
-        status: Literal["expired"]
+class ASREventPacket(TypedDict):
+    type: Literal["asr_event"]
+    nlu: NLUIntent
+    time: float
 
-    class _ResponseExpiredPacketBase(ResponseExpiredPacketProto):
-        type: Literal["response"]
 
-    class ResponseExpiredPacket(_ResponseExpiredPacketBase, total=False):
-        request_id: str
+ButtonEventType = Literal[
+    "up",
+    "down",
+    "click",
+    "hold",
+    "click_and_hold",
+    "double_click",
+    "triple_click",
+]
 
-    ResponseErrorPacketProto = TypedDict(
-        "ResponseErrorPacketProto",
-        {"status": Literal["error"], "class": str, "message": str},
-    )
 
-    class _ResponseErrorPacketBase(ResponseErrorPacketProto):
-        type: Literal["response"]
+class ButtonEventPacket(TypedDict):
+    type: Literal["button_event"]
+    event: ButtonEventType
+    time: float
 
-    class ResponseErrorPacket(_ResponseErrorPacketBase, total=False):
-        request_id: str
 
-    class ResponseFailurePacketProto(TypedDict):
-        status: Literal["failure"]
+class EarEventPacket(TypedDict):
+    type: Literal["ear_event"]
+    ear: Literal["left", "right"]
+    time: float
 
-    class _ResponseFailurePacketBase(ResponseFailurePacketProto):
-        type: Literal["response"]
 
-    class ResponseFailurePacket(_ResponseFailurePacketBase, total=False):
-        request_id: str
-
-    class ResponseNFCOKPacketProto(ResponseOKPacketProto, total=False):
-        uid: str
-
-    class _ResponseNFCOKPacketBase(ResponseNFCOKPacketProto):
-        type: Literal["response"]
-
-    class ResponseNFCOKPacket(_ResponseNFCOKPacketBase, total=False):
-        request_id: str
-
-    class ResponseNFCErrorPacketProto(ResponseErrorPacketProto, total=False):
-        uid: str
-
-    class _ResponseNFCErrorPacketBase(ResponseNFCErrorPacketProto):
-        type: Literal["response"]
-
-    class ResponseNFCErrorPacket(_ResponseNFCErrorPacketBase, total=False):
-        request_id: str
-
-    class ResponseNFCTimeoutPacketProto(TypedDict):
-        status: Literal["timeout"]
-        message: str
-
-    class _ResponseNFCTimeoutPacketBase(ResponseNFCTimeoutPacketProto):
-        type: Literal["response"]
-
-    class ResponseNFCTimeoutPacket(_ResponseNFCTimeoutPacketBase, total=False):
-        request_id: str
-
-    class _ResponseGestaltPacketProtoBase(TypedDict):
-        state: StateName
-        connections: int
-        hardware: str
-
-    class ResponseGestaltPacketProto(
-        _ResponseGestaltPacketProtoBase, total=False
-    ):
-        uptime: int
-
-    class _ResponseGestaltPacketBase(ResponseGestaltPacketProto):
-        type: Literal["response"]
-
-    class ResponseGestaltPacket(_ResponseGestaltPacketBase, total=False):
-        request_id: str
-
-    class ServiceRequestPacket(TypedDict, total=False):
-        request_id: str
-
-    ServicePacket = Union[
-        InfoPacket,
-        EarsPacket,
-        CommandPacket,
-        MessagePacket,
-        CancelPacket,
-        WakeupPacket,
-        SleepPacket,
-        ModePacket,
-        RfidWritePacket,
-        TestPacket,
-    ]
-
-    class ASREventPacket(TypedDict):
-        type: Literal["asr_event"]
-        nlu: NLUIntent
-        time: float
-
-    ButtonEventType = Literal[
-        "up",
-        "down",
-        "click",
-        "hold",
-        "click_and_hold",
-        "double_click",
-        "triple_click",
-    ]
-
-    class ButtonEventPacket(TypedDict):
-        type: Literal["button_event"]
-        event: ButtonEventType
-        time: float
-
-    class EarEventPacket(TypedDict):
-        type: Literal["ear_event"]
-        ear: Literal["left", "right"]
-        time: float
-
-    class EarsEventPacket(TypedDict):
-        type: Literal["ears_event"]
-        left: int
-        right: int
-        time: float
-
-    class _RfidEventPacketBase(TypedDict):
-        type: Literal["rfid_event"]
-        tech: str
-        uid: str
-        event: Literal["removed", "detected"]
-        support: Literal[
-            "formatted", "foreign-data", "locked", "empty", "unknown"
-        ]
-        time: float
-
-    class RfidEventPacket(_RfidEventPacketBase, total=False):
-        locked: bool
-        picture: str
-        tag_info: dict
-        app: str
-        data: str
-
-    _ResponseNFCPacketProto = Union[
-        ResponseNFCOKPacketProto,
-        ResponseNFCErrorPacketProto,
-        ResponseNFCTimeoutPacketProto,
-    ]
-
-    ResponsePacketProto = Union[
-        _ResponseNFCPacketProto,
-        ResponseOKPacketProto,
-        ResponseErrorPacketProto,
-        ResponseCanceledPacketProto,
-        ResponseExpiredPacketProto,
-        ResponseFailurePacketProto,
-        ResponseGestaltPacketProto,
-    ]
-
-    _ResponseNFCPacket = Union[
-        ResponseNFCOKPacket, ResponseNFCErrorPacket, ResponseNFCTimeoutPacket
-    ]
-
-    ResponsePacket = Union[
-        _ResponseNFCPacket,
-        ResponseOKPacket,
-        ResponseErrorPacket,
-        ResponseCanceledPacket,
-        ResponseExpiredPacket,
-        ResponseFailurePacket,
-        ResponseGestaltPacket,
-    ]
-
-    EventPacket = Union[
-        ASREventPacket,
-        ButtonEventPacket,
-        EarEventPacket,
-        EarsEventPacket,
-        RfidEventPacket,
-    ]
-
-    NabdPacket = Union[ResponsePacket, StatePacket, EventPacket]
+class EarsEventPacket(TypedDict):
+    type: Literal["ears_event"]
+    left: int
+    right: int
+    time: float
+
+
+class _RfidEventPacketBase(TypedDict):
+    type: Literal["rfid_event"]
+    tech: str
+    uid: str
+    event: Literal["removed", "detected"]
+    support: Literal["formatted", "foreign-data", "locked", "empty", "unknown"]
+    time: float
+
+
+class RfidEventPacket(_RfidEventPacketBase, total=False):
+    locked: bool
+    picture: str
+    tag_info: dict
+    app: str
+    data: str
+
+
+class SleepEventPacket(TypedDict):
+    type: Literal["sleep_event"]
+    event: Literal["asleep", "awake"]
+    time: float
+
+
+_ResponseNFCPacketProto = Union[
+    ResponseNFCOKPacketProto,
+    ResponseNFCErrorPacketProto,
+    ResponseNFCTimeoutPacketProto,
+]
+
+ResponsePacketProto = Union[
+    _ResponseNFCPacketProto,
+    ResponseOKPacketProto,
+    ResponseErrorPacketProto,
+    ResponseCanceledPacketProto,
+    ResponseExpiredPacketProto,
+    ResponseFailurePacketProto,
+    ResponseGestaltPacketProto,
+    ResponseRegisterPacketProto,
+    ResponsePreparePacketProto,
+    ResponseThrottledPacketProto,
+]
+
+_ResponseNFCPacket = Union[
+    ResponseNFCOKPacket, ResponseNFCErrorPacket, ResponseNFCTimeoutPacket
+]
+
+ResponsePacket = Union[
+    _ResponseNFCPacket,
+    ResponseOKPacket,
+    ResponseErrorPacket,
+    ResponseCanceledPacket,
+    ResponseExpiredPacket,
+    ResponseFailurePacket,
+    ResponseGestaltPacket,
+    ResponseRegisterPacket,
+    ResponsePreparePacket,
+    ResponseThrottledPacket,
+]
+
+EventPacket = Union[
+    ASREventPacket,
+    ButtonEventPacket,
+    EarEventPacket,
+    EarsEventPacket,
+    RfidEventPacket,
+    SleepEventPacket,
+]
+
+NabdPacket = Union[ResponsePacket, StatePacket, EventPacket]
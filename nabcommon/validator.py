@@ -0,0 +1,221 @@
+"""
+Compile packet validators from the TypedDict definitions of nabcommon.typing.
+
+Each TypedDict is turned once into the source of a flat Python function
+(nested TypedDicts and lists are inlined) which returns None if the packet
+is valid or a precise error message otherwise.
+"""
+
+import datetime
+from typing import Any, Callable, Dict, List, Optional, Union, cast
+
+from typing_extensions import Literal, get_args, get_origin, get_type_hints
+
+Validator = Callable[[Dict[str, Any]], Optional[str]]
+
+_SCALARS = {
+    str: "a string",
+    int: "an int",
+    float: "a float",
+    bool: "a bool",
+    dict: "a dict",
+    list: "a list",
+}
+
+
+def _is_typeddict(tp) -> bool:
+    return (
+        isinstance(tp, type)
+        and issubclass(tp, dict)
+        and hasattr(tp, "__required_keys__")
+    )
+
+
+def _packet_type(tp) -> Optional[str]:
+    """
+    Return the value of the type slot of a packet definition, if any.
+    """
+    type_tp = get_type_hints(tp).get("type")
+    if get_origin(type_tp) is Literal and len(get_args(type_tp)) == 1:
+        return get_args(type_tp)[0]
+    return None
+
+
+class _Compiler:
+    def __init__(self):
+        self.lines: List[str] = []
+        self.constants: Dict[str, Any] = {}
+        self.counter = 0
+
+    def new_var(self, prefix: str) -> str:
+        self.counter += 1
+        return f"{prefix}{self.counter}"
+
+    def emit(self, indent: int, line: str):
+        self.lines.append("    " * indent + line)
+
+    def error(self, indent: int, message: str):
+        self.emit(indent, f"return f{message!r}")
+
+    def describe(self, tp) -> str:
+        if tp is datetime.datetime:
+            return "an ISO 8601 date string"
+        if tp in _SCALARS:
+            return _SCALARS[tp]
+        if _is_typeddict(tp):
+            return "a dict"
+        origin = get_origin(tp)
+        if origin is Literal:
+            return "one of " + ", ".join(repr(v) for v in get_args(tp))
+        if origin is list:
+            return "a list"
+        if origin is Union:
+            members = self.union_members(tp)
+            if set(members) == {int, float}:
+                return "a number"
+            packet_types = self.packet_types(members)
+            if packet_types is not None:
+                return "a packet of type " + ", ".join(
+                    repr(packet_type) for packet_type in packet_types
+                )
+            return " or ".join(self.describe(member) for member in members)
+        raise TypeError(f"Unsupported type in packet definition: {tp}")
+
+    def union_members(self, tp) -> List[Any]:
+        """
+        Return members of a union, dropping literals subsumed by str.
+        """
+        members = list(get_args(tp))
+        if str in members:
+            members = [
+                member
+                for member in members
+                if get_origin(member) is not Literal
+                or not all(isinstance(v, str) for v in get_args(member))
+            ]
+        return members
+
+    @staticmethod
+    def packet_types(members) -> Optional[List[str]]:
+        """
+        Return the type slots of members if they are all packet
+        definitions, which are then discriminated by their type slot.
+        """
+        if len(members) < 2 or not all(map(_is_typeddict, members)):
+            return None
+        packet_types = [_packet_type(member) for member in members]
+        if None in packet_types:
+            return None
+        return cast(List[str], packet_types)
+
+    def scalar_test(self, var: str, tp) -> str:
+        """
+        Return an expression that is true if var is of scalar type tp.
+        """
+        if tp is datetime.datetime:
+            return f"isinstance({var}, str)"
+        if tp is float:
+            return f"isinstance({var}, (int, float))"
+        if tp in _SCALARS:
+            return f"isinstance({var}, {tp.__name__})"
+        if get_origin(tp) is Literal:
+            name = self.new_var("literal")
+            self.constants[name] = tuple(get_args(tp))
+            return f"{var} in {name}"
+        raise TypeError(f"Unsupported type in packet definition: {tp}")
+
+    def value(self, indent: int, var: str, tp, slot: str, parent: str):
+        """
+        Emit checks for value var of type tp, found in slot of parent path.
+        """
+        if tp is Any:
+            return
+        path = f"{parent}.{slot}" if parent else slot
+        where = f" in {parent}" if parent else ""
+        invalid = f"Invalid {slot} slot{where}, expected {self.describe(tp)}"
+        members = self.union_members(tp) if get_origin(tp) is Union else [tp]
+        structured = [
+            member
+            for member in members
+            if _is_typeddict(member) or get_origin(member) is list
+        ]
+        scalars = [member for member in members if member not in structured]
+        discriminated = self.packet_types(members) is not None
+        keyword = "if"
+        for member in structured:
+            if _is_typeddict(member):
+                test = f"isinstance({var}, dict)"
+                if discriminated:
+                    test += (
+                        f" and {var}.get('type') == {_packet_type(member)!r}"
+                    )
+                self.emit(indent, f"{keyword} {test}:")
+                self.typeddict(indent + 1, var, member, path)
+            else:
+                self.emit(indent, f"{keyword} isinstance({var}, list):")
+                self.list(indent + 1, var, member, slot, parent)
+            keyword = "elif"
+        if scalars:
+            tests = " or ".join(self.scalar_test(var, t) for t in scalars)
+            self.emit(indent, f"{keyword} not ({tests}):")
+        else:
+            self.emit(indent, "else:")
+        self.error(indent + 1, invalid)
+
+    def list(self, indent: int, var: str, tp, slot: str, parent: str):
+        (item_tp,) = get_args(tp)
+        if item_tp is Any:
+            self.emit(indent, "pass")
+            return
+        index = self.new_var("i")
+        item = self.new_var("v")
+        self.emit(indent, f"for {index}, {item} in enumerate({var}):")
+        self.value(indent + 1, item, item_tp, f"{slot}[{{{index}}}]", parent)
+
+    def typeddict(self, indent: int, var: str, tp, path: str):
+        """
+        Emit checks for dict var of TypedDict type tp found at path.
+        """
+        where = f" in {path}" if path else ""
+        hints = get_type_hints(tp)
+        if not hints:
+            self.emit(indent, "pass")
+        for key, key_tp in hints.items():
+            item = self.new_var("v")
+            if key in tp.__required_keys__:
+                self.emit(indent, f"if {key!r} not in {var}:")
+                self.error(indent + 1, f"Missing required {key} slot{where}")
+                self.emit(indent, f"{item} = {var}[{key!r}]")
+                self.value(indent, item, key_tp, key, path)
+            else:
+                self.emit(indent, f"if {key!r} in {var}:")
+                self.emit(indent + 1, f"{item} = {var}[{key!r}]")
+                self.value(indent + 1, item, key_tp, key, path)
+
+    def compile(self, tp) -> Validator:
+        name = f"validate_{tp.__name__}"
+        self.emit(0, f"def {name}(packet):")
+        self.typeddict(1, "packet", tp, "")
+        self.emit(1, "return None")
+        namespace = dict(self.constants)
+        exec("\n".join(self.lines), namespace)
+        return namespace[name]
+
+
+def compile_validator(tp) -> Validator:
+    """
+    Compile a validator for a TypedDict definition.
+    """
+    return _Compiler().compile(tp)
+
+
+def compile_validators(packets) -> Dict[str, Validator]:
+    """
+    Compile validators for a union of packet definitions, indexed by the
+    value of their type slot.
+    """
+    validators = {}
+    for tp in get_args(packets):
+        (packet_type,) = get_args(get_type_hints(tp)["type"])
+        validators[packet_type] = compile_validator(tp)
+    return validators
@@ -0,0 +1,131 @@
+import os
+import time
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from nabcommon import codec
+
+
+class AdmissionPolicy(NamedTuple):
+    # Sustained rate of packets per second, per peer (see admission_key)
+    rate: float
+    # Number of packets a peer can send at once
+    burst: int
+    # Maximum number of items queued by all connections of a service class
+    max_queued: int
+
+
+DEFAULT_SERVICE_CLASS = "default"
+
+# Service classes are pynab packages (e.g. "nabclockd") for local services,
+# "tcp" for TCP/IP clients and "default" for everything else.
+# Connections in interactive mode are not rate limited.
+ADMISSION_POLICIES = {
+    # 50 packets per second leave room for a JSON client synchronizing
+    # ears and leds at 25 frames per second, and a burst of 150 for a
+    # service registering as many resources as the registry keeps (128)
+    # when it reconnects.
+    DEFAULT_SERVICE_CLASS: AdmissionPolicy(
+        rate=50.0, burst=150, max_queued=16
+    ),
+    # IFTTT and web requests, one connection per request, all sharing the
+    # same bucket: a page or an applet sends a few packets at once.
+    "nabweb": AdmissionPolicy(rate=10.0, burst=30, max_queued=8),
+    # Scripts, and services in Docker when the Unix socket is not available
+    "tcp": AdmissionPolicy(rate=50.0, burst=150, max_queued=8),
+}
+
+# Rate and burst of connections which negotiated a framing other than JSON
+# lines to send many packets, e.g. ears and leds synchronization at 100
+# frames per second with a few packets per frame. They share a bucket per
+# peer and framing, apart from JSON connections of the same peer.
+FRAMING_RATE = 500.0
+FRAMING_BURST = 500
+
+
+def service_class(command: Optional[List[str]]) -> str:
+    """
+    Return the service class of a peer from its command line (None for
+    TCP/IP peers): the first pynab package found in its arguments, e.g.
+    "nabclockd" for "python -m nabclockd.nabclockd" or "nabweb" for
+    "gunicorn nabweb.wsgi".
+    """
+    if command is None:
+        return "tcp"
+    for arg in command[1:]:
+        name = os.path.basename(arg).split(".")[0]
+        if name.startswith("nab"):
+            return name
+    return DEFAULT_SERVICE_CLASS
+
+
+def admission_key(
+    name: str, peer: Any, framing: str = codec.JSON_LINES.NAME
+) -> str:
+    """
+    Return the key of the token bucket shared by connections of a peer of
+    service class name with framing: the class of pynab packages, and
+    otherwise the class with peer, the uid of Unix peers or the host of
+    TCP/IP peers.
+    TCP/IP clients of the same host share a bucket on purpose, even if
+    they are different programs (e.g. services in Docker connecting from
+    127.0.0.1): a bucket per connection would not limit clients opening a
+    connection per request.
+    """
+    if name in (DEFAULT_SERVICE_CLASS, "tcp"):
+        key = f"{name}:{peer}"
+    else:
+        key = name
+    if framing != codec.JSON_LINES.NAME:
+        key = f"{key}/{framing}"
+    return key
+
+
+def admission_policy(
+    name: str, framing: str = codec.JSON_LINES.NAME
+) -> AdmissionPolicy:
+    policy = ADMISSION_POLICIES.get(
+        name, ADMISSION_POLICIES[DEFAULT_SERVICE_CLASS]
+    )
+    if framing != codec.JSON_LINES.NAME:
+        policy = policy._replace(rate=FRAMING_RATE, burst=FRAMING_BURST)
+    return policy
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at rate tokens per second, up to burst tokens.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = float(burst)
+        self.last = clock()
+
+    def is_full(self) -> bool:
+        """
+        Return whether the bucket is refilled, i.e. equivalent to a new one.
+        """
+        refill = (self.clock() - self.last) * self.rate
+        return self.tokens + refill >= self.burst
+
+    def take(self) -> float:
+        """
+        Take a token. Return 0 if one was available, or else the number of
+        seconds until the next one.
+        """
+        now = self.clock()
+        self.tokens = min(
+            float(self.burst), self.tokens + (now - self.last) * self.rate
+        )
+        self.last = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
@@ -1,12 +1,6 @@
-import struct
 import traceback
-from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from kaldiasr.nnet3 import (  # type: ignore
-    KaldiNNet3OnlineDecoder,
-    KaldiNNet3OnlineModel,
-)
 
 
 class ASR:
@@ -21,6 +15,9 @@ class ASR:
     }
     DEFAULT_LOCALE = "fr_FR"
 
+    SAMPLE_RATE = 16000
+    CHUNK_SAMPLES = 1600  # 100ms
+
     @staticmethod
     def get_locale(locale):
         if locale in ASR.MODELS:
@@ -29,40 +26,49 @@ class ASR:
             return ASR.DEFAULT_LOCALE
 
     def __init__(self, locale):
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        # Preallocated buffer for float conversion
+        self.float_samples = np.zeros(ASR.CHUNK_SAMPLES, dtype=np.float32)
         self._load_model(locale)
 
     def _load_model(self, locale):
+        # Kaldi is only loaded by the recognizer process
+        from kaldiasr.nnet3 import (  # type: ignore
+            KaldiNNet3OnlineDecoder,
+            KaldiNNet3OnlineModel,
+        )
+
         locale = ASR.get_locale(locale)
         path = ASR.MODELS[locale]
         self.model = KaldiNNet3OnlineModel(path, max_mem=20000)
         self.decoder = KaldiNNet3OnlineDecoder(self.model)
 
-    def decode_chunk(self, samples, finalize):
-        self.executor.submit(
-            lambda s=samples, f=finalize: self._decode_chunk(s, f)
-        )
-
-    def _decode_chunk(self, frames, finalize):
-        try:
-            nframes = len(frames) / 2
-            samples = struct.unpack_from("<%dh" % nframes, frames)
-            self.decoder.decode(
-                16000, np.array(samples, dtype=np.float32), finalize
-            )
-        except Exception:
-            print(traceback.format_exc())
+    def decode(self, frames, finalize):
+        """
+        Decode recorded frames (S16_LE) synchronously.
+        Thread: recognizer process
+        """
+        if len(frames) // 2 > len(self.float_samples):
+            self.float_samples = np.zeros(len(frames) // 2, dtype=np.float32)
+        float_samples = ASR.convert(frames, self.float_samples)
+        self.decoder.decode(ASR.SAMPLE_RATE, float_samples, finalize)
 
-    async def get_decoded_string(self, sync):
-        if sync:
-            future = self.executor.submit(lambda: self._get_decoded_string())
-            return future.result()
-        else:
-            # not sure we could do that
-            str, likelihood = self.decoder.get_decoded_string()
-            return str
+    @staticmethod
+    def convert(frames, float_samples):
+        """
+        Convert frames (S16_LE) in place into float_samples, which should be
+        large enough, reading them through a view. Return a view on the
+        converted samples.
+        """
+        samples = np.frombuffer(frames, dtype="<i2")
+        result = float_samples[: len(samples)]
+        np.copyto(result, samples)
+        return result
 
-    def _get_decoded_string(self):
+    def decoded_string(self):
+        """
+        Return decoded string synchronously.
+        Thread: recognizer process
+        """
         try:
             str, likelihood = self.decoder.get_decoded_string()
             return str
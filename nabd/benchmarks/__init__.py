@@ -0,0 +1,6 @@
+"""
+Benchmarks of nabd, run by hand rather than by the test suite, as timings
+depend on the machine. Each module prints its measurements, e.g.:
+
+    python -m nabd.benchmarks.recognizer
+"""
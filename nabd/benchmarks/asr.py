@@ -0,0 +1,44 @@
+"""
+CPU time and memory allocated per recorded chunk (100ms) to convert it to
+float32 samples for Kaldi:
+- before: struct.unpack_from into a tuple, then a new numpy array;
+- after: ASR.convert, through a np.frombuffer view, in place into a
+  preallocated float32 array.
+
+    python -m nabd.benchmarks.asr
+"""
+
+import os
+import struct
+
+import numpy as np
+
+from nabd.asr import ASR
+
+from .utils import measure
+
+CHUNKS = 200
+
+
+def convert_before(frames):
+    nframes = len(frames) / 2
+    samples = struct.unpack_from("<%dh" % nframes, frames)
+    return np.array(samples, dtype=np.float32)
+
+
+def main():
+    chunks = [os.urandom(ASR.CHUNK_SAMPLES * 2) for _ in range(CHUNKS)]
+    float_samples = np.zeros(ASR.CHUNK_SAMPLES, dtype=np.float32)
+    for name, convert in [
+        ("before", convert_before),
+        ("after", lambda frames: ASR.convert(frames, float_samples)),
+    ]:
+        cpu, allocated = measure(convert, chunks)
+        print(
+            f"per chunk {name}: {cpu * 1e6:.1f}us cpu, "
+            f"{allocated} bytes allocated"
+        )
+
+
+if __name__ == "__main__":
+    main()
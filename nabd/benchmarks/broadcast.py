@@ -0,0 +1,75 @@
+"""
+Time to broadcast an event to many connected services:
+- before: packet serialized for each subscribed service;
+- after: Nabd.broadcast_event, serializing it once per framing.
+
+    python -m nabd.benchmarks.broadcast
+"""
+
+import json
+import time
+
+from nabcommon import codec
+from nabd.nabd import Nabd
+from nabd.outbound import PacketKind
+from nabd.tests.mock import NabIOMock
+
+SERVICES = 16
+EVENTS = 2000
+
+
+class CountingWriter:
+    """Stream writer only counting written packets"""
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, data):
+        self.written += 1
+
+
+def broadcast_before(nabd, event_type, packet):
+    """Previous implementation: serialize for each writer"""
+    for writer, events in nabd.service_writers.items():
+        if nabd._test_event_mask(event_type, events):
+            data = (json.dumps(packet) + "\r\n").encode("utf8")
+            nabd.write_data(data, writer, PacketKind.EVENT)
+
+
+def measure(broadcast, event):
+    start = time.perf_counter()
+    for _ in range(EVENTS):
+        broadcast("rfid/nabtaichid", event)
+    return (time.perf_counter() - start) / EVENTS
+
+
+def main():
+    nabd = Nabd(NabIOMock())
+    for _ in range(SERVICES):
+        writer = CountingWriter()
+        events = ["button", "ears", "rfid/*"]
+        nabd.service_writers[writer] = events
+        nabd.event_subscriptions.subscribe(writer, events)
+    event = {
+        "type": "rfid_event",
+        "tech": "st25tb",
+        "uid": "d0:02:18:01:02:03:04:05",
+        "event": "detected",
+        "support": "formatted",
+        "picture": 42,
+        "app": "nabtaichid",
+        "time": time.time(),
+    }
+    before = measure(
+        lambda event_type, packet: broadcast_before(nabd, event_type, packet),
+        event,
+    )
+    after = measure(nabd.broadcast_event, event)
+    print(
+        f"fan-out to {SERVICES} services (codec: {codec.NAME}): "
+        f"before {before * 1e6:.1f}us, after {after * 1e6:.1f}us per event"
+    )
+
+
+if __name__ == "__main__":
+    main()
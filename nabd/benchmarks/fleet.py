@@ -0,0 +1,62 @@
+"""
+Resident memory and idle CPU per virtual rabbit, with a fleet of rabbits
+in one process and one connection per rabbit.
+
+    python -m nabd.benchmarks.fleet [rabbits]
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import threading
+import time
+
+from nabd.fleet import create_fleet, rabbit_socket
+from nabd.nabd import Nabd
+
+RABBITS = 24
+BASE_PORT = 20543
+SOCKET_PREFIX = "@nabd-fleet-benchmark"
+IDLE_TIME = 5.0
+
+
+def resident_memory():
+    """Return resident memory of this process, in bytes"""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else RABBITS
+    memory_before = resident_memory()
+    loop = asyncio.new_event_loop()
+    rabbits = create_fleet(count, BASE_PORT, SOCKET_PREFIX)
+    thread = threading.Thread(target=Nabd.run_instances, args=(loop, rabbits))
+    thread.start()
+    sockets = []
+    try:
+        time.sleep(1)  # make sure rabbits were started
+        for index in range(count):
+            s = socket.socket(socket.AF_UNIX)
+            s.settimeout(5.0)
+            s.connect("\0" + rabbit_socket(index, SOCKET_PREFIX)[1:])
+            s.recv(4096)  # state packet
+            sockets.append(s)
+        memory = (resident_memory() - memory_before) / count
+        start = time.process_time()
+        time.sleep(IDLE_TIME)
+        idle_cpu = (time.process_time() - start) / IDLE_TIME / count
+    finally:
+        for s in sockets:
+            s.close()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+    print(
+        f"{count} rabbits: {memory / 1024:.0f} KiB and "
+        f"{idle_cpu * 100:.3f}% CPU per rabbit"
+    )
+
+
+if __name__ == "__main__":
+    main()
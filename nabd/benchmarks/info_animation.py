@@ -0,0 +1,78 @@
+"""
+CPU usage of the process while playing an info animation, with the virtual
+backend or, on a physical Nabaztag, the hardware backend.
+
+    python -m nabd.benchmarks.info_animation [--hardware]
+"""
+
+import asyncio
+import sys
+import time
+
+from nabd.info_animation import InfoAnimation
+
+DURATION = 10.0
+
+# Moderate air quality animation of nabairqualityd
+ANIMATION = {
+    "tempo": 14,
+    "colors": [
+        {"left": "000000", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "000000"},
+        {"left": "00ffff", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "000000", "right": "00ffff"},
+        {"left": "000000", "center": "000000", "right": "00ffff"},
+        {"left": "000000", "center": "000000", "right": "000000"},
+        {"left": "000000", "center": "00ffff", "right": "000000"},
+        {"left": "000000", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "00ffff"},
+        {"left": "00ffff", "center": "00ffff", "right": "000000"},
+        {"left": "00ffff", "center": "000000", "right": "00ffff"},
+        {"left": "000000", "center": "00ffff", "right": "00ffff"},
+    ],
+}
+
+
+def info_cpu_usage(nabio, duration=DURATION, animation=ANIMATION):
+    """
+    Play an info animation on nabio for duration seconds, and return the
+    CPU time used by the process (including leds threads) per second.
+    """
+    info = InfoAnimation(animation)
+
+    async def play():
+        condvar = asyncio.Condition()
+        async with condvar:
+            await nabio.play_info(condvar, info, duration)
+
+    start = time.process_time()
+    asyncio.get_event_loop().run_until_complete(play())
+    return (time.process_time() - start) / duration
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    if "--hardware" in sys.argv[1:]:
+        from nabd.nabio_hw import NabIOHW
+
+        backend, nabio = "hardware", NabIOHW()
+    else:
+        from nabd.nabio_virtual import NabIOVirtual
+
+        backend, nabio = "virtual", NabIOVirtual()
+    try:
+        cpu = info_cpu_usage(nabio)
+    finally:
+        nabio.leds.stop()
+        loop.close()
+    print(f"info loop ({backend}): {cpu * 100:.3f}% CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Latency from the end of an utterance to its intent, with ASR and NLU in
+threads of nabd (former design) and in the recognizer worker process.
+Fake ASR and NLU spend some CPU time per chunk instead of loading models.
+
+    python -m nabd.benchmarks.recognizer
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from nabd.recognizer import CHUNK_BYTES, Recognizer, serve
+
+CHUNKS = 30  # 3 seconds utterance
+UTTERANCES = 20
+
+
+class FakeASR:
+    def __init__(self):
+        self.chunks = 0
+
+    def decode(self, frames, finalize):
+        sum(frames)
+        self.chunks += 1
+
+    def decoded_string(self):
+        chunks = self.chunks
+        self.chunks = 0
+        return f"{chunks} chunks"
+
+
+class FakeNLU:
+    def parse(self, string):
+        return {"intent": "nabweatherd/forecast", "text": string}
+
+
+def fake_recognizer_main(conn, locale):
+    serve(conn, FakeASR(), FakeNLU())
+
+
+class InProcessRecognizer:
+    """Former design: ASR and NLU in threads of nabd"""
+
+    def __init__(self):
+        self.asr = FakeASR()
+        self.nlu = FakeNLU()
+        self.asr_executor = ThreadPoolExecutor(max_workers=1)
+        self.nlu_executor = ThreadPoolExecutor(max_workers=1)
+
+    def decode_chunk(self, frames, finalize):
+        self.asr_executor.submit(self.asr.decode, frames, finalize)
+
+    async def recognize(self):
+        loop = asyncio.get_event_loop()
+        decoded_str = await loop.run_in_executor(
+            self.asr_executor, self.asr.decoded_string
+        )
+        response = await loop.run_in_executor(
+            self.nlu_executor, self.nlu.parse, decoded_str
+        )
+        return decoded_str, response, 0.0, 0.0
+
+
+async def latency(recognizer) -> float:
+    """
+    Return average time from the last chunk to the intent.
+    """
+    elapsed = 0.0
+    for _ in range(UTTERANCES):
+        for index in range(CHUNKS):
+            recognizer.decode_chunk(bytes(CHUNK_BYTES), index == CHUNKS - 1)
+        start = time.perf_counter()
+        await recognizer.recognize()
+        elapsed += time.perf_counter() - start
+    return elapsed / UTTERANCES
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    worker = Recognizer("fr_FR", fake_recognizer_main)
+    try:
+        # Wait for the worker to be ready
+        worker.conn.poll(30)
+        for name, recognizer in [
+            ("in-process", InProcessRecognizer()),
+            ("worker", worker),
+        ]:
+            result = loop.run_until_complete(latency(recognizer))
+            print(f"{name}: {result * 1000:.2f} ms")
+    finally:
+        worker.stop()
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import time
+import tracemalloc
+from typing import Any, Callable, Sequence, Tuple
+
+
+def measure(
+    function: Callable[[Any], Any], inputs: Sequence[Any]
+) -> Tuple[float, int]:
+    """
+    Return CPU time per call of function on each of inputs, and peak memory
+    allocated by a single call.
+    """
+    function(inputs[0])  # warm up
+    cpu_start = time.process_time()
+    for data in inputs:
+        function(data)
+    cpu = (time.process_time() - cpu_start) / len(inputs)
+    peak = 0
+    for data in inputs:
+        # Python 3.7 has no tracemalloc.reset_peak()
+        tracemalloc.start()
+        function(data)
+        _, call_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak = max(peak, call_peak)
+    return cpu, peak
@@ -0,0 +1,57 @@
+"""
+Throughput of packet validators compiled from nabcommon.typing.
+
+    python -m nabd.benchmarks.validator
+"""
+
+import time
+
+from nabcommon.typing import ServicePacket
+from nabcommon.validator import compile_validators
+
+PACKETS = 20000
+
+SAMPLE_PACKETS = [
+    {
+        "type": "info",
+        "info_id": "weather",
+        "request_id": "test_id",
+        "animation": {
+            "tempo": 25,
+            "colors": [
+                {"left": "ffff00", "center": "ffff00"},
+                {"left": "000000", "center": "000000"},
+            ]
+            * 12,
+        },
+    },
+    {
+        "type": "command",
+        "request_id": "test_id",
+        "sequence": [
+            {"audio": ["nabclockd/signature.mp3"]},
+            {"audio": ["nabclockd/10/*.mp3"], "choreography": "x"},
+        ],
+        "expiration": "2019-01-01T00:00:00",
+    },
+    {"type": "ears", "left": 3, "right": 5},
+    {"type": "mode", "mode": "idle", "events": ["asr", "rfid/*"]},
+]
+
+
+def main():
+    validators = compile_validators(ServicePacket)
+    for packet in SAMPLE_PACKETS:
+        error = validators[packet["type"]](packet)
+        if error is not None:
+            raise ValueError(f"Invalid sample packet: {error}")
+    start = time.perf_counter()
+    for i in range(PACKETS):
+        packet = SAMPLE_PACKETS[i % len(SAMPLE_PACKETS)]
+        validators[packet["type"]](packet)
+    elapsed = time.perf_counter() - start
+    print(f"{PACKETS / elapsed:.0f} packets validated per second")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,42 @@
 import asyncio
+import threading
+from typing import Optional
+
+
+class CancelToken:
+    """
+    Cooperative cancellation token of a playback, shared by the event loop
+    and playback threads.
+
+    cancel() is called on the loop. Coroutines wait on the token while
+    threads poll is_set() between audio periods. It can be used wherever an
+    asyncio.Event is expected.
+    """
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.flag = threading.Event()
+
+    def cancel(self):
+        self.flag.set()
+        self.event.set()
+
+    def is_set(self) -> bool:
+        return self.flag.is_set()
+
+    async def wait(self):
+        await self.event.wait()
+
+    def sleep(self, timeout: float) -> bool:
+        """
+        Block the calling thread for timeout seconds or until the token is
+        canceled. Return True if it was canceled.
+        """
+        return self.flag.wait(timeout)
+
+
+def is_canceled(token: Optional[CancelToken]) -> bool:
+    return token is not None and token.is_set()
 
 
 async def wait_with_cancel_event(task, event, stop_coroutine):
@@ -6,7 +6,7 @@ import traceback
 import urllib.request
 from contextlib import suppress
 
-from .cancel import wait_with_cancel_event
+from .cancel import is_canceled, wait_with_cancel_event
 from .ears import Ears
 from .leds import Led
 from .resources import Resources
@@ -20,7 +20,8 @@ class ChoreographyInterpreter:
         self.running_task = None
         self.running_ref = None
         self.timescale = 0
-        self.cancel_event = None
+        # Cancellation token of the running choreography, if any
+        self.cancel_token = None
         # Random is for ifne, only used in taichi.
         # Generator based on original code yielding 0-29, not exactly
         # uniformly.
@@ -300,7 +301,7 @@ class ChoreographyInterpreter:
 
     async def attend(self, index, chor):
         await self.ears.wait_while_running()
-        await self.sound.wait_until_done(self.cancel_event)
+        await self.sound.wait_until_done(self.cancel_token)
         return index
 
     async def setmotordir(self, index, chor):
@@ -323,6 +324,8 @@ class ChoreographyInterpreter:
         next_time = time.time()
         opcode_handlers = ChoreographyInterpreter.OPCODE_HANDLERS[opcodes]
         while index < len(chor):
+            if is_canceled(self.cancel_token):
+                return
             wait = chor[index]
             # do some wait now
             next_time = next_time + (wait * self.timescale / 1000.0)
@@ -357,7 +360,7 @@ class ChoreographyInterpreter:
                 int(ref0[1:]) & 7
             ]
         chorst_oreille_chance = None
-        while True:
+        while not is_canceled(self.cancel_token):
             if chorst_oreille_chance is None:
                 chorst_oreille_chance = 0
                 left, right = random.choice([(0, 10), (10, 0)])  # nosec B311
@@ -395,7 +398,12 @@ class ChoreographyInterpreter:
             for ix in range(chorst_loops):
                 await self.play_binary(chor, "streaming", chorst_tempo)
 
-    async def start(self, ref):
+    async def start(self, ref, token=None):
+        """
+        Start playing a choreography, until it completes, it is stopped or
+        token is canceled.
+        """
+        self.cancel_token = token
         if ref != self.running_ref:
             if self.running_task:
                 self.running_task.cancel()
@@ -412,28 +420,43 @@ class ChoreographyInterpreter:
             self.running_task = None
             self.running_ref = None
 
-    async def wait_until_complete(self, event=None):
-        self.cancel_event = event
-        await wait_with_cancel_event(self.running_task, event, self.stop)
+    async def wait_until_complete(self, token=None):
+        if token is not None:
+            self.cancel_token = token
+        await wait_with_cancel_event(
+            self.running_task, self.cancel_token, self.stop
+        )
         self.running_task = None
         self.running_ref = None
-        self.cancel_event = None
+        self.cancel_token = None
+
+    @staticmethod
+    async def load(ref):
+        """
+        Load a choreography ahead of play(): return its binary form, or ref
+        itself for streaming choreographies.
+        """
+        if ref.startswith(ChoreographyInterpreter.STREAMING_URN):
+            return ref
+        if ref.startswith(ChoreographyInterpreter.DATA_MTL_BINARY_SCHEME):
+            return urllib.request.urlopen(ref).read()
+        # Assume a resource for now.
+        file = await Resources.find("choreographies", ref)
+        return file.read_bytes()
 
     async def play(self, ref):
-        self.cancel_event = None
+        """
+        Play a choreography, given by its reference or its binary form.
+        """
         try:
-            if ref.startswith(ChoreographyInterpreter.STREAMING_URN):
-                await self.play_streaming(ref)
-            elif ref.startswith(
-                ChoreographyInterpreter.DATA_MTL_BINARY_SCHEME
-            ):
-                chor = urllib.request.urlopen(ref).read()
-                await self.play_binary(chor)
+            if isinstance(ref, bytes):
+                chor = ref
             else:
-                # Assume a resource for now.
-                file = await Resources.find("choreographies", ref)
-                chor = file.read_bytes()
+                chor = await ChoreographyInterpreter.load(ref)
+            if isinstance(chor, bytes):
                 await self.play_binary(chor)
+            else:
+                await self.play_streaming(chor)
         except asyncio.CancelledError:
             raise
         except Exception:
@@ -0,0 +1,45 @@
+"""
+Fleet of virtual rabbits, for tests and demos: several Nabd instances, each
+with its own NabIOVirtual, in one process and event loop.
+
+Rabbit i listens on TCP/IP port base_port + 2 * i (its virtual display on the
+next port) and on Unix socket <socket_prefix>-i. Services of rabbit i are
+configured with NABD_PORT_NUMBER and NABD_SOCKET environment variables.
+"""
+
+from typing import List
+
+from nabcommon.nabservice import NabService
+
+from .nabd import Nabd
+from .nabio_virtual import NabIOVirtual
+
+
+def rabbit_port(index: int, base_port: int = NabService.PORT_NUMBER) -> int:
+    return base_port + 2 * index
+
+
+def rabbit_socket(index: int, socket_prefix: str = NabService.SOCKET) -> str:
+    if not socket_prefix:
+        # Unix sockets are disabled
+        return ""
+    return f"{socket_prefix}-{index}"
+
+
+def create_fleet(
+    count: int,
+    base_port: int = NabService.PORT_NUMBER,
+    socket_prefix: str = NabService.SOCKET,
+) -> List[Nabd]:
+    rabbits = []
+    for index in range(count):
+        port = rabbit_port(index, base_port)
+        nabio = NabIOVirtual(port + 1)
+        rabbits.append(
+            Nabd(
+                nabio,
+                port=port,
+                unix_socket=rabbit_socket(index, socket_prefix),
+            )
+        )
+    return rabbits
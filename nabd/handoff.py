@@ -0,0 +1,62 @@
+import asyncio
+import json
+import os
+import socket
+import tempfile
+from typing import Any, Dict, Optional, Tuple
+
+# Environment variable with the path of the handoff file, on exec
+HANDOFF_ENV = "NABD_HANDOFF"
+
+
+def inheritable_fd(sock: Any) -> int:
+    """
+    Return a duplicate of the file descriptor of sock, inherited by the new
+    process on exec, and kept open when sock is closed.
+    """
+    fd = os.dup(sock.fileno())
+    os.set_inheritable(fd, True)
+    return fd
+
+
+def save(handoff: Dict[str, Any], directory: Optional[str] = None) -> str:
+    """
+    Write handoff data to a new file in directory (or the default temporary
+    directory) and return its path.
+    """
+    fd, path = tempfile.mkstemp(
+        prefix="nabd-handoff-", suffix=".json", dir=directory
+    )
+    with os.fdopen(fd, "w") as f:
+        json.dump(handoff, f)
+    return path
+
+
+def load(path: str) -> Dict[str, Any]:
+    """
+    Read and remove a handoff file.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    finally:
+        os.unlink(path)
+
+
+def listening_socket(fd: int) -> socket.socket:
+    sock = socket.socket(fileno=fd)
+    sock.set_inheritable(False)
+    return sock
+
+
+async def open_connection(
+    fd: int,
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """
+    Open streams on a service connection inherited from previous process.
+    """
+    sock = socket.socket(fileno=fd)
+    sock.set_inheritable(False)
+    if sock.family == socket.AF_UNIX:
+        return await asyncio.open_unix_connection(sock=sock)
+    return await asyncio.open_connection(sock=sock)
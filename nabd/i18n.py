@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 
 from nabcommon import singleton_model
 
@@ -11,6 +13,26 @@ class Config(singleton_model.SingletonModel):
         app_label = "nabd"
 
 
+# Locale is cached as it is read for every resource lookup.
+# Cache is updated when Config is saved in this process and reset by nabd
+# when it is notified of a change by another process (config-update packet).
+_cached_locale = None
+
+
+@receiver(post_save, sender=Config)
+def _config_saved(sender, instance, **kwargs):
+    global _cached_locale
+    _cached_locale = instance.locale
+
+
+def invalidate_locale():
+    global _cached_locale
+    _cached_locale = None
+
+
 async def get_locale():
-    config = await Config.load_async()
-    return config.locale
+    global _cached_locale
+    if _cached_locale is None:
+        config = await Config.load_async()
+        _cached_locale = config.locale
+    return _cached_locale
@@ -0,0 +1,185 @@
+import asyncio
+import bisect
+import itertools
+import time
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+import dateutil.parser
+
+# (packet, writer)
+IdleQueueItem = Tuple[Any, Any]
+
+
+def parse_expiration(isodatestr: str) -> float:
+    """
+    Parse an expiration date into a timestamp. Dates without a timezone are
+    in local time.
+    """
+    # Python 3.7's fromisoformat only parses output of isoformat, not all
+    # valid ISO 8601 dates.
+    parsed = dateutil.parser.isoparse(isodatestr)
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed.timestamp()
+
+
+def monotonic_deadline(
+    isodatestr: str, clock: Callable[[], float] = time.monotonic
+) -> float:
+    """
+    Convert an expiration date into a deadline on clock, so it is parsed
+    once and is not affected by later changes of the system time.
+    """
+    return clock() + parse_expiration(isodatestr) - time.time()
+
+
+class _Entry:
+    __slots__ = ("key", "item", "deadline", "enqueued", "handle")
+
+    def __init__(self, key, item, deadline, enqueued):
+        self.key = key
+        self.item = item
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class IdleQueue:
+    """
+    Queue of packets waiting for nabd to be idle.
+
+    Items are ordered by decreasing priority slot (0 by default), then by
+    expiration (earliest first, items without expiration last), then by
+    arrival. Command and message packets with the coalesce slot supersede
+    queued packets of the same type from the same service, restricted to
+    request ids with the same prefix (up to "/") if any.
+
+    Expiration dates are parsed once, into deadlines on a monotonic clock
+    (the loop clock once bound), which also dates arrival of items.
+    Once bound to a loop, items are removed when their deadline is reached.
+    """
+
+    def __init__(self):
+        self.entries: List[_Entry] = []
+        self.counter = itertools.count()
+        self.clock: Callable[[], float] = time.monotonic
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.expired_callback: Optional[Callable[[IdleQueueItem], None]] = None
+
+    def bind_expiration(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        callback: Callable[[IdleQueueItem], None],
+    ):
+        """
+        Call callback on loop with items removed because they expired.
+        """
+        self.loop = loop
+        self.clock = loop.time
+        self.expired_callback = callback
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[IdleQueueItem]:
+        return (entry.item for entry in self.entries)
+
+    def push(self, item: IdleQueueItem) -> List[IdleQueueItem]:
+        """
+        Add an item and return items it supersedes, removed from the queue.
+        """
+        packet, writer = item
+        superseded = []
+        if packet.get("coalesce", False):
+            prefix = self._request_id_prefix(packet)
+            kept = []
+            for entry in self.entries:
+                other_packet, other_writer = entry.item
+                if (
+                    other_writer == writer
+                    and other_packet["type"] == packet["type"]
+                    and self._request_id_prefix(other_packet) == prefix
+                ):
+                    self._cancel_timer(entry)
+                    superseded.append(entry.item)
+                else:
+                    kept.append(entry)
+            self.entries = kept
+        if "expiration" in packet:
+            deadline: Optional[float] = monotonic_deadline(
+                packet["expiration"], self.clock
+            )
+        else:
+            deadline = None
+        key = (
+            -packet.get("priority", 0),
+            float("inf") if deadline is None else deadline,
+            next(self.counter),
+        )
+        entry = _Entry(key, item, deadline, self.clock())
+        bisect.insort(self.entries, entry)
+        if deadline is not None and self.loop is not None:
+            entry.handle = self.loop.call_at(deadline, self._expire, entry)
+        return superseded
+
+    def _expire(self, entry: _Entry):
+        entry.handle = None
+        if entry in self.entries:
+            self.entries.remove(entry)
+            if self.expired_callback is not None:
+                self.expired_callback(entry.item)
+
+    @staticmethod
+    def _cancel_timer(entry: _Entry):
+        if entry.handle is not None:
+            entry.handle.cancel()
+            entry.handle = None
+
+    @staticmethod
+    def _request_id_prefix(packet) -> Optional[str]:
+        request_id = packet.get("request_id")
+        if request_id is None or "/" not in request_id:
+            return None
+        return request_id.split("/", 1)[0]
+
+    def defer(self, item: IdleQueueItem):
+        """
+        Put back an item after all items currently queued.
+        """
+        key = (float("inf"), float("inf"), next(self.counter))
+        self.entries.append(_Entry(key, item, None, self.clock()))
+
+    def pop(self) -> IdleQueueItem:
+        entry = self.entries.pop(0)
+        self._cancel_timer(entry)
+        return entry.item
+
+    def expire(self) -> List[IdleQueueItem]:
+        """
+        Remove and return items which deadline is reached but which timer
+        did not fire yet (or all expired items if not bound to a loop).
+        """
+        now = self.clock()
+        expired = []
+        kept = []
+        for entry in self.entries:
+            if entry.deadline is not None and entry.deadline <= now:
+                self._cancel_timer(entry)
+                expired.append(entry.item)
+            else:
+                kept.append(entry)
+        if expired:
+            self.entries = kept
+        return expired
+
+    def wait_time(self) -> float:
+        """
+        Return for how long the oldest item has been waiting, in seconds.
+        """
+        if not self.entries:
+            return 0.0
+        oldest = min(entry.enqueued for entry in self.entries)
+        return self.clock() - oldest
@@ -0,0 +1,119 @@
+import array
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from nabcommon.typing import Animation, Color
+
+from .leds import Led, Leds
+
+RGB = Tuple[int, int, int]
+
+
+class InfoAnimation:
+    """
+    Info animation compiled once, when the info is received.
+
+    Colors of left, center and right leds are converted and deduplicated
+    into a palette, and frames are packed as palette indexes, three per
+    frame. Playing the animation only indexes into them.
+    """
+
+    LEDS = (Led.LEFT, Led.CENTER, Led.RIGHT)
+    SLOTS = ("left", "center", "right")
+
+    __slots__ = ("source", "step", "palette", "frames", "count")
+
+    def __init__(self, animation: Animation):
+        self.source = animation
+        # tempo is in 10ms
+        self.step = max(animation["tempo"], 1) / 100
+        indexes: Dict[RGB, int] = {}
+        frames = array.array("H")
+        for color in animation["colors"]:
+            for slot in InfoAnimation.SLOTS:
+                rgb = InfoAnimation.rgb(color.get(slot))
+                frames.append(indexes.setdefault(rgb, len(indexes)))
+        self.palette: List[RGB] = list(indexes)
+        self.frames = frames
+        self.count = len(animation["colors"])
+
+    @staticmethod
+    def rgb(color: Optional[Color]) -> RGB:
+        """
+        Convert a color, in hexadecimal with an optional leading #, to RGB.
+        Raise ValueError for palette and symbolic colors.
+        """
+        if color is None or color == "":
+            return (0, 0, 0)
+        if not isinstance(color, str):
+            raise ValueError(f"Unsupported palette color {color}")
+        try:
+            value = int(color[1:] if color.startswith("#") else color, 16)
+        except ValueError:
+            raise ValueError(f"Unsupported color {color}") from None
+        if not 0 <= value <= 0xFFFFFF:
+            raise ValueError(f"Unsupported color {color}")
+        return ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+
+    @staticmethod
+    def check(animation: Animation) -> Optional[str]:
+        """
+        Return an error message if colors of animation are not supported.
+        """
+        try:
+            for color in animation["colors"]:
+                for slot in InfoAnimation.SLOTS:
+                    InfoAnimation.rgb(color.get(slot))
+        except ValueError as err:
+            return str(err)
+        return None
+
+
+class InfoPlayer:
+    """
+    Play an info animation on the leds from timers of the event loop, only
+    setting leds which color changed since previous frame.
+    """
+
+    def __init__(
+        self,
+        leds: Leds,
+        info: InfoAnimation,
+        loop: asyncio.AbstractEventLoop,
+    ):
+        self.leds = leds
+        self.info = info
+        self.loop = loop
+        self.index = 0
+        self.previous = -1
+        self.next_time = 0.0
+        self.handle: Optional[asyncio.TimerHandle] = None
+
+    def start(self):
+        self.next_time = self.loop.time()
+        self.show_frame()
+
+    def stop(self):
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+
+    def show_frame(self):
+        info = self.info
+        if info.count == 0:
+            return
+        frames = info.frames
+        base = self.index * 3
+        previous = self.previous
+        for offset in range(3):
+            color_index = frames[base + offset]
+            if previous < 0 or frames[previous + offset] != color_index:
+                r, g, b = info.palette[color_index]
+                self.leds.set1(InfoAnimation.LEDS[offset], r, g, b)
+        if info.count > 1:
+            self.previous = base
+            self.index = (self.index + 1) % info.count
+            # Deadlines do not drift with the time spent here, and late
+            # frames are not played back to back.
+            self.next_time = max(self.next_time + info.step, self.loop.time())
+            self.handle = self.loop.call_at(self.next_time, self.show_frame)
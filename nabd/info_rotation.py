@@ -0,0 +1,101 @@
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+
+class _Entry:
+    __slots__ = ("priority", "changed", "fresh")
+
+    def __init__(self, priority: int, changed: int):
+        self.priority = priority
+        self.changed = changed
+        # Whether info changed since it was last shown
+        self.fresh = True
+
+    def key(self) -> Tuple[int, int]:
+        # Highest priority first, then most recently changed
+        return (-self.priority, -self.changed)
+
+
+class InfoRotation:
+    """
+    Order in which the idle loop shows infos, and for how long.
+
+    Infos which changed since they were last shown come first, by
+    decreasing priority slot (0 by default) then most recently changed
+    first. The idle loop is notified when an info changes, so that it is
+    shown immediately. Other infos are then shown in turn, in the same
+    order, except infos with a negative priority which are only shown once
+    after each change.
+
+    Each info is shown for a slot which length depends on the number of
+    infos shown in turn, so that a cycle lasts about CYCLE_LENGTH seconds,
+    within MIN_SLOT and MAX_SLOT.
+    """
+
+    CYCLE_LENGTH = 60.0
+    MIN_SLOT = 5.0
+    MAX_SLOT = 30.0
+
+    def __init__(self):
+        self.entries: Dict[str, _Entry] = {}
+        self.counter = itertools.count()
+        # Infos left to show in current cycle
+        self.cycle: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def update(self, info_id: str, priority: int = 0, changed: bool = True):
+        """
+        Record an info which animation or priority was set.
+        """
+        entry = self.entries.get(info_id)
+        if entry is None or changed:
+            self.entries[info_id] = _Entry(priority, next(self.counter))
+        else:
+            entry.priority = priority
+
+    def remove(self, info_id: str):
+        self.entries.pop(info_id, None)
+
+    def next(self) -> Optional[Tuple[str, float]]:
+        """
+        Return the next info to show and for how long, or None if there is
+        nothing to show.
+        """
+        fresh = [
+            (entry.key(), info_id)
+            for info_id, entry in self.entries.items()
+            if entry.fresh
+        ]
+        if fresh:
+            _, info_id = min(fresh)
+            slot = self.slot()
+            self.entries[info_id].fresh = False
+            return info_id, slot
+        while True:
+            if not self.cycle:
+                self.cycle = self._rotated()
+                if not self.cycle:
+                    return None
+            info_id = self.cycle.pop(0)
+            entry = self.entries.get(info_id)
+            if entry is not None and entry.priority >= 0:
+                return info_id, self.slot()
+
+    def _rotated(self) -> List[str]:
+        rotated = [
+            (entry.key(), info_id)
+            for info_id, entry in self.entries.items()
+            if entry.priority >= 0
+        ]
+        return [info_id for _, info_id in sorted(rotated)]
+
+    def slot(self) -> float:
+        shown = sum(
+            1
+            for entry in self.entries.values()
+            if entry.priority >= 0 or entry.fresh
+        )
+        slot = InfoRotation.CYCLE_LENGTH / max(shown, 1)
+        return max(InfoRotation.MIN_SLOT, min(InfoRotation.MAX_SLOT, slot))
@@ -0,0 +1,127 @@
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+
+
+class Inotify:
+    """
+    Minimal wrapper around Linux inotify(7), through libc.
+    The file descriptor is non-blocking so pending events can be checked
+    with a single read(2) without involving any event loop.
+    """
+
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = os.O_CLOEXEC
+
+    # Events that change the set of files in a directory.
+    TREE_EVENTS = (
+        IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+        | IN_DELETE_SELF
+        | IN_MOVE_SELF
+    )
+
+    READ_SIZE = 4096
+    # struct inotify_event header: wd, mask, cookie, len
+    EVENT_HEADER = struct.Struct("iIII")
+
+    _libc = None
+
+    def __init__(self):
+        libc = Inotify._load_libc()
+        if libc is None:
+            raise OSError(errno.ENOSYS, "inotify is not available")
+        self.fd = libc.inotify_init1(Inotify.IN_NONBLOCK | Inotify.IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        # Watch descriptors only reporting events on subdirectories
+        self.dirs_only = set()
+
+    @staticmethod
+    def _load_libc():
+        if Inotify._libc is None:
+            name = ctypes.util.find_library("c")
+            if name is None:
+                return None
+            libc = ctypes.CDLL(name, use_errno=True)
+            if not hasattr(libc, "inotify_init1"):
+                return None
+            libc.inotify_add_watch.argtypes = [
+                ctypes.c_int,
+                ctypes.c_char_p,
+                ctypes.c_uint32,
+            ]
+            Inotify._libc = libc
+        return Inotify._libc
+
+    @staticmethod
+    def is_available():
+        try:
+            return Inotify._load_libc() is not None
+        except OSError:
+            return False
+
+    def add_watch(self, path, mask=TREE_EVENTS, dirs_only=False):
+        """
+        Watch a directory (not recursively). With dirs_only, only events on
+        its subdirectories are reported by has_events().
+        Return the watch descriptor, or None if path could not be watched.
+        """
+        wd = Inotify._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            logging.debug(f"inotify: cannot watch {path}: {os.strerror(err)}")
+            return None
+        if dirs_only:
+            self.dirs_only.add(wd)
+        else:
+            self.dirs_only.discard(wd)
+        return wd
+
+    def has_events(self):
+        """
+        Consume pending events and return whether there were any.
+        """
+        pending = False
+        while True:
+            try:
+                data = os.read(self.fd, Inotify.READ_SIZE)
+            except BlockingIOError:
+                return pending
+            if not data:
+                return pending
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = Inotify.EVENT_HEADER.unpack_from(
+                    data, offset
+                )
+                offset += Inotify.EVENT_HEADER.size + length
+                if wd in self.dirs_only and not mask & (
+                    Inotify.IN_ISDIR
+                    | Inotify.IN_DELETE_SELF
+                    | Inotify.IN_MOVE_SELF
+                    | Inotify.IN_IGNORED
+                ):
+                    # File created or removed next to watched subdirectories
+                    continue
+                pending = True
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
@@ -42,6 +42,17 @@ class Leds(object, metaclass=abc.ABCMeta):
         Stop the leds thread, if any.
         """
 
+    def suspend(self):
+        """
+        Stop the leds thread, if any, while the rabbit is asleep.
+        Commands received while suspended are applied on resume.
+        """
+
+    def resume(self):
+        """
+        Restart the leds thread after suspend().
+        """
+
 
 class LedsSoft(Leds, metaclass=abc.ABCMeta):
     """
@@ -63,7 +74,7 @@ class LedsSoft(Leds, metaclass=abc.ABCMeta):
 
     def run(self):
         with self.condition:
-            while self.running:
+            while True:
                 show = False
                 with self.pending_lock:
                     for cmd, led, (r, g, b) in self.pending:
@@ -143,6 +154,9 @@ class LedsSoft(Leds, metaclass=abc.ABCMeta):
                     self.last_pulse = None
                 if show:
                     self.do_show()
+                if not self.running:
+                    # Pending commands were applied
+                    break
                 timeout = None
                 if next_pulse is not None:
                     delta = next_pulse - time.time()
@@ -174,6 +188,19 @@ class LedsSoft(Leds, metaclass=abc.ABCMeta):
             self.condition.notify()
         self.thread.join()
 
+    def suspend(self):
+        if self.running:
+            self.stop()
+
+    def resume(self):
+        if not self.running:
+            self.running = True
+            if self.last_pulse is not None:
+                # Do not catch up with pulses missed while suspended
+                self.last_pulse = time.time()
+            self.thread = Thread(target=self.run, daemon=True)
+            self.thread.start()
+
     @abc.abstractmethod
     def do_set(self, led, red, green, blue):
         """
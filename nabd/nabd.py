@@ -1,38 +1,54 @@
 import asyncio
-import collections
+import base64
+import contextlib
 import datetime
-import gc
 import getopt
-import json
+import itertools
 import logging
 import os
+import signal
 import socket
+import struct
 import subprocess
 import sys
 import time
 import traceback
 from enum import Enum
-from typing import Deque, Dict, List, Optional, Tuple, Type, Union, cast
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+    cast,
+)
 
-import dateutil.parser
 from lockfile import AlreadyLocked, LockFailed  # type: ignore
 from lockfile.pidlockfile import PIDLockFile  # type: ignore
 
-from nabcommon import hardware, nablogging, network, settings
+from nabcommon import codec, hardware, nablogging, network, settings
 from nabcommon.nabservice import NabService
 from nabcommon.typing import (
     Animation,
     AnyPacket,
+    BatchPacket,
     ButtonEventType,
     CommandPacket,
     CommandSequenceItem,
     EarsPacket,
     EventPacket,
     EventTypes,
+    HelloPacket,
     InfoPacket,
     MessagePacket,
     ModePacket,
     NabdPacket,
+    PreparePacket,
+    RegisterPacket,
     ResponseErrorPacketProto,
     ResponseExpiredPacketProto,
     ResponseFailurePacketProto,
@@ -40,16 +56,34 @@ from nabcommon.typing import (
     ResponseOKPacketProto,
     ResponsePacket,
     ResponsePacketProto,
+    ResponsePreparePacketProto,
+    ResponseRegisterPacketProto,
+    ResponseThrottledPacketProto,
     RfidWritePacket,
     ServicePacket,
     ServiceRequestPacket,
     SleepPacket,
     TestPacket,
 )
-
+from nabcommon.validator import compile_validators
+
+from . import handoff
+from .admission import (
+    DEFAULT_SERVICE_CLASS,
+    TokenBucket,
+    admission_key,
+    admission_policy,
+    service_class,
+)
 from .ears import Ears
+from .idle_queue import IdleQueue, monotonic_deadline
+from .info_animation import InfoAnimation
+from .info_rotation import InfoRotation
 from .leds import Led
 from .nabio import NabIO
+from .outbound import OutboundQueue, PacketKind
+from .prepared import PreparedSequence, PreparedSequences
+from .registry import ResourceRegistry, UnknownResource, resource_hash
 from .rfid import (
     DEFAULT_RFID_TIMEOUT,
     TAG_APPLICATION_NONE,
@@ -57,6 +91,9 @@ from .rfid import (
     TagFlags,
     TagTechnology,
 )
+from .scheduler import Scheduler
+from .state_file import StateFile
+from .subscriptions import EventSubscriptions
 
 _PYTEST = os.path.basename(sys.argv[0]) != "nabd.py"
 
@@ -68,6 +105,8 @@ STATUS_OK = cast(ResponseOKPacketProto, {"status": "ok"})
 STATUS_CANCELED = cast(ResponseOKPacketProto, {"status": "canceled"})
 STATUS_FAILURE = cast(ResponseFailurePacketProto, {"status": "failure"})
 
+PACKET_VALIDATORS = compile_validators(ServicePacket)
+
 
 def status_error(
     error_class: str, error_message: str
@@ -98,74 +137,142 @@ class Nabd:
     EAR_MOVEMENT_TIMEOUT = 0.5
 
     SYSTEMD_ACTIVATED_FD = 3
+    # How long a restart waits for services to be between packets
+    HANDOFF_TIMEOUT = 10.0
+    HANDOFF_POLL = 0.1
 
-    def __init__(self, nabio: NabIO):
+    def __init__(
+        self,
+        nabio: NabIO,
+        port: Optional[int] = None,
+        unix_socket: Optional[str] = None,
+        state_file: Optional[str] = None,
+        handoff_file: Optional[str] = None,
+    ):
+        """
+        Sockets default to NabService's, which may be passed by systemd.
+        port and unix_socket are used to run several instances in the same
+        process (see fleet).
+        Runtime state is saved to state_file, if any, and restored from it
+        on start.
+        If handoff_file is set, listening sockets, service connections and
+        state are taken over from the process which wrote it instead (see
+        handoff_to_new_process).
+        """
         settings.configure(type(self).__name__.lower())
         self.nabio = nabio
+        self.socket_activation = port is None and unix_socket is None
+        self.port = NabService.PORT_NUMBER if port is None else port
+        self.unix_socket = (
+            NabService.SOCKET if unix_socket is None else unix_socket
+        )
         self.idle_cv = asyncio.Condition()
-        self.idle_queue: Deque[IdleQueueItem] = collections.deque()
+        self.idle_queue = IdleQueue()
+        # Commands and messages waiting for their date
+        self.scheduler = Scheduler()
         # Current position of ears in idle mode
         self.ears = {
             "left": Nabd.INIT_EAR_POSITION,
             "right": Nabd.INIT_EAR_POSITION,
         }
-        self.info: Dict[
-            str, Animation
-        ] = {}  # Info persists across service connections.
+        # Info persists across service connections.
+        self.info: Dict[str, Animation] = {}
+        # Info compiled for the idle loop
+        self.info_animations: Dict[str, InfoAnimation] = {}
+        # Same compiled animations by resource hash, shared by info with
+        # the same (typically registered) animation
+        self.compiled_animations: Dict[str, InfoAnimation] = {}
+        # Order in which info is shown
+        self.info_rotation = InfoRotation()
+        # Timers removing info with an expiration
+        self.info_timers: Dict[str, asyncio.TimerHandle] = {}
         self.state = State.IDLE
+        # Info, ears and scheduled packets saved across restarts
+        self.state_file = None if state_file is None else StateFile(state_file)
+        self.handoff_file = handoff_file
+        # Handoff file written for the new process, once restarting
+        self.handoff_path: Optional[str] = None
+        self.handoff_task: Optional[asyncio.Task] = None
         # Dictionary of writers, i.e. connected services
         # For each writer, value is the list of registered events
         self.service_writers: Dict[asyncio.StreamWriter, List[str]] = {}
+        # Readers of services waiting for their next packet
+        self.service_readers: Dict[
+            asyncio.StreamWriter, codec.BufferedReader
+        ] = {}
+        # Connections taken over from previous process
+        self.service_tasks: Set[asyncio.Task] = set()
+        # Index of events registered in idle mode
+        self.event_subscriptions = EventSubscriptions()
+        # Animations and choreographies registered by services
+        self.registry = ResourceRegistry()
+        # Sequences prepared by services
+        self.prepared = PreparedSequences()
         self.interactive_service_writer: Optional[asyncio.StreamWriter] = None
         # Events registered in interactive mode
         self.interactive_service_events: List[EventTypes] = []
+        # Commands and batches played for the interactive service
+        self.interactive_tasks: Set[asyncio.Task] = set()
+        # Outbound queues of connected services, and counters of packets
+        # dropped by disconnected services.
+        self.outbound_queues: Dict[asyncio.StreamWriter, OutboundQueue] = {}
+        # Framings negotiated by services with a hello packet
+        self.service_framings: Dict[asyncio.StreamWriter, codec.Framing] = {}
+        self.outbound_dropped = 0
+        self.outbound_coalesced = 0
+        # Admission control: service class, peer and token bucket of
+        # connected services, token buckets shared by connections of the
+        # same peer (by admission key), and number of packets throttled by
+        # service class.
+        self.service_classes: Dict[asyncio.StreamWriter, str] = {}
+        self.service_peers: Dict[asyncio.StreamWriter, Any] = {}
+        self.service_buckets: Dict[asyncio.StreamWriter, TokenBucket] = {}
+        self.admission_buckets: Dict[str, TokenBucket] = {}
+        self.throttled: Dict[str, int] = {}
+        # Time and CPU time spent asleep, and when current sleep started.
+        self.asleep_time = 0.0
+        self.asleep_cpu_time = 0.0
+        self.asleep_since: Optional[Tuple[float, float]] = None
+        # Packets giving feedback while asleep (see nabio_resumed)
+        self.nabio_resumed_count = 0
         self.running = True
         self.loop: Optional[asyncio.events.AbstractEventLoop] = None
+        self.idle_task: Optional[asyncio.Task] = None
+        self.server_task: Optional[asyncio.Task] = None
         self._ears_moved_task: Optional[asyncio.Future] = None
         self.playing_cancelable = False
         self.playing_request_id: Optional[str] = None
+        self.connectivity = network.ConnectivityMonitor(
+            self.nabio.network_interface(), self.connectivity_callback
+        )
         Nabd.leds_boot(self.nabio, 2)
         if self.nabio.has_sound_input():
             from . import i18n
-            from .asr import ASR
-            from .nlu import NLU
+            from .recognizer import Recognizer
 
             config = i18n.Config.load()
-            self._asr_locale = ASR.get_locale(config.locale)
-            self.asr: Optional[ASR] = ASR(self._asr_locale)
-            Nabd.leds_boot(self.nabio, 3)
-            self._nlu_locale = NLU.get_locale(config.locale)
-            self.nlu: Optional[NLU] = NLU(self._nlu_locale)
+            # ASR and NLU models are loaded by the worker process
+            self.recognizer: Optional[Recognizer] = Recognizer(config.locale)
             Nabd.leds_boot(self.nabio, 4)
         else:
-            self.asr = None
-            self.nlu = None
+            self.recognizer = None
 
     async def reload_config(self):
         """
         Reload configuration.
         """
-        if self.nabio.has_sound_input():
-            from . import i18n
-            from .asr import ASR
-            from .nlu import NLU
+        from . import i18n
 
+        # Locale is cached for resources lookups
+        i18n.invalidate_locale()
+        if self.recognizer is not None:
             config = await i18n.Config.load_async()
-            new_asr_locale = ASR.get_locale(config.locale)
-            new_nlu_locale = NLU.get_locale(config.locale)
-            if new_asr_locale != self._asr_locale:
+            if config.locale != self.recognizer.locale and (
+                self.recognizer.models(config.locale)
+                != self.recognizer.models(self.recognizer.locale)
+            ):
                 Nabd.leds_boot(self.nabio, 2)
-                self._asr_locale = new_asr_locale
-                self.asr = None
-                gc.collect()
-                self.asr = ASR(self._asr_locale)
-                Nabd.leds_boot(self.nabio, 3)
-            if new_nlu_locale != self._nlu_locale:
-                Nabd.leds_boot(self.nabio, 3)
-                self._nlu_locale = new_nlu_locale
-                self.nlu = None
-                gc.collect()
-                self.nlu = NLU(self._nlu_locale)
+                await self.recognizer.set_locale(config.locale)
                 Nabd.leds_boot(self.nabio, 4)
             self.nabio.set_leds(None, None, None, None, None)
         self.nabio.pulse(Led.BOTTOM, (255, 0, 255))  # Fuchsia
@@ -178,15 +285,30 @@ class Nabd:
         """
         left, right = self.ears["left"], self.ears["right"]
         await self.nabio.move_ears_with_leds((255, 0, 255), left, right)
-        self.nabio.pulse(Led.BOTTOM, (255, 0, 255))  # Fuchsia
-        if network.ip_address(self.nabio.network_interface()) is None:
+        self._pulse_connectivity()
+
+    def _pulse_connectivity(self):
+        """
+        Set bottom led according to last known network connectivity.
+        """
+        connectivity = self.connectivity.state
+        if connectivity == network.Connectivity.NONE:
             # not even a local network connection: real bad
             logging.error("no network connection")
             self.nabio.pulse(Led.BOTTOM, (255, 0, 0))  # Red
-        elif not network.internet_connection():
+        elif connectivity == network.Connectivity.LOCAL:
             # local network connection, but no Internet access: not so good
             logging.warning("no Internet access")
             self.nabio.pulse(Led.BOTTOM, (255, 165, 0))  # Orange
+        else:
+            self.nabio.pulse(Led.BOTTOM, (255, 0, 255))  # Fuchsia
+
+    def connectivity_callback(self, connectivity):
+        """
+        Thread: run_loop (connectivity monitor)
+        """
+        if self.state == State.IDLE:
+            self._pulse_connectivity()
 
     async def sleep_setup(self):
         self.nabio.set_leds(None, None, None, None, None)
@@ -194,6 +316,66 @@ class Nabd:
             Nabd.SLEEP_EAR_POSITION, Nabd.SLEEP_EAR_POSITION
         )
 
+    async def suspend(self):
+        """
+        Enter low power mode once asleep: stop connectivity checks, the leds
+        thread and the sound device, and tell services subscribed to sleep
+        events. The info loop waits for the transition to idle.
+        """
+        await self.connectivity.stop()
+        await self.nabio.suspend()
+        self.asleep_since = (time.monotonic(), time.process_time())
+        self.broadcast_sleep_event("asleep")
+
+    async def resume(self):
+        """
+        Leave low power mode, before transitioning out of asleep state.
+        """
+        assert self.loop is not None
+        if self.asleep_since is not None:
+            self.asleep_time, self.asleep_cpu_time = self.sleep_times()
+            self.asleep_since = None
+        await self.nabio.resume()
+        self.connectivity.start(self.loop)
+        self.broadcast_sleep_event("awake")
+
+    @contextlib.asynccontextmanager
+    async def nabio_resumed(self):
+        """
+        Resume leds and sound while asleep, for packets processed without
+        waking up which give feedback to the user.
+        """
+        if self.state != State.ASLEEP:
+            yield
+            return
+        self.nabio_resumed_count += 1
+        if self.nabio_resumed_count == 1:
+            await self.nabio.resume()
+        try:
+            yield
+        finally:
+            self.nabio_resumed_count -= 1
+            if self.nabio_resumed_count == 0 and self.state == State.ASLEEP:
+                await self.nabio.suspend()
+
+    def sleep_times(self) -> Tuple[float, float]:
+        """
+        Return time and CPU time (of all threads) spent asleep.
+        """
+        if self.asleep_since is None:
+            return self.asleep_time, self.asleep_cpu_time
+        started, cpu_started = self.asleep_since
+        return (
+            self.asleep_time + time.monotonic() - started,
+            self.asleep_cpu_time + time.process_time() - cpu_started,
+        )
+
+    def broadcast_sleep_event(self, event: str):
+        self.broadcast_event(
+            "sleep",
+            {"type": "sleep_event", "event": event, "time": time.time()},
+        )
+
     async def idle_worker_loop(self):
         """
         Idle worker loop is responsible for playing enqueued messages and
@@ -206,21 +388,20 @@ class Nabd:
                 while self.running:
                     # Check if we have something to do.
                     if self.state == State.IDLE and len(self.idle_queue) > 0:
-                        item = self.idle_queue.popleft()
-                        await self.process_idle_item(item)
+                        item = self.next_idle_item()
+                        if item is not None:
+                            await self.process_idle_item(item)
                     else:
-                        if (
-                            self.state == State.IDLE
-                            and len(self.info.items()) > 0
-                        ):
-                            for key, value in self.info.copy().items():
-                                notified = await self.nabio.play_info(
-                                    self.idle_cv,
-                                    value["tempo"],
-                                    value["colors"],
-                                )
-                                if notified:
-                                    break
+                        shown = None
+                        if self.state == State.IDLE:
+                            shown = self.info_rotation.next()
+                        if shown is not None:
+                            info_id, slot = shown
+                            await self.nabio.play_info(
+                                self.idle_cv,
+                                self.info_animations[info_id],
+                                slot,
+                            )
                         else:
                             await self.idle_cv.wait()
         except KeyboardInterrupt:
@@ -247,6 +428,74 @@ class Nabd:
         self.interactive_service_writer = None
         await self.transition_to(State.IDLE)
 
+    def check_queue_quota(
+        self, packet: ServicePacket, writer: asyncio.StreamWriter
+    ) -> bool:
+        """
+        Return whether packet can be queued or scheduled, or reply that it
+        is throttled as its service class has too many packets queued or
+        scheduled.
+        """
+        if packet.get("coalesce", False):
+            return True
+        name = self.service_classes.get(writer, DEFAULT_SERVICE_CLASS)
+        queued = sum(
+            1
+            for _, other_writer in itertools.chain(
+                self.idle_queue, self.scheduler
+            )
+            if self.service_classes.get(other_writer) == name
+        )
+        if queued >= admission_policy(name).max_queued:
+            self.write_throttled_response(
+                packet, writer, "Too many queued packets"
+            )
+            return False
+        return True
+
+    async def enqueue_idle_item(
+        self,
+        packet: ServicePacket,
+        writer: asyncio.StreamWriter,
+        admitted: bool = False,
+    ):
+        """
+        Add an item to the idle queue, replying to items it supersedes.
+        admitted is true for scheduled packets, which quota was checked
+        when they were received.
+        Thread: service_loop
+        """
+        if not admitted and not self.check_queue_quota(packet, writer):
+            return
+        self.prepared.resolve(packet)
+        async with self.idle_cv:
+            for superseded in self.idle_queue.push((packet, writer)):
+                self.write_response_packet(
+                    superseded[0], STATUS_CANCELED, superseded[1]
+                )
+            self.idle_cv.notify()
+
+    def idle_item_expired(self, item: IdleQueueItem):
+        """
+        Reply to an item removed from the idle queue as it expired.
+        Thread: run (timer)
+        """
+        self.write_response_packet(item[0], STATUS_EXPIRED, item[1])
+
+    def expire_idle_items(self):
+        for expired in self.idle_queue.expire():
+            self.idle_item_expired(expired)
+
+    def next_idle_item(self) -> Optional[IdleQueueItem]:
+        """
+        Pop next item from the idle queue, after removing expired items.
+        The lock is acquired when this function is called.
+        """
+        self.expire_idle_items()
+        if len(self.idle_queue) == 0:
+            return None
+        return self.idle_queue.pop()
+
     async def process_idle_item(self, item: IdleQueueItem):
         """
         Process an item from the idle queue.
@@ -254,97 +503,69 @@ class Nabd:
         Thread: idle_worker_loop
         """
         while True:
-            if "expiration" in item[0] and self.is_past(
-                cast(CommandPacket, item[0])["expiration"]
-            ):
-                self.write_response_packet(item[0], STATUS_EXPIRED, item[1])
-                if len(self.idle_queue) == 0:
-                    await self.set_state(State.IDLE)
-                    break
-                else:
-                    item = self.idle_queue.popleft()
-            else:
-                if item[0]["type"] == "command":
-                    await self.set_state(State.PLAYING)
-                    await self.perform(item[0], item[1])
-                    if len(self.idle_queue) == 0:
-                        await self.set_state(State.IDLE)
+            if item[0]["type"] == "command":
+                await self.set_state(State.PLAYING)
+                await self.perform(item[0], item[1])
+            elif item[0]["type"] == "message":
+                await self.set_state(State.PLAYING)
+                await self.perform(item[0], item[1])
+            elif item[0]["type"] == "batch":
+                await self.set_state(State.PLAYING)
+                await self.perform_batch(item[0], item[1])
+            elif item[0]["type"] == "sleep":
+                # Check idle_queue doesn't only include 'sleep' items.
+                has_non_sleep = False
+                for other_item in self.idle_queue:
+                    if other_item[0]["type"] != "sleep":
+                        has_non_sleep = True
                         break
-                    else:
-                        item = self.idle_queue.popleft()
-                elif item[0]["type"] == "message":
-                    await self.set_state(State.PLAYING)
-                    await self.perform(item[0], item[1])
-                    if len(self.idle_queue) == 0:
-                        await self.set_state(State.IDLE)
-                        break
-                    else:
-                        item = self.idle_queue.popleft()
-                elif item[0]["type"] == "sleep":
-                    # Check idle_queue doesn't only include 'sleep' items.
-                    has_non_sleep = False
-                    for other_item in self.idle_queue:
-                        if other_item[0]["type"] != "sleep":
-                            has_non_sleep = True
-                            break
-                    if has_non_sleep:
-                        self.idle_queue.append(item)
-                    else:
-                        self.write_response_packet(item[0], STATUS_OK, item[1])
-                        await self.set_state(State.ASLEEP)
-                        break
-                elif (
-                    item[0]["type"] == "mode"
-                    and item[0]["mode"] == "interactive"
-                ):
+                if has_non_sleep:
+                    self.idle_queue.defer(item)
+                else:
                     self.write_response_packet(item[0], STATUS_OK, item[1])
-                    await self.set_state(State.INTERACTIVE)
-                    self.interactive_service_writer = item[1]
-                    if "events" in item[0]:
-                        self.interactive_service_events = item[0]["events"]
-                    else:
-                        self.interactive_service_events = ["ears", "button"]
+                    await self.set_state(State.ASLEEP)
                     break
-                elif item[0]["type"] == "test":
-                    await self.set_state(State.PLAYING)
-                    await self.do_process_test_packet(
-                        cast(TestPacket, item[0]), item[1]
-                    )
-                    if len(self.idle_queue) == 0:
-                        await self.set_state(State.IDLE)
-                        break
-                    else:
-                        item = self.idle_queue.popleft()
-                elif item[0]["type"] == "rfid_write":
-                    await self.do_process_rfid_write_packet(item[0], item[1])
-                    if len(self.idle_queue) == 0:
-                        await self.set_state(State.IDLE)
-                        break
-                    else:
-                        item = self.idle_queue.popleft()
+            elif (
+                item[0]["type"] == "mode" and item[0]["mode"] == "interactive"
+            ):
+                self.write_response_packet(item[0], STATUS_OK, item[1])
+                await self.set_state(State.INTERACTIVE)
+                self.interactive_service_writer = item[1]
+                if "events" in item[0]:
+                    self.interactive_service_events = item[0]["events"]
                 else:
-                    raise RuntimeError(f"Unexpected packet {item[0]}")
-
-    def is_past(self, isodatestr):
-        # Python 3.7's fromisoformat only parses output of isoformat, not all
-        # valid ISO 8601 dates.
-        parsed = dateutil.parser.isoparse(isodatestr)
-        if parsed.tzinfo:
-            return parsed < datetime.datetime.now().astimezone()
-        else:
-            return parsed < datetime.datetime.now()
+                    self.interactive_service_events = ["ears", "button"]
+                break
+            elif item[0]["type"] == "test":
+                await self.set_state(State.PLAYING)
+                await self.do_process_test_packet(
+                    cast(TestPacket, item[0]), item[1]
+                )
+            elif item[0]["type"] == "rfid_write":
+                await self.do_process_rfid_write_packet(item[0], item[1])
+            else:
+                raise RuntimeError(f"Unexpected packet {item[0]}")
+            next_item = self.next_idle_item()
+            if next_item is None:
+                await self.set_state(State.IDLE)
+                break
+            item = next_item
 
     async def set_state(self, new_state):
         """
         Thread: idle loop (only called from process_idle_item)
         """
         if new_state != self.state:
+            if self.state == State.ASLEEP:
+                await self.resume()
             if new_state == State.IDLE:
                 await self._do_transition_to_idle()
             if new_state == State.ASLEEP:
                 await self.sleep_setup()
             self.state = new_state
             self.broadcast_state()
+            if new_state == State.ASLEEP:
+                await self.suspend()
 
     async def transition_to(self, new_state):
         """
@@ -352,6 +573,8 @@ class Nabd:
         """
         async with self.idle_cv:
             if self.state != new_state:
+                if self.state == State.ASLEEP:
+                    await self.resume()
                 self.state = new_state
                 if new_state == State.IDLE:
                     await self._do_transition_to_idle()
@@ -362,149 +585,137 @@ class Nabd:
         self, any_packet: AnyPacket, writer: asyncio.StreamWriter
     ):
         """Process an info packet"""
-        packet = self.__check_info_packet(any_packet, writer)
-        if packet:
-            if "animation" in packet:
-                self.info[packet["info_id"]] = packet["animation"]
-            elif packet["info_id"] in self.info:
-                del self.info[packet["info_id"]]
-            self.write_response_packet(packet, STATUS_OK, writer)
+        packet = cast(InfoPacket, any_packet)
+        changed = self.update_info(packet)
+        self.write_response_packet(packet, STATUS_OK, writer)
+        if changed:
             # Signal idle loop to make sure we display updated info
-            async with self.idle_cv:
-                self.idle_cv.notify()
+            await self.notify_idle_worker()
 
-    def __check_info_packet(
-        self, packet: AnyPacket, writer: asyncio.StreamWriter
-    ) -> Optional[InfoPacket]:
-        assert packet["type"] == "info"
-        if "info_id" not in packet:
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet("Missing required info_id slot"),
-                writer,
-            )
-            return None
-        if not isinstance(packet["info_id"], str):
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet(
-                    "Invalid info_id slot, expected a string"
-                ),
-                writer,
-            )
-            return None
-        if "animation" in packet:
-            if not isinstance(packet["animation"], dict):
-                self.write_response_packet(
-                    packet,
-                    status_error_malformed_packet(
-                        "Invalid animation slot, expected a dict"
-                    ),
-                    writer,
-                )
-                return None
-            if "tempo" not in packet["animation"]:
-                self.write_response_packet(
-                    packet,
-                    status_error_malformed_packet(
-                        "Missing required tempo slot in animation"
-                    ),
-                    writer,
-                )
-                return None
-            if not isinstance(
-                packet["animation"]["tempo"], int
-            ) and not isinstance(packet["animation"]["tempo"], float):
-                self.write_response_packet(
-                    packet,
-                    status_error_malformed_packet(
-                        "Invalid tempo slot in animation, expected a number"
-                    ),
-                    writer,
-                )
-                return None
-            if "colors" not in packet["animation"]:
-                self.write_response_packet(
-                    packet,
-                    status_error_malformed_packet(
-                        "Missing required colors slot in animation"
-                    ),
-                    writer,
+    def update_info(self, packet: InfoPacket) -> bool:
+        """
+        Update info from an info packet and return whether it changed.
+        """
+        assert self.loop is not None
+        info_id = packet["info_id"]
+        animation = packet.get("animation")
+        deadline = None
+        if animation is not None and "expiration" in packet:
+            deadline = monotonic_deadline(packet["expiration"], self.loop.time)
+            if deadline <= self.loop.time():
+                animation = None
+        changed = animation is not None and self.info.get(info_id) != animation
+        # Compile before changing any state, as unsupported colors raise
+        # ValueError
+        info_animation = None
+        if animation is not None and changed:
+            info_animation = self.compile_animation(animation)
+        timer = self.info_timers.pop(info_id, None)
+        old_deadline = None
+        if timer is not None:
+            old_deadline = timer.when()
+            timer.cancel()
+        if animation is not None:
+            if deadline is not None:
+                self.info_timers[info_id] = self.loop.call_at(
+                    deadline, self.info_expired, info_id
                 )
-                return None
-        return cast(InfoPacket, packet)
+            priority = packet.get("priority", 0)
+            entry = self.info_rotation.entries.get(info_id)
+            if deadline is None or old_deadline is None:
+                expiration_changed = deadline != old_deadline
+            else:
+                # Deadlines converted from the same date differ slightly
+                expiration_changed = abs(deadline - old_deadline) >= 1.0
+            if (
+                changed
+                or entry is None
+                or entry.priority != priority
+                or expiration_changed
+            ):
+                self.state_changed()
+            self.info[info_id] = animation
+            if info_animation is not None:
+                self.drop_info_animation(info_id)
+                self.info_animations[info_id] = info_animation
+            self.info_rotation.update(info_id, priority, changed)
+            return changed
+        self.info_rotation.remove(info_id)
+        self.drop_info_animation(info_id)
+        if self.info.pop(info_id, None) is None:
+            return False
+        self.state_changed()
+        return True
+
+    def compile_animation(self, animation: Animation) -> InfoAnimation:
+        """
+        Return animation compiled, reusing the compiled animation of
+        another info with the same animation.
+        """
+        key = resource_hash(animation)
+        info_animation = self.compiled_animations.get(key)
+        if info_animation is None:
+            info_animation = InfoAnimation(animation)
+            self.compiled_animations[key] = info_animation
+        return info_animation
+
+    def drop_info_animation(self, info_id: str):
+        """
+        Forget compiled animation of info_id, and release it unless another
+        info uses it.
+        """
+        info_animation = self.info_animations.pop(info_id, None)
+        if info_animation is not None and all(
+            other is not info_animation
+            for other in self.info_animations.values()
+        ):
+            del self.compiled_animations[resource_hash(info_animation.source)]
+
+    def info_expired(self, info_id: str):
+        """
+        Remove an info which expiration date is reached.
+        Thread: run (timer)
+        """
+        assert self.loop is not None
+        self.info_timers.pop(info_id, None)
+        self.info.pop(info_id, None)
+        self.drop_info_animation(info_id)
+        self.info_rotation.remove(info_id)
+        self.state_changed()
+        self.loop.create_task(self.notify_idle_worker())
+
+    async def notify_idle_worker(self):
+        if self.state == State.ASLEEP:
+            # Info loop is stopped, transition to idle restarts it.
+            return
+        async with self.idle_cv:
+            self.idle_cv.notify()
 
     async def process_ears_packet(
         self, any_packet: AnyPacket, writer: asyncio.StreamWriter
     ):
         """Process an ears packet"""
-        packet = self.__check_ears_packet(any_packet, writer)
-        if packet:
-            if "left" in packet:
-                self.ears["left"] = packet["left"]
-            if "right" in packet:
-                self.ears["right"] = packet["right"]
-            if self.state == State.IDLE:
-                if "event" in packet and packet["event"]:
-                    # Simulate an ears_event
-                    now = time.time()
-                    self.broadcast_event(
-                        "ears",
-                        {
-                            "type": "ears_event",
-                            "left": self.ears["left"],
-                            "right": self.ears["right"],
-                            "time": now,
-                        },
-                    )
-                await self.nabio.move_ears(
-                    self.ears["left"], self.ears["right"]
+        packet = cast(EarsPacket, any_packet)
+        if "left" in packet:
+            self.ears["left"] = packet["left"]
+        if "right" in packet:
+            self.ears["right"] = packet["right"]
+        self.state_changed()
+        if self.state == State.IDLE:
+            if "event" in packet and packet["event"]:
+                # Simulate an ears_event
+                now = time.time()
+                self.broadcast_event(
+                    "ears",
+                    {
+                        "type": "ears_event",
+                        "left": self.ears["left"],
+                        "right": self.ears["right"],
+                        "time": now,
+                    },
                 )
-            self.write_response_packet(packet, STATUS_OK, writer)
-
-    def __check_ears_packet(
-        self, packet: AnyPacket, writer: asyncio.StreamWriter
-    ) -> Optional[EarsPacket]:
-        assert packet["type"] == "ears"
-        if "left" in packet and not isinstance(packet["left"], int):
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet(
-                    "Invalid left slot, expected an int"
-                ),
-                writer,
-            )
-            return None
-        if "right" in packet and not isinstance(packet["right"], int):
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet(
-                    "Invalid right slot, expected an int"
-                ),
-                writer,
-            )
-            return None
-        if "request_id" in packet and not isinstance(
-            packet["request_id"], str
-        ):
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet(
-                    "Invalid request_id slot, expected a string"
-                ),
-                writer,
-            )
-            return None
-        if "event" in packet and not isinstance(packet["event"], bool):
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet(
-                    "Invalid event slot, expected a bool"
-                ),
-                writer,
-            )
-            return None
-        return cast(EarsPacket, packet)
+            await self.nabio.move_ears(self.ears["left"], self.ears["right"])
+        self.write_response_packet(packet, STATUS_OK, writer)
 
     async def process_command_packet(
         self, packet: AnyPacket, writer: asyncio.StreamWriter
@@ -523,63 +734,150 @@ class Nabd:
         slot: str,
         any_packet: AnyPacket,
         writer: asyncio.StreamWriter,
+    ):
+        packet = cast(Union[CommandPacket, MessagePacket], any_packet)
+        if "at" in packet:
+            if not self.check_queue_quota(packet, writer):
+                return
+            self.prepared.resolve(packet)
+            self.scheduler.push((packet, writer))
+            self.state_changed()
+        else:
+            await self.start_perform(packet, writer)
+
+    async def start_perform(
+        self,
+        packet: Union[CommandPacket, MessagePacket],
+        writer: asyncio.StreamWriter,
+        admitted: bool = False,
     ):
         assert self.loop is not None
-        packet = self.__check_perform_packet(any_packet, slot, writer)
-        if packet:
-            if self.interactive_service_writer == writer:
-                # interactive => play command immediately, asynchronously
-                self.loop.create_task(self.perform(packet, writer))
-            else:
-                async with self.idle_cv:
-                    self.idle_queue.append((packet, writer))
-                    self.idle_cv.notify()
+        if writer is not None and self.interactive_service_writer == writer:
+            # interactive => play command immediately, asynchronously
+            self.prepared.resolve(packet)
+            self.start_interactive_task(self.perform(packet, writer))
+        else:
+            await self.enqueue_idle_item(packet, writer, admitted)
 
-    def __check_perform_packet(
-        self, packet: AnyPacket, slot: str, writer: asyncio.StreamWriter
-    ) -> Optional[Union[CommandPacket, MessagePacket]]:
-        if slot in packet:
-            return cast(Union[CommandPacket, MessagePacket], packet)
-        self.write_response_packet(
-            packet,
-            status_error_malformed_packet(f"Missing required {slot} slot"),
-            writer,
-        )
-        return None
+    def start_interactive_task(self, coro):
+        """
+        Run a command or batch of the interactive service. Restarts wait
+        for these tasks.
+        """
+        assert self.loop is not None
+        task = self.loop.create_task(coro)
+        self.interactive_tasks.add(task)
+        task.add_done_callback(self.interactive_tasks.discard)
+
+    async def prepare_scheduled_item(self, item: IdleQueueItem):
+        """
+        Prepare the sequence of a scheduled item shortly before its date.
+        Thread: run (timer)
+        """
+        packet = item[0]
+        slot = "sequence" if packet["type"] == "command" else "body"
+        if isinstance(packet[slot], list):
+            try:
+                prepared = await self.nabio.prepare_sequence(packet[slot])
+            except Exception as err:
+                # Sequence is played as is
+                logging.error(f"could not prepare scheduled packet: {err}")
+                return
+            packet[slot] = prepared
+
+    def scheduled_item_due(self, item: IdleQueueItem):
+        """
+        Start an item which date is reached.
+        Thread: run (timer)
+        """
+        assert self.loop is not None
+        self.state_changed()
+        self.loop.create_task(self.start_perform(item[0], item[1], True))
+
+    async def process_batch_packet(
+        self, any_packet: AnyPacket, writer: asyncio.StreamWriter
+    ):
+        """Process a batch packet"""
+        assert self.loop is not None
+        packet = cast(BatchPacket, any_packet)
+        if self.interactive_service_writer == writer:
+            self.prepared.resolve(packet)
+            self.start_interactive_task(self.perform_batch(packet, writer))
+        else:
+            await self.enqueue_idle_item(packet, writer)
+
+    async def process_register_packet(
+        self, any_packet: AnyPacket, writer: asyncio.StreamWriter
+    ):
+        """Process a register packet"""
+        packet = cast(RegisterPacket, any_packet)
+        payload: Union[None, Animation, str] = None
+        if ("animation" in packet) == ("choreography" in packet):
+            error: Optional[str] = (
+                "Register packet requires either an animation "
+                "or a choreography slot"
+            )
+        elif "animation" in packet:
+            payload = packet["animation"]
+            error = InfoAnimation.check(payload)
+        else:
+            payload = packet["choreography"]
+            error = ResourceRegistry.check_choreography(payload)
+        if error is not None:
+            self.write_response_packet(
+                packet, status_error_malformed_packet(error), writer
+            )
+            return
+        response: ResponseRegisterPacketProto = {
+            "status": "ok",
+            "hash": self.registry.register(payload),
+        }
+        self.write_response_packet(packet, response, writer)
+
+    async def process_prepare_packet(
+        self, any_packet: AnyPacket, writer: asyncio.StreamWriter
+    ):
+        """Process a prepare packet"""
+        packet = cast(PreparePacket, any_packet)
+        prepared = await self.nabio.prepare_sequence(packet["sequence"])
+        response: ResponsePreparePacketProto = {
+            "status": "ok",
+            "handle": self.prepared.add(prepared),
+        }
+        self.write_response_packet(packet, response, writer)
 
     async def process_cancel_packet(
         self, packet: AnyPacket, writer: asyncio.StreamWriter
     ):
         """Process a cancel packet"""
-        if "request_id" in packet:
-            request_id = packet["request_id"]
-            if self.playing_request_id == request_id:
-                if self.playing_cancelable:
-                    self.playing_canceled = True
-                    await self.nabio.cancel()
-                else:
-                    self.write_response_packet(
-                        packet,
-                        status_error(
-                            "NotCancelable",
-                            "Playing command is not cancelable",
-                        ),
-                        writer,
-                    )
+        request_id = packet["request_id"]
+        scheduled = self.scheduler.remove(
+            lambda item: item[1] == writer
+            and item[0].get("request_id") == request_id
+        )
+        if scheduled:
+            self.state_changed()
+            for item in scheduled:
+                self.write_response_packet(item[0], STATUS_CANCELED, item[1])
+        elif self.playing_request_id == request_id:
+            if self.playing_cancelable:
+                self.playing_canceled = True
+                await self.nabio.cancel()
             else:
                 self.write_response_packet(
                     packet,
                     status_error(
-                        "NotPlaying",
-                        "Cancel packet does not refer to running command",
+                        "NotCancelable",
+                        "Playing command is not cancelable",
                     ),
                     writer,
                 )
         else:
             self.write_response_packet(
                 packet,
-                status_error_malformed_packet(
-                    "Missing required request_id slot"
+                status_error(
+                    "NotPlaying",
+                    "Cancel packet does not refer to running command",
                 ),
                 writer,
             )
@@ -602,17 +900,13 @@ class Nabd:
         if self.state == State.ASLEEP:
             self.write_response_packet(packet, STATUS_OK, writer)
         else:
-            async with self.idle_cv:
-                self.idle_queue.append((packet, writer))
-                self.idle_cv.notify()
+            await self.enqueue_idle_item(packet, writer)
 
     async def process_mode_packet(
         self, any_packet: AnyPacket, writer: asyncio.StreamWriter
     ):
         """Process a mode packet"""
-        packet = self.__check_mode_packet(any_packet, writer)
-        if not packet:
-            return
+        packet = cast(ModePacket, any_packet)
         if packet["mode"] == "interactive":
             if writer == self.interactive_service_writer:
                 if "events" in packet:
@@ -630,42 +924,20 @@ class Nabd:
                     writer,
                 )
             else:
-                async with self.idle_cv:
-                    self.idle_queue.append((packet, writer))
-                    self.idle_cv.notify()
+                await self.enqueue_idle_item(packet, writer)
         else:  # packet["mode"] == "idle":
             if "events" in packet:
                 self.service_writers[writer] = packet["events"]
             else:
                 self.service_writers[writer] = []
+            self.event_subscriptions.subscribe(
+                writer, self.service_writers[writer]
+            )
             if writer == self.interactive_service_writer:
                 # exit interactive mode.
                 await self.exit_interactive()
             self.write_response_packet(packet, STATUS_OK, writer)
 
-    def __check_mode_packet(
-        self, packet: AnyPacket, writer: asyncio.StreamWriter
-    ) -> Optional[ModePacket]:
-        if "mode" in packet:
-            if packet["mode"] in ("interactive", "idle"):
-                return cast(ModePacket, packet)
-            logging.debug(f"unknown mode packet from service: {packet}")
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet(
-                    "Mode packet with unknown mode slot"
-                ),
-                writer,
-            )
-        else:
-            logging.debug(f"malformed mode packet from service: {packet}")
-            self.write_response_packet(
-                packet,
-                status_error_malformed_packet("Missing mode slot"),
-                writer,
-            )
-        return None
-
     async def process_gestalt_packet(
         self, packet: AnyPacket, writer: asyncio.StreamWriter
     ):
@@ -675,10 +947,21 @@ class Nabd:
             stdout=subprocess.PIPE,
         )
         proc.wait()
+        asleep_time, asleep_cpu_time = self.sleep_times()
         response: ResponseGestaltPacketProto = {
             "state": self.state.value,
             "connections": len(self.service_writers),
             "hardware": await self.nabio.gestalt(),
+            "network": self.connectivity.state.value,
+            "dropped_events": self.outbound_dropped
+            + sum(q.dropped for q in self.outbound_queues.values()),
+            "coalesced_states": self.outbound_coalesced
+            + sum(q.coalesced for q in self.outbound_queues.values()),
+            "queue_depth": len(self.idle_queue),
+            "queue_wait": self.idle_queue.wait_time(),
+            "throttled": self.throttled,
+            "asleep_time": asleep_time,
+            "asleep_cpu_time": asleep_cpu_time,
         }
         if proc.stdout:
             results = proc.stdout.readlines()
@@ -701,36 +984,21 @@ class Nabd:
         else:
             if packet["service"] == "nabd":
                 if "slot" in packet and packet["slot"] == "locale":
-                    await self.reload_config()
+                    async with self.nabio_resumed():
+                        await self.reload_config()
                     self.write_response_packet(packet, STATUS_OK, writer)
 
     async def process_test_packet(
         self, any_packet: AnyPacket, writer: asyncio.StreamWriter
     ):
         """Process a test packet (for hardware tests)"""
-        packet = self.__check_test_packet(any_packet, writer)
-        if packet:
-            if self.state == State.ASLEEP:
+        packet = cast(TestPacket, any_packet)
+        if self.state == State.ASLEEP:
+            # Test hardware at full power
+            async with self.nabio_resumed():
                 await self.do_process_test_packet(packet, writer)
-            else:
-                async with self.idle_cv:
-                    self.idle_queue.append((packet, writer))
-                    self.idle_cv.notify()
-
-    def __check_test_packet(
-        self, packet: AnyPacket, writer: asyncio.StreamWriter
-    ) -> Optional[TestPacket]:
-        if "test" in packet:
-            return cast(TestPacket, packet)
-        logging.debug(f"unknown test packet from service: {packet}")
-        self.write_response_packet(
-            packet,
-            status_error_malformed_packet(
-                "Test packet with missing test slot"
-            ),
-            writer,
-        )
-        return None
+        else:
+            await self.enqueue_idle_item(packet, writer)
 
     async def do_process_test_packet(
         self, packet: TestPacket, writer: asyncio.StreamWriter
@@ -750,11 +1018,11 @@ class Nabd:
         packet = self.__check_rfid_write_packet(any_packet, writer)
         if packet is not None:
             if self.state == State.ASLEEP:
-                await self.do_process_rfid_write_packet(packet, writer)
+                # Nose shows that a tag is expected
+                async with self.nabio_resumed():
+                    await self.do_process_rfid_write_packet(packet, writer)
             else:
-                async with self.idle_cv:
-                    self.idle_queue.append((packet, writer))
-                    self.idle_cv.notify()
+                await self.enqueue_idle_item(packet, writer)
 
     async def do_process_rfid_write_packet(
         self, packet: RfidWritePacket, writer: asyncio.StreamWriter
@@ -827,19 +1095,14 @@ class Nabd:
     def __check_rfid_write_packet(
         self, packet: AnyPacket, writer: asyncio.StreamWriter
     ) -> Optional[RfidWritePacket]:
-        if (
-            "uid" in packet
-            and "picture" in packet
-            and "app" in packet
-            and "tech" in packet
-            and packet["tech"].upper() in TagTechnology.__members__
-        ):
+        if packet["tech"].upper() in TagTechnology.__members__:
             return cast(RfidWritePacket, packet)
         logging.debug(f"Malformed rfid_write packet from service: {packet}")
         self.write_response_packet(
             packet,
             status_error_malformed_packet(
-                "rfid_write packet with missing or invalid slots"
+                f"Invalid tech slot, expected one of "
+                f"{', '.join(TagTechnology.__members__).lower()}"
             ),
             writer,
         )
@@ -856,6 +1119,27 @@ class Nabd:
             perform_reboot = False
         asyncio.ensure_future(self._shutdown(perform_reboot))
 
+    async def process_hello_packet(
+        self, any_packet: AnyPacket, writer: asyncio.StreamWriter
+    ):
+        """Process a hello packet, negotiating the framing"""
+        packet = cast(HelloPacket, any_packet)
+        framing = codec.FRAMINGS.get(packet["framing"])
+        if framing is None:
+            self.write_response_packet(
+                packet,
+                status_error(
+                    "UnsupportedFraming",
+                    f"Framing {packet['framing']} is not supported",
+                ),
+                writer,
+            )
+        else:
+            # Response is written with previous framing
+            self.write_response_packet(packet, STATUS_OK, writer)
+            self.service_framings[writer] = framing
+            self.share_admission_bucket(writer)
+
     async def process_packet(
         self, packet: AnyPacket, writer: asyncio.StreamWriter
     ):
@@ -864,11 +1148,22 @@ class Nabd:
         Thread: service_loop
         """
         logging.debug(f"packet from service: {packet}")
+        bucket = self.admission_bucket(writer)
+        if bucket is not None:
+            retry_after = bucket.take()
+            if retry_after > 0:
+                self.write_throttled_response(
+                    packet, writer, "Too many packets", retry_after
+                )
+                return
         processors = {
             "info": self.process_info_packet,
             "ears": self.process_ears_packet,
             "command": self.process_command_packet,
             "message": self.process_message_packet,
+            "batch": self.process_batch_packet,
+            "register": self.process_register_packet,
+            "prepare": self.process_prepare_packet,
             "cancel": self.process_cancel_packet,
             "wakeup": self.process_wakeup_packet,
             "sleep": self.process_sleep_packet,
@@ -878,8 +1173,33 @@ class Nabd:
             "test": self.process_test_packet,
             "rfid_write": self.process_rfid_write_packet,
             "shutdown": self.process_os_shutdown_packet,
+            "hello": self.process_hello_packet,
         }
         if packet["type"] in processors:
+            validator = PACKET_VALIDATORS.get(packet["type"])
+            if validator is not None:
+                error = validator(packet)
+                if error is not None:
+                    logging.debug(f"malformed packet from service: {error}")
+                    self.write_response_packet(
+                        packet, status_error_malformed_packet(error), writer
+                    )
+                    return
+            try:
+                self.registry.resolve(packet)
+                # Handles are taken once the packet is accepted
+                self.prepared.check(packet)
+            except UnknownResource as err:
+                self.write_response_packet(
+                    packet, status_error("UnknownResource", str(err)), writer
+                )
+                return
+            error = Nabd.check_info_animations(packet)
+            if error is not None:
+                self.write_response_packet(
+                    packet, status_error_malformed_packet(error), writer
+                )
+                return
             await processors[packet["type"]](packet, writer)
         else:
             self.write_response_packet(
@@ -890,8 +1210,67 @@ class Nabd:
                 writer,
             )
 
-    def write_packet(self, response: NabdPacket, writer: asyncio.StreamWriter):
-        writer.write((json.dumps(response) + "\r\n").encode("utf8"))
+    @staticmethod
+    def check_info_animations(packet: AnyPacket) -> Optional[str]:
+        """
+        Return an error message if the animation of an info packet, or of
+        info packets of a batch, cannot be played.
+        """
+        if packet["type"] == "batch":
+            packets = packet["packets"]
+        else:
+            packets = [packet]
+        for sub_packet in packets:
+            animation = sub_packet.get("animation")
+            if sub_packet["type"] == "info" and animation is not None:
+                error = InfoAnimation.check(animation)
+                if error is not None:
+                    return error
+        return None
+
+    def write_packet(
+        self,
+        response: NabdPacket,
+        writer: asyncio.StreamWriter,
+        kind: PacketKind = PacketKind.RESPONSE,
+    ):
+        framing = self.service_framings.get(writer, codec.JSON_LINES)
+        self.write_data(framing.encode(response), writer, kind)
+
+    def write_data_all(
+        self,
+        packet: NabdPacket,
+        writers: Iterable[asyncio.StreamWriter],
+        kind: PacketKind,
+    ):
+        """
+        Write a packet to several services, serializing it once per framing.
+        """
+        encoded: Dict[codec.Framing, bytes] = {}
+        for writer in writers:
+            framing = self.service_framings.get(writer, codec.JSON_LINES)
+            data = encoded.get(framing)
+            if data is None:
+                data = framing.encode(packet)
+                encoded[framing] = data
+            self.write_data(data, writer, kind)
+
+    def write_data(
+        self,
+        data: bytes,
+        writer: Optional[asyncio.StreamWriter],
+        kind: PacketKind,
+    ):
+        if writer is None or self.handoff_path is not None:
+            # Scheduled packet restored from state file, sender is gone, or
+            # connection was handed off to new process.
+            return
+        queue = self.outbound_queues.get(writer)
+        if queue is None:
+            # Service already disconnected
+            writer.write(data)
+        else:
+            queue.put(kind, data)
 
     def _test_event_mask(self, event_type: str, events: List[str]) -> bool:
         matching = event_type in events
@@ -903,20 +1282,21 @@ class Nabd:
     def broadcast_event(self, event_type, response: EventPacket):
         if self.interactive_service_writer is None:
             logging.debug(f"broadcast event: {event_type}, {response}")
-            for sw, events in self.service_writers.items():
-                if self._test_event_mask(event_type, events):
-                    self.write_packet(response, sw)
+            writers = self.event_subscriptions.match(event_type)
+            self.write_data_all(response, writers, PacketKind.EVENT)
         elif self._test_event_mask(
             event_type, self.interactive_service_events
         ):
             logging.debug(
                 f"send event to interactive service: {event_type}, {response}"
             )
-            self.write_packet(response, self.interactive_service_writer)
+            self.write_packet(
+                response, self.interactive_service_writer, PacketKind.EVENT
+            )
 
     def write_response_cancelable(
         self,
-        original_packet: Union[CommandPacket, MessagePacket],
+        original_packet: Union[CommandPacket, MessagePacket, BatchPacket],
         writer: asyncio.StreamWriter,
     ):
         if self.playing_canceled:
@@ -925,6 +1305,53 @@ class Nabd:
             status = STATUS_OK
         self.write_response_packet(original_packet, status, writer)
 
+    def admission_bucket(
+        self, writer: asyncio.StreamWriter
+    ) -> Optional[TokenBucket]:
+        """
+        Return the token bucket limiting packets of writer, if any.
+        Services in interactive mode are not limited.
+        """
+        if writer == self.interactive_service_writer:
+            return None
+        return self.service_buckets.get(writer)
+
+    def share_admission_bucket(self, writer: asyncio.StreamWriter):
+        """
+        Assign writer the token bucket of its peer with its framing,
+        releasing buckets of peers without connections which were refilled.
+        """
+        name = self.service_classes[writer]
+        framing = self.service_framings.get(writer, codec.JSON_LINES).NAME
+        used = set(map(id, self.service_buckets.values()))
+        for key, bucket in list(self.admission_buckets.items()):
+            if id(bucket) not in used and bucket.is_full():
+                del self.admission_buckets[key]
+        key = admission_key(name, self.service_peers[writer], framing)
+        bucket = self.admission_buckets.get(key)
+        if bucket is None:
+            policy = admission_policy(name, framing)
+            bucket = TokenBucket(policy.rate, policy.burst)
+            self.admission_buckets[key] = bucket
+        self.service_buckets[writer] = bucket
+
+    def write_throttled_response(
+        self,
+        original_packet: Union[AnyPacket, ServicePacket],
+        writer: asyncio.StreamWriter,
+        message: str,
+        retry_after: Optional[float] = None,
+    ):
+        name = self.service_classes.get(writer, DEFAULT_SERVICE_CLASS)
+        self.throttled[name] = self.throttled.get(name, 0) + 1
+        response: ResponseThrottledPacketProto = {
+            "status": "throttled",
+            "message": message,
+        }
+        if retry_after is not None:
+            response["retry_after"] = retry_after
+        self.write_response_packet(original_packet, response, writer)
+
     def write_response_packet(
         self,
         original_packet: Union[None, AnyPacket, ServicePacket],
@@ -940,24 +1367,76 @@ class Nabd:
         self.write_packet(cast(ResponsePacket, response_packet), writer)
 
     def broadcast_state(self):
-        for sw in self.service_writers:
-            self.write_state_packet(sw)
+        self.write_data_all(
+            {"type": "state", "state": self.state.value},
+            self.service_writers,
+            PacketKind.STATE,
+        )
 
     def write_state_packet(self, writer: asyncio.StreamWriter):
-        self.write_packet({"type": "state", "state": self.state.value}, writer)
+        self.write_packet(
+            {"type": "state", "state": self.state.value},
+            writer,
+            PacketKind.STATE,
+        )
 
     # Handle service through TCP/IP protocol
     async def service_loop(
-        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        service: Optional[Dict[str, Any]] = None,
     ):
-        self.write_state_packet(writer)
-        self.service_writers[writer] = []
+        """
+        Serve a service connection. service is the state of a connection
+        taken over from previous process.
+        """
+        assert self.loop is not None
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            peer = Nabd.peer_description(writer)
+            logging.debug(f"service connected: {peer}")
+        credentials = Nabd.peer_credentials(writer)
+        if credentials is None:
+            name = service_class(None)
+            peer = (writer.get_extra_info("peername") or ("?",))[0]
+        else:
+            name = service_class(credentials[3])
+            peer = credentials[1]
+        self.service_classes[writer] = name
+        self.service_peers[writer] = peer
+        if service is not None:
+            framing = codec.FRAMINGS.get(service["framing"])
+            if framing is not None and framing is not codec.JSON_LINES:
+                self.service_framings[writer] = framing
+        self.share_admission_bucket(writer)
+        outbound_queue = OutboundQueue(writer)
+        outbound_queue.start(self.loop)
+        self.outbound_queues[writer] = outbound_queue
+        if service is None:
+            buffered_reader = codec.BufferedReader(reader)
+            self.write_state_packet(writer)
+            self.service_writers[writer] = []
+        else:
+            # Beginning of next packet, read by previous process
+            buffered_reader = codec.BufferedReader(
+                reader, base64.b64decode(service["unread"])
+            )
+            self.service_writers[writer] = service["events"]
+            self.event_subscriptions.subscribe(writer, service["events"])
         try:
-            while not reader.at_eof():
-                line = await reader.readline()
+            while not buffered_reader.at_eof():
+                # Framing may be changed by a hello packet
+                framing = self.service_framings.get(writer, codec.JSON_LINES)
+                self.service_readers[writer] = buffered_reader
+                line = await framing.read(buffered_reader)
+                del self.service_readers[writer]
+                if self.handoff_path is not None:
+                    # Connection was handed off with unread data, which may
+                    # end with an incomplete packet.
+                    break
                 if line != b"" and line != b"\r\n":
                     try:
-                        packet = json.loads(line.decode("utf8"))
+                        packet = framing.decode(line)
                         if (
                             not isinstance(packet, dict)
                             or "type" not in packet
@@ -973,18 +1452,18 @@ class Nabd:
                             await self.process_packet(packet, writer)
                     except UnicodeDecodeError as e:
                         logging.debug(f"Unicode Error {e} with service packet")
-                        logging.debug(f"{packet}")
+                        logging.debug(str(line))
                         self.write_response_packet(
                             None,
                             status_error("UnicodeDecodeError", str(e)),
                             writer,
                         )
-                    except json.decoder.JSONDecodeError as e:
-                        logging.debug(f"JSON Error {e} with service packet")
+                    except codec.DecodeError as e:
+                        logging.debug(f"Decode Error {e} with service packet")
                         logging.debug(str(line))
                         self.write_response_packet(
                             None,
-                            status_error("JSONDecodeError", str(e)),
+                            status_error(framing.ERROR_CLASS, str(e)),
                             writer,
                         )
             writer.close()
@@ -995,10 +1474,27 @@ class Nabd:
             pass
         except Exception:
             logging.debug(traceback.format_exc())
+            writer.close()
         finally:
             del self.service_writers[writer]
-            if self.interactive_service_writer == writer:
+            self.service_readers.pop(writer, None)
+            self.event_subscriptions.unsubscribe(writer)
+            # Scheduled packets are played without a response
+            if self.scheduler.disown(writer):
+                self.state_changed()
+            if (
+                self.interactive_service_writer == writer
+                and self.handoff_path is None
+            ):
                 await self.exit_interactive()
+            self.service_framings.pop(writer, None)
+            del self.service_buckets[writer]
+            del self.service_classes[writer]
+            del self.service_peers[writer]
+            del self.outbound_queues[writer]
+            await outbound_queue.stop()
+            self.outbound_dropped += outbound_queue.dropped
+            self.outbound_coalesced += outbound_queue.coalesced
 
     async def perform(
         self,
@@ -1007,10 +1503,16 @@ class Nabd:
     ):
         if "request_id" in packet:
             self.playing_request_id = packet["request_id"]
+        self.playing_canceled = False
+        await self.play(packet)
+        self.write_response_cancelable(packet, writer)
+        self.playing_request_id = None
+        self.playing_cancelable = False
+
+    async def play(self, packet: Union[CommandPacket, MessagePacket]):
         self.playing_cancelable = (
             "cancelable" not in packet or packet["cancelable"]
         )
-        self.playing_canceled = False
         if packet["type"] == "command":
             await self.nabio.play_sequence(packet["sequence"])
         else:
@@ -1018,6 +1520,36 @@ class Nabd:
             if "signature" in packet:
                 signature = packet["signature"]
             await self.nabio.play_message(signature, packet["body"])
+
+    async def perform_batch(
+        self, packet: BatchPacket, writer: asyncio.StreamWriter
+    ):
+        """
+        Run packets of a batch back-to-back and reply once. Canceling the
+        batch (with its request_id or the button) skips remaining packets.
+        """
+        if "request_id" in packet:
+            self.playing_request_id = packet["request_id"]
+        self.playing_canceled = False
+        for sub_packet in packet["packets"]:
+            if sub_packet["type"] == "info":
+                self.update_info(cast(InfoPacket, sub_packet))
+            elif sub_packet["type"] == "ears":
+                ears_packet = cast(EarsPacket, sub_packet)
+                if "left" in ears_packet:
+                    self.ears["left"] = ears_packet["left"]
+                if "right" in ears_packet:
+                    self.ears["right"] = ears_packet["right"]
+                self.state_changed()
+                await self.nabio.move_ears(
+                    self.ears["left"], self.ears["right"]
+                )
+            else:
+                await self.play(
+                    cast(Union[CommandPacket, MessagePacket], sub_packet)
+                )
+                if self.playing_canceled:
+                    break
         self.write_response_cancelable(packet, writer)
         self.playing_request_id = None
         self.playing_cancelable = False
@@ -1058,21 +1590,29 @@ class Nabd:
         """
         Thread: run_loop
         """
-        assert self.asr is not None
+        assert self.recognizer is not None
         await self.transition_to(State.RECORDING)
         if self.nabio.rfid is not None:
             self.nabio.rfid.disable_polling()
-        await self.nabio.start_acquisition(self.asr.decode_chunk)
+        await self.nabio.start_acquisition(self.recognizer.decode_chunk)
 
     async def stop_asr(self):
-        assert self.asr is not None
-        assert self.nlu is not None
-        await self.nabio.end_acquisition()
+        """
+        Stop recording and interpret the utterance.
+        ASR finalization and NLU parsing run in the recognizer process while
+        the acquired sound is played.
+        Thread: run_loop
+        """
+        assert self.recognizer is not None
+        await self.nabio.stop_acquisition()
         now = time.time()
-        decoded_str = await self.asr.get_decoded_string(True)
+        start = time.monotonic()
+        recognition = asyncio.ensure_future(self.recognizer.recognize())
+        await self.nabio.acquisition_feedback()
+        decoded_str, response, asr_time, nlu_time = await recognition
+        recognized = time.monotonic()
         # ASR model needs to be improved, log outcome.
         logging.debug(f"ASR string: {decoded_str}")
-        response = await self.nlu.interpret(decoded_str)
         logging.debug(f"NLU response: {str(response)}")
         if self.nabio.rfid is not None:
             self.nabio.rfid.enable_polling()
@@ -1088,6 +1628,14 @@ class Nabd:
             self.broadcast_event(
                 event_type, {"type": "asr_event", "nlu": response, "time": now}
             )
+        done = time.monotonic()
+        logging.info(
+            f"ASR response time: {done - start:.3f}s "
+            f"(recognition: {recognized - start:.3f}s, "
+            f"asr: {asr_time:.3f}s, "
+            f"nlu: {nlu_time:.3f}s, "
+            f"broadcast: {done - recognized:.3f}s)"
+        )
 
     async def _shutdown(self, doReboot):
         await self.stop_idle_worker()
@@ -1120,6 +1668,7 @@ class Nabd:
                 self.write_packet(
                     {"type": "ear_event", "ear": ear_str, "time": now},
                     self.interactive_service_writer,
+                    PacketKind.EVENT,
                 )
         else:
             # Wait a little bit for user to continue moving the ears
@@ -1135,6 +1684,7 @@ class Nabd:
             (left, right) = await self.nabio.detect_ears_positions()
             self.ears["left"] = left
             self.ears["right"] = right
+            self.state_changed()
             if self.state != State.ASLEEP:
                 now = time.time()
                 self.broadcast_event(
@@ -1207,32 +1757,470 @@ class Nabd:
         except ValueError:
             return TAG_APPLICATION_NONE
 
-    def run(self):
-        self.loop = asyncio.get_event_loop()
-        self.nabio.bind_button_event(self.loop, self.button_callback)
-        self.nabio.bind_ears_event(self.loop, self.ears_callback)
-        self.nabio.bind_rfid_event(self.loop, self.rfid_callback)
-        idle_task = self.loop.create_task(self.idle_worker_loop())
-        if os.environ.get("LISTEN_PID", None) == str(os.getpid()):
-            server_task = self.loop.create_task(
-                asyncio.start_server(
+    @staticmethod
+    def peer_credentials(
+        writer: asyncio.StreamWriter,
+    ) -> Optional[Tuple[int, int, int, List[str]]]:
+        """
+        Return pid, uid, gid and command line of the process connected
+        through writer with SO_PEERCRED, or None for TCP/IP.
+        """
+        sock = writer.get_extra_info("socket")
+        if sock is None or sock.family != socket.AF_UNIX:
+            return None
+        creds = sock.getsockopt(
+            socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+        )
+        pid, uid, gid = struct.unpack("3i", creds)
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as cmdline:
+                args = cmdline.read().rstrip(b"\0").split(b"\0")
+            command = [arg.decode("utf8", errors="replace") for arg in args]
+        except OSError:
+            command = ["?"]
+        return pid, uid, gid, command
+
+    @staticmethod
+    def peer_description(writer: asyncio.StreamWriter) -> str:
+        """
+        Identify the service connected through writer: process for Unix
+        sockets, address for TCP/IP.
+        """
+        credentials = Nabd.peer_credentials(writer)
+        if credentials is None:
+            return f"{writer.get_extra_info('peername')}"
+        pid, uid, gid, command = credentials
+        return f"pid={pid} uid={uid} gid={gid} ({' '.join(command)})"
+
+    async def start_servers(
+        self, taken_over: Optional[Dict[str, Any]] = None
+    ) -> List[asyncio.AbstractServer]:
+        """
+        Listen on TCP/IP and Unix sockets, taken over from previous process,
+        passed by systemd with socket activation or else created here.
+        """
+        listening = []
+        if taken_over is not None:
+            listening = [
+                handoff.listening_socket(fd) for fd in taken_over["listeners"]
+            ]
+        elif self.socket_activation and os.environ.get(
+            "LISTEN_PID", None
+        ) == str(os.getpid()):
+            listen_fds = int(os.environ.get("LISTEN_FDS", "1"))
+            for fd in range(
+                Nabd.SYSTEMD_ACTIVATED_FD,
+                Nabd.SYSTEMD_ACTIVATED_FD + listen_fds,
+            ):
+                listening.append(socket.socket(fileno=fd))
+        tcp_socket = None
+        unix_socket = None
+        for sock in listening:
+            if sock.family == socket.AF_UNIX:
+                unix_socket = sock
+            else:
+                tcp_socket = sock
+        servers = []
+        if tcp_socket:
+            servers.append(
+                await asyncio.start_server(self.service_loop, sock=tcp_socket)
+            )
+        else:
+            servers.append(
+                await asyncio.start_server(
+                    self.service_loop, NabService.HOST, self.port
+                )
+            )
+        if unix_socket:
+            servers.append(
+                await asyncio.start_unix_server(
+                    self.service_loop, sock=unix_socket
+                )
+            )
+        elif self.unix_socket:
+            servers.append(
+                await asyncio.start_unix_server(
                     self.service_loop,
-                    sock=socket.fromfd(
-                        Nabd.SYSTEMD_ACTIVATED_FD,
-                        socket.AF_INET,
-                        socket.SOCK_STREAM,
-                    ),
+                    NabService.socket_address(self.unix_socket),
                 )
             )
-        else:
-            server_task = self.loop.create_task(
-                asyncio.start_server(
-                    self.service_loop, NabService.HOST, NabService.PORT_NUMBER
+        return servers
+
+    def state_changed(self):
+        """
+        Save state to state file, shortly.
+        """
+        if self.state_file is not None:
+            self.state_file.changed()
+
+    def state_snapshot(self) -> Dict[str, Any]:
+        """
+        Return info, ears and scheduled packets, to be saved as JSON.
+        Expiration of info is converted back to a date.
+        """
+        assert self.loop is not None
+        info = []
+        for info_id, animation in self.info.items():
+            info_packet: Dict[str, Any] = {
+                "type": "info",
+                "info_id": info_id,
+                "animation": animation,
+            }
+            entry = self.info_rotation.entries.get(info_id)
+            if entry is not None:
+                info_packet["priority"] = entry.priority
+            timer = self.info_timers.get(info_id)
+            if timer is not None:
+                expiration = time.time() + timer.when() - self.loop.time()
+                info_packet["expiration"] = (
+                    datetime.datetime.fromtimestamp(expiration)
+                    .astimezone()
+                    .isoformat()
+                )
+            info.append(info_packet)
+        scheduled = []
+        for packet, _ in self.scheduler:
+            saved = Nabd.saved_packet(packet)
+            if saved is not None:
+                scheduled.append(saved)
+        return {"info": info, "ears": self.ears, "scheduled": scheduled}
+
+    @staticmethod
+    def saved_packet(packet: AnyPacket) -> Optional[AnyPacket]:
+        """
+        Return a copy of packet which can be saved as JSON, with prepared
+        sequences replaced by the sequence they were prepared from, or None
+        if this sequence is unknown.
+        """
+        packet_type = packet["type"]
+        if packet_type == "batch":
+            sub_packets = [
+                Nabd.saved_packet(sub_packet)
+                for sub_packet in packet["packets"]
+            ]
+            if None in sub_packets:
+                return None
+            return {**packet, "packets": sub_packets}
+        if packet_type not in ("command", "message"):
+            return packet
+        slot = "sequence" if packet_type == "command" else "body"
+        sequence = packet[slot]
+        if isinstance(sequence, PreparedSequence):
+            if sequence.source is None:
+                return None
+            sequence = sequence.source
+        return {**packet, slot: sequence}
+
+    def restore_state(self, state: Dict[str, Any]):
+        """
+        Restore info, ears and scheduled packets saved by a previous run.
+        Scheduled packets are played without a response, as their services
+        disconnected.
+        """
+        for info_packet in Nabd.saved_packets(state, "info"):
+            try:
+                self.update_info(cast(InfoPacket, info_packet))
+            except Exception as err:
+                logging.warning(f"Ignoring saved packet {info_packet}: {err}")
+        ears = state.get("ears")
+        if isinstance(ears, dict):
+            for ear in ("left", "right"):
+                if isinstance(ears.get(ear), int):
+                    self.ears[ear] = ears[ear]
+        for packet in Nabd.saved_packets(state, "scheduled"):
+            self.scheduler.push((packet, None))
+        logging.info(
+            f"restored {len(self.info)} info and "
+            f"{len(self.scheduler)} scheduled packets"
+        )
+
+    @staticmethod
+    def saved_packets(state: Dict[str, Any], key: str) -> List[AnyPacket]:
+        """
+        Return saved packets which are still valid, as the state file may
+        have been written by another version.
+        """
+        packets = state.get(key)
+        if not isinstance(packets, list):
+            return []
+        return [
+            packet for packet in packets if Nabd.valid_saved_packet(packet)
+        ]
+
+    @staticmethod
+    def valid_saved_packet(packet: Any) -> bool:
+        validator = None
+        if isinstance(packet, dict):
+            validator = PACKET_VALIDATORS.get(packet.get("type"))
+        if (
+            validator is None
+            or validator(packet) is not None
+            or Nabd.check_info_animations(packet) is not None
+        ):
+            logging.warning(f"Ignoring saved packet {packet}")
+            return False
+        return True
+
+    def request_handoff(self):
+        """
+        Restart nabd without closing service connections (on SIGUSR2).
+        """
+        assert self.loop is not None
+        if self.handoff_task is None:
+            logging.info("restarting, waiting for services")
+            self.handoff_task = self.loop.create_task(
+                self.handoff_to_new_process()
+            )
+
+    async def handoff_to_new_process(self):
+        """
+        Wait until nabd is between packets, then save listening sockets,
+        service connections and state for a new process and stop loop.
+        main() then executes the new process, with the same pid.
+        Give up after HANDOFF_TIMEOUT, as a service may not read packets.
+        """
+        assert self.loop is not None
+        deadline = self.loop.time() + Nabd.HANDOFF_TIMEOUT
+        while self.loop.time() < deadline:
+            async with self.idle_cv:
+                if self.ready_for_handoff():
+                    self.pause_services(True)
+                    # Let service loops move data received before reading
+                    # was paused to their buffers, and maybe read a packet.
+                    await asyncio.sleep(0)
+                    if self.ready_for_handoff():
+                        self.handoff_path = handoff.save(
+                            self.handoff_snapshot(), self.handoff_directory()
+                        )
+                        self.loop.stop()
+                        return
+                    self.pause_services(False)
+            await asyncio.sleep(Nabd.HANDOFF_POLL)
+        logging.error("services are busy, restart canceled")
+        self.handoff_task = None
+
+    def ready_for_handoff(self) -> bool:
+        """
+        Return whether nabd is not playing or recording, and services were
+        sent all packets and are waiting for their next one.
+        Lock is acquired.
+        """
+        assert self.server_task is not None
+        return (
+            self.server_task.done()
+            and self.state not in (State.PLAYING, State.RECORDING)
+            and not self.interactive_tasks
+            and all(
+                writer in self.service_readers
+                for writer in self.service_writers
+            )
+            and all(
+                queue.is_empty() for queue in self.outbound_queues.values()
+            )
+        )
+
+    def pause_services(self, pause: bool):
+        for writer in self.service_writers:
+            if pause:
+                writer.transport.pause_reading()
+            else:
+                writer.transport.resume_reading()
+
+    def handoff_directory(self) -> Optional[str]:
+        """
+        Return the directory of the handoff file, next to the state file.
+        """
+        if self.state_file is None:
+            return None
+        return os.path.dirname(os.path.abspath(self.state_file.path))
+
+    def handoff_snapshot(self) -> Dict[str, Any]:
+        """
+        Return what a new process needs to take over, to be saved as JSON.
+        Services are no longer read: data they send next is read by the new
+        process, after the unread beginning of their next packet.
+        """
+        assert self.server_task is not None
+        writers = list(self.service_writers)
+        clients = {writer: index for index, writer in enumerate(writers)}
+        services = []
+        for writer in writers:
+            framing = self.service_framings.get(writer, codec.JSON_LINES)
+            unread = self.service_readers[writer].unread()
+            services.append(
+                {
+                    "fd": handoff.inheritable_fd(
+                        writer.get_extra_info("socket")
+                    ),
+                    "framing": framing.NAME,
+                    "events": self.service_writers[writer],
+                    "unread": base64.b64encode(unread).decode("ascii"),
+                }
+            )
+        listeners = [
+            handoff.inheritable_fd(sock)
+            for server in self.server_task.result()
+            for sock in server.sockets
+        ]
+        state = self.state_snapshot()
+        # Scheduled packets are taken over with their service
+        del state["scheduled"]
+        interactive = None
+        if self.interactive_service_writer is not None:
+            interactive = clients[self.interactive_service_writer]
+        return {
+            "state": state,
+            "mode": self.state.value,
+            "interactive_service": interactive,
+            "interactive_events": self.interactive_service_events,
+            "registry": list(self.registry.entries.values()),
+            "prepared": [
+                [prepared_handle, prepared.source]
+                for prepared_handle, prepared in self.prepared.entries.items()
+                if prepared.source is not None
+            ],
+            "idle_queue": Nabd.handoff_items(self.idle_queue, clients),
+            "scheduled": Nabd.handoff_items(self.scheduler, clients),
+            "listeners": listeners,
+            "services": services,
+        }
+
+    @staticmethod
+    def handoff_items(
+        items: Iterable[IdleQueueItem],
+        clients: Dict[asyncio.StreamWriter, int],
+    ) -> List[Dict[str, Any]]:
+        """
+        Return items with the index of their service, if any.
+        """
+        saved = []
+        for packet, writer in items:
+            saved_packet = Nabd.saved_packet(packet)
+            if saved_packet is not None:
+                saved.append(
+                    {"packet": saved_packet, "client": clients.get(writer)}
                 )
+        return saved
+
+    def take_over_state(self, taken_over: Dict[str, Any]):
+        """
+        Restore state of previous process, except for services.
+        """
+        self.restore_state(taken_over["state"])
+        for payload in taken_over["registry"]:
+            self.registry.register(payload)
+        if taken_over["mode"] == State.ASLEEP.value:
+            self.idle_queue.push(({"type": "sleep"}, None))
+        elif taken_over["mode"] == State.INTERACTIVE.value:
+            # Interactive service is set once connections are taken over.
+            self.state = State.INTERACTIVE
+
+    async def take_over_services(self, taken_over: Dict[str, Any]):
+        """
+        Serve service connections of previous process, with their prepared,
+        queued and scheduled packets.
+        """
+        assert self.loop is not None
+        for prepared_handle, source in taken_over["prepared"]:
+            prepared = await self.nabio.prepare_sequence(source)
+            self.prepared.restore(prepared_handle, prepared)
+        streams = []
+        for service in taken_over["services"]:
+            reader, writer = await handoff.open_connection(service["fd"])
+            streams.append((reader, writer))
+        writers = [writer for _, writer in streams]
+        for key, queue in (
+            ("idle_queue", self.idle_queue),
+            ("scheduled", self.scheduler),
+        ):
+            for item in taken_over[key]:
+                if Nabd.valid_saved_packet(item["packet"]):
+                    client = item["client"]
+                    writer = None if client is None else writers[client]
+                    queue.push((item["packet"], writer))
+        interactive = taken_over["interactive_service"]
+        if interactive is not None:
+            self.interactive_service_writer = writers[interactive]
+            self.interactive_service_events = taken_over["interactive_events"]
+        for (reader, writer), service in zip(streams, taken_over["services"]):
+            task = self.loop.create_task(
+                self.service_loop(reader, writer, service)
             )
+            self.service_tasks.add(task)
+            task.add_done_callback(self.service_tasks.discard)
+        logging.info(f"took over {len(streams)} service connections")
+        await self.notify_idle_worker()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> List[asyncio.Task]:
+        """
+        Bind hardware events and start idle worker and servers on loop.
+        Return tasks to check once loop is stopped.
+        """
+        self.loop = loop
+        self.nabio.bind_button_event(self.loop, self.button_callback)
+        self.nabio.bind_ears_event(self.loop, self.ears_callback)
+        self.nabio.bind_rfid_event(self.loop, self.rfid_callback)
+        self.idle_queue.bind_expiration(self.loop, self.idle_item_expired)
+        self.scheduler.bind(
+            self.loop, self.prepare_scheduled_item, self.scheduled_item_due
+        )
+        taken_over = None
+        if self.handoff_file is not None:
+            taken_over = handoff.load(self.handoff_file)
+            self.take_over_state(taken_over)
+        elif self.state_file is not None:
+            state = self.state_file.load()
+            if state is not None:
+                self.restore_state(state)
+        if self.state_file is not None:
+            self.state_file.bind(self.loop, self.state_snapshot)
+        self.connectivity.start(self.loop)
+        self.idle_task = self.loop.create_task(self.idle_worker_loop())
+        self.server_task = self.loop.create_task(
+            self.start_servers(taken_over)
+        )
+        tasks = [self.idle_task, self.server_task]
+        if taken_over is not None:
+            tasks.append(
+                self.loop.create_task(self.take_over_services(taken_over))
+            )
+        return tasks
+
+    async def shutdown(self):
+        """
+        Stop idle worker and servers and close service connections.
+        """
+        assert self.server_task is not None
+        await self.stop_idle_worker()
+        await self.connectivity.stop()
+        if self.recognizer is not None:
+            self.recognizer.stop()
+        for server in self.server_task.result():
+            server.close()
+        if self.state_file is not None:
+            # Before scheduled packets of services are removed
+            self.state_file.close()
+        for writer in self.service_writers.copy():
+            writer.close()
+            await writer.wait_closed()
+
+    def run(self):
+        Nabd.run_instances(asyncio.get_event_loop(), [self])
+
+    @staticmethod
+    def run_instances(
+        loop: asyncio.AbstractEventLoop, instances: List["Nabd"]
+    ):
+        """
+        Run instances on loop until it is stopped, then shut them down and
+        close loop.
+        """
+        tasks = []
+        for instance in instances:
+            tasks.extend(instance.start(loop))
         try:
-            self.loop.run_forever()
-            for t in [idle_task, server_task]:
+            loop.run_forever()
+            for t in tasks:
                 if t.done():
                     t_ex = t.exception()
                     if t_ex:
@@ -1244,20 +2232,16 @@ class Nabd:
             print(error_msg)
             logging.critical(error_msg)
         finally:
-            self.loop.run_until_complete(self.stop_idle_worker())
-            server = server_task.result()
-            server.close()
-            for writer in self.service_writers.copy():
-                writer.close()
-                self.loop.run_until_complete(writer.wait_closed())
-            tasks = asyncio.all_tasks(self.loop)
-            for t in [t for t in tasks if not (t.done() or t.cancelled())]:
+            for instance in instances:
+                loop.run_until_complete(instance.shutdown())
+            pending = asyncio.all_tasks(loop)
+            for t in [t for t in pending if not (t.done() or t.cancelled())]:
                 # give canceled tasks the last chance to run
                 try:
-                    self.loop.run_until_complete(t)
+                    loop.run_until_complete(t)
                 except asyncio.CancelledError:
                     pass
-            self.loop.close()
+            loop.close()
 
     def stop(self):
         assert self.loop is not None
@@ -1317,6 +2301,7 @@ class Nabd:
     def main(argv):
         nablogging.setup_logging("nabd")
         pidfilepath = "/run/nabd.pid"
+        statefilepath = "/run/nabd.state"
         hardware_platform = hardware.device_model()
         if hardware.is_pi_zero(hardware_platform):
             # running on Pi Zero or Zero 2 hardware
@@ -1334,9 +2319,15 @@ class Nabd:
             f" --pidfile=<pidfile> define pidfile (default = {pidfilepath})\n"
             " --nabio=<nabio> define nabio class "
             f"(default = {nabiocls.__module__}.{nabiocls.__name__})\n"
+            " --fleet=<count>     run <count> virtual rabbits\n"
+            f" --state=<statefile> define state file "
+            f"(default = {statefilepath})\n"
         )
+        fleet = None
         try:
-            opts, args = getopt.getopt(argv, "h", ["pidfile=", "nabio="])
+            opts, args = getopt.getopt(
+                argv, "h", ["pidfile=", "nabio=", "fleet=", "state="]
+            )
         except getopt.GetoptError:
             print(usage)
             exit(2)
@@ -1350,14 +2341,43 @@ class Nabd:
                 from pydoc import locate
 
                 nabiocls = cast(Type[NabIO], locate(arg))
+            elif opt == "--state":
+                statefilepath = arg
+            elif opt == "--fleet":
+                try:
+                    fleet = int(arg)
+                except ValueError:
+                    print(usage)
+                    exit(2)
         pidfile = PIDLockFile(pidfilepath, timeout=-1)
         try:
             with pidfile:
+                if fleet is not None:
+                    from .fleet import create_fleet
+
+                    logging.info(f"running {fleet} virtual rabbits")
+                    Nabd.run_instances(
+                        asyncio.get_event_loop(), create_fleet(fleet)
+                    )
+                    return
                 nabio = nabiocls()
                 Nabd.leds_boot(nabio, 1)
-                nabd = Nabd(nabio)
+                nabd = Nabd(
+                    nabio,
+                    state_file=statefilepath,
+                    handoff_file=os.environ.pop(handoff.HANDOFF_ENV, None),
+                )
                 logging.info(f"running on {hardware_platform}")
+                loop = asyncio.get_event_loop()
+                loop.add_signal_handler(signal.SIGUSR2, nabd.request_handoff)
                 nabd.run()
+            if nabd.handoff_path is not None:
+                # Pid file was released, new process locks it again.
+                os.environ[handoff.HANDOFF_ENV] = nabd.handoff_path
+                os.execv(
+                    sys.executable,
+                    [sys.executable, "-m", "nabd.nabd"] + argv,
+                )
         except AlreadyLocked:
             error_msg = f"nabd already running? (pid={pidfile.read_pid()})"
             print(error_msg)
@@ -1,12 +1,13 @@
 import abc
 import asyncio
-import time
-from asyncio import Event
 from typing import Optional
 
+from .cancel import CancelToken
 from .choreography import ChoreographyInterpreter
 from .ears import Ears
+from .info_animation import InfoPlayer
 from .leds import Led
+from .prepared import PreparedSequence
 from .rfid import Rfid
 
 
@@ -31,7 +32,8 @@ class NabIO(object, metaclass=abc.ABCMeta):
     def __init__(self):
         super().__init__()
         self.rfid: Optional[Rfid]
-        self.cancel_event = Event()
+        # Token of the running sequence or message, replaced for each one
+        self.cancel_token = CancelToken()
 
     async def setup_ears(self, left_ear, right_ear):
         """
@@ -73,11 +75,27 @@ class NabIO(object, metaclass=abc.ABCMeta):
         """
         return await self.ears.detect_positions()
 
+    async def suspend(self):
+        """
+        Enter low power mode while asleep: stop the leds thread and release
+        the sound device. Button, ears and rfid are interrupt driven or
+        polled by kernel drivers and keep working.
+        """
+        self.leds.suspend()
+        await self.sound.suspend()
+
+    async def resume(self):
+        """
+        Leave low power mode.
+        """
+        self.leds.resume()
+        await self.sound.resume()
+
     def set_leds(self, nose, left, center, right, bottom):
         """
         Set the leds. None means to turn them off.
         """
-        for (led_ix, led) in [
+        for led_ix, led in [
             (Led.NOSE, nose),
             (Led.LEFT, left),
             (Led.CENTER, center),
@@ -152,31 +170,24 @@ class NabIO(object, metaclass=abc.ABCMeta):
         if self.rfid is not None:
             self.rfid.on_detect(loop, callback)
 
-    async def play_info(self, condvar, tempo, colors):
+    async def play_info(self, condvar, info, duration=None):
         """
-        Play an info animation.
-        tempo & colors are as described in the nabd protocol.
-        Run the animation in loop for the complete info duration (15 seconds)
-        or until condvar is notified
+        Play an info animation, compiled into an InfoAnimation.
+        Run the animation in loop for duration seconds (by default, 15
+        seconds) or until condvar is notified
 
-        If 'left'/'center'/'right' slots are absent, the light is off.
         Return true if condvar was notified
         """
-        animation = [NabIO._convert_info_color(color) for color in colors]
-        step_ms = tempo * 10
-        start = time.time()
-        index = 0
-        notified = False
-        while time.time() - start < NabIO.INFO_LOOP_LENGTH:
-            step = animation[index]
-            for led_ix, rgb in step:
-                r, g, b = rgb
-                self.leds.set1(led_ix, r, g, b)
-            if await NabIO._wait_on_condvar(condvar, step_ms):
-                index = (index + 1) % len(animation)
-            else:
-                notified = True
-                break
+        if duration is None:
+            duration = NabIO.INFO_LOOP_LENGTH
+        player = InfoPlayer(self.leds, info, asyncio.get_event_loop())
+        player.start()
+        try:
+            notified = not await NabIO._wait_on_condvar(
+                condvar, duration * 1000
+            )
+        finally:
+            player.stop()
         self.clear_info()
         return notified
 
@@ -193,27 +204,6 @@ class NabIO(object, metaclass=abc.ABCMeta):
             timeout = True
         return timeout
 
-    @staticmethod
-    def _convert_info_color(color):
-        animation = []
-        for led_ix, led in [
-            (Led.LEFT, "left"),
-            (Led.CENTER, "center"),
-            (Led.RIGHT, "right"),
-        ]:
-            values = []
-            if color[led]:
-                int_value = int(color[led], 16)
-                values.append((int_value >> 16) & 0xFF)  # r
-                values.append((int_value >> 8) & 0xFF)  # g
-                values.append(int_value & 0xFF)  # b
-            else:
-                values.append(0)
-                values.append(0)
-                values.append(0)
-            animation.append((led_ix, values))
-        return animation
-
     async def start_acquisition(self, acquisition_cb):
         """
         Play listen sound and start acquisition, calling callback with sound
@@ -229,7 +219,19 @@ class NabIO(object, metaclass=abc.ABCMeta):
         """
         Play acquired sound and call callback with finalize.
         """
+        await self.stop_acquisition()
+        await self.acquisition_feedback()
+
+    async def stop_acquisition(self):
+        """
+        Stop acquisition and call callback with finalize.
+        """
         await self.sound.stop_recording()
+
+    async def acquisition_feedback(self):
+        """
+        Play acquired sound.
+        """
         await self.sound.play_list(["asr/acquired.mp3"], False)
 
     async def asr_failed(self):
@@ -242,11 +244,14 @@ class NabIO(object, metaclass=abc.ABCMeta):
         """
         Play a message, i.e. a signature, a body and a signature.
         """
-        self.cancel_event.clear()
+        self.cancel_token = CancelToken()
         # Turn leds red while ears go to 0, 0
         await self.move_ears_with_leds((255, 0, 0), 0, 0)
         preloaded_sig = await self._preload([signature])
-        preloaded_body = await self._preload(body)
+        if isinstance(body, PreparedSequence):
+            preloaded_body = body.items
+        else:
+            preloaded_body = await self._preload(body)
         ci = ChoreographyInterpreter(self.leds, self.ears, self.sound)
         await self._play_preloaded(
             ci, preloaded_sig, ChoreographyInterpreter.STREAMING_URN
@@ -262,62 +267,94 @@ class NabIO(object, metaclass=abc.ABCMeta):
 
     async def play_sequence(self, sequence):
         """
-        Play a simple sequence
+        Play a simple sequence, possibly prepared with prepare_sequence()
         """
-        self.cancel_event.clear()
-        preloaded = await self._preload(sequence)
+        self.cancel_token = CancelToken()
+        if isinstance(sequence, PreparedSequence):
+            preloaded = sequence.items
+        else:
+            preloaded = await self._preload(sequence)
         ci = ChoreographyInterpreter(self.leds, self.ears, self.sound)
         await self._play_preloaded(ci, preloaded, None)
 
     async def _play_preloaded(self, ci, preloaded, default_chor):
+        token = self.cancel_token
         for seq_item in preloaded:
-            if self.cancel_event.is_set():
+            if token.is_set():
                 break
             if "choreography" in seq_item:
                 chor = seq_item["choreography"]
             else:
                 chor = default_chor
             if chor is not None:
-                await ci.start(chor)
+                await ci.start(chor, token)
             else:
                 await ci.stop()
             if "audio" in seq_item:
-                await self.sound.play_list(
-                    seq_item["audio"], True, self.cancel_event
-                )
+                await self.sound.play_list(seq_item["audio"], True, token)
                 if chor is not None:
                     await ci.stop()
             elif "choreography" in seq_item:
-                await ci.wait_until_complete(self.cancel_event)
+                await ci.wait_until_complete(token)
+
+    async def prepare_sequence(self, sequence):
+        """
+        Prepare a sequence ahead of play_sequence() or play_message(): resolve
+        audio resources, decode the beginning of sounds and load
+        choreographies.
+        """
+        items = []
+        for seq_item in sequence:
+            item = {}
+            if "audio" in seq_item:
+                item["audio"] = [
+                    await self.sound.prepare(f)
+                    for f in await self._preload_audio(seq_item)
+                ]
+            if "choreography" in seq_item:
+                chor = seq_item["choreography"]
+                try:
+                    item["choreography"] = await ChoreographyInterpreter.load(
+                        chor
+                    )
+                except Exception:
+                    # Errors are reported when it is played.
+                    item["choreography"] = chor
+            items.append(item)
+        return PreparedSequence(items, sequence)
 
     async def _preload(self, sequence):
         preloaded_sequence = []
         for seq_item in sequence:
-            if self.cancel_event.is_set():
+            if self.cancel_token.is_set():
                 break
             if "audio" in seq_item:
-                preloaded_audio_list = []
-                if isinstance(seq_item["audio"], str):
-                    print(
-                        f"Warning: audio should be a list of resources "
-                        f"(sequence item: {seq_item})"
-                    )
-                    audio_list = [seq_item["audio"]]
-                else:
-                    audio_list = seq_item["audio"]
-                for res in audio_list:
-                    f = await self.sound.preload(res)
-                    if f is not None:
-                        preloaded_audio_list.append(f)
-                seq_item["audio"] = preloaded_audio_list
+                seq_item["audio"] = await self._preload_audio(seq_item)
             preloaded_sequence.append(seq_item)
         return preloaded_sequence
 
+    async def _preload_audio(self, seq_item):
+        preloaded_audio_list = []
+        if isinstance(seq_item["audio"], str):
+            print(
+                f"Warning: audio should be a list of resources "
+                f"(sequence item: {seq_item})"
+            )
+            audio_list = [seq_item["audio"]]
+        else:
+            audio_list = seq_item["audio"]
+        for res in audio_list:
+            f = await self.sound.preload(res)
+            if f is not None:
+                preloaded_audio_list.append(f)
+        return preloaded_audio_list
+
     async def cancel(self, feedback=False):
         """
         Cancel currently running sequence or info animation.
+        Playback stops within one audio period.
         """
-        self.cancel_event.set()
+        self.cancel_token.cancel()
         if feedback:
             await self.sound.play_list(["nabd/abort.wav"], False)
 
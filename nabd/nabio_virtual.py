@@ -18,14 +18,18 @@ class NabIOVirtual(NabIO):
     Virtual implementation of nabio for web development
     """
 
-    def __init__(self):
+    def __init__(self, port=None):
+        """
+        Display the rabbit to clients connecting to port (by default, the
+        port next to nabd's).
+        """
         super().__init__()
+        if port is None:
+            port = NabService.PORT_NUMBER + 1
         self.virtual_clients = set()
         self.loop = asyncio.get_event_loop()
         self.loop.create_task(
-            asyncio.start_server(
-                self.virtual_loop, NabService.HOST, NabService.PORT_NUMBER + 1
-            )
+            asyncio.start_server(self.virtual_loop, NabService.HOST, port)
         )
         self.ears = EarsVirtual(self)
         self.leds = LedsVirtual(self)
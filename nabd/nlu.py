@@ -1,9 +1,6 @@
 import traceback
-from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from snips_nlu import SnipsNLUEngine  # type: ignore
-
 from nabweb import settings
 
 
@@ -27,10 +24,12 @@ class NLU:
             return NLU.DEFAULT_LOCALE
 
     def __init__(self, locale):
-        self.executor = ThreadPoolExecutor(max_workers=1)
         self._load_model(locale)
 
     def _load_model(self, locale):
+        # Snips is only loaded by the recognizer process
+        from snips_nlu import SnipsNLUEngine  # type: ignore
+
         try:
             locale = NLU.get_locale(locale)
             path = NLU.ENGINES[locale]
@@ -40,15 +39,12 @@ class NLU:
         except Exception:
             print(traceback.format_exc())
 
-    async def interpret(self, string):
+    def parse(self, string):
         """
-        Interpret string from asr.
+        Interpret string from asr synchronously.
         Return None if interpretation failed.
+        Thread: recognizer process
         """
-        future = self.executor.submit(lambda s=string: self._interpret(s))
-        return future.result()
-
-    def _interpret(self, string):
         try:
             if string == "":
                 return None
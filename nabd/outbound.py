@@ -0,0 +1,99 @@
+import asyncio
+import collections
+import logging
+from enum import Enum
+from typing import Deque, Optional, Tuple
+
+
+class PacketKind(Enum):
+    RESPONSE = "response"
+    STATE = "state"
+    EVENT = "event"
+
+
+class OutboundQueue:
+    """
+    Bounded queue of packets written to a service.
+
+    Packets are written directly to the transport as long as its buffer is
+    below HIGH_WATER. Beyond, they are queued and written by a drain task
+    once the service has read what was already sent:
+    - responses are always queued, as services wait for them;
+    - only the latest state is kept;
+    - events are dropped if MAX_QUEUED packets are already waiting.
+    """
+
+    HIGH_WATER = 64 * 1024  # default asyncio transport high-water mark
+    MAX_QUEUED = 32
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        self.writer = writer
+        self.queue: Deque[Tuple[PacketKind, bytes]] = collections.deque()
+        self.state_queued = False
+        self.wakeup = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.coalesced = 0
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self.task = loop.create_task(self.drain_loop())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def _buffer_size(self) -> int:
+        transport = self.writer.transport
+        if transport.is_closing():
+            return 0
+        return transport.get_write_buffer_size()
+
+    def is_empty(self) -> bool:
+        """
+        Return whether all packets were sent to the service.
+        """
+        return not self.queue and self._buffer_size() == 0
+
+    def put(self, kind: PacketKind, data: bytes):
+        """
+        Write or queue a serialized packet.
+        """
+        if not self.queue and self._buffer_size() < self.HIGH_WATER:
+            self.writer.write(data)
+            return
+        if kind == PacketKind.STATE:
+            if self.state_queued:
+                for item in self.queue:
+                    if item[0] == PacketKind.STATE:
+                        self.queue.remove(item)
+                        break
+                self.coalesced += 1
+            self.state_queued = True
+        elif kind == PacketKind.EVENT and len(self.queue) >= self.MAX_QUEUED:
+            self.dropped += 1
+            logging.debug(
+                f"service is not reading, dropped event ({self.dropped} "
+                f"dropped)"
+            )
+            return
+        self.queue.append((kind, data))
+        self.wakeup.set()
+
+    async def drain_loop(self):
+        try:
+            while True:
+                await self.wakeup.wait()
+                self.wakeup.clear()
+                while self.queue:
+                    await self.writer.drain()
+                    kind, data = self.queue.popleft()
+                    if kind == PacketKind.STATE:
+                        self.state_queued = False
+                    self.writer.write(data)
+        except ConnectionError:
+            pass
@@ -0,0 +1,106 @@
+import collections
+import itertools
+from typing import Any, List, Optional, OrderedDict
+
+from nabcommon.typing import AnyPacket
+
+from .registry import UnknownResource
+
+HANDLE_PREFIX = "prepared:"
+
+
+class PreparedSequence:
+    """
+    Sequence ready to be played: audio resources are resolved and the
+    beginning of sounds is decoded, choreographies are loaded.
+    """
+
+    def __init__(
+        self, items: List[AnyPacket], source: Optional[List[Any]] = None
+    ):
+        self.items = items
+        # Sequence it was prepared from, to save scheduled packets
+        self.source = source
+
+
+class PreparedSequences:
+    """
+    Sequences prepared with prepare packets, until a command or message
+    plays them by their handle.
+
+    Handles can be played once, as decoded audio is consumed by playback.
+    Least recently prepared sequences are released beyond MAX_ENTRIES:
+    services should prepare them again when a packet is rejected with
+    UnknownResource.
+    """
+
+    MAX_ENTRIES = 16
+
+    def __init__(self):
+        self.entries: OrderedDict[str, PreparedSequence] = (
+            collections.OrderedDict()
+        )
+        self.counter = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def add(self, prepared: PreparedSequence) -> str:
+        handle = f"{HANDLE_PREFIX}{next(self.counter)}"
+        self.entries[handle] = prepared
+        if len(self.entries) > self.MAX_ENTRIES:
+            self.entries.popitem(last=False)
+        return handle
+
+    def restore(self, handle: str, prepared: PreparedSequence):
+        """
+        Add a sequence prepared again under its handle from a previous
+        process.
+        """
+        self.entries[handle] = prepared
+        number = int(handle[len(HANDLE_PREFIX) :])
+        self.counter = itertools.count(max(number + 1, next(self.counter)))
+
+    def take(self, handle: str) -> PreparedSequence:
+        """
+        Return and forget the sequence prepared under handle.
+        """
+        prepared = self.entries.pop(handle, None)
+        if prepared is None:
+            raise UnknownResource(f"Unknown prepared sequence {handle}")
+        return prepared
+
+    def check(self, packet: AnyPacket):
+        """
+        Raise UnknownResource if a handle of packet is unknown.
+        """
+        for parent, slot in self._handle_slots(packet):
+            if parent[slot] not in self.entries:
+                raise UnknownResource(
+                    f"Unknown prepared sequence {parent[slot]}"
+                )
+
+    def resolve(self, packet: AnyPacket):
+        """
+        Replace handles by prepared sequences in packet, in place, once it
+        is accepted. Raise UnknownResource if a handle is unknown. Handles
+        are only taken if all of them are known.
+        """
+        self.check(packet)
+        for parent, slot in list(self._handle_slots(packet)):
+            parent[slot] = self.take(parent[slot])
+
+    def _handle_slots(self, packet: AnyPacket) -> Any:
+        packet_type = packet["type"]
+        if packet_type == "command":
+            slot = "sequence"
+        elif packet_type == "message":
+            slot = "body"
+        elif packet_type == "batch":
+            for sub_packet in packet["packets"]:
+                yield from self._handle_slots(sub_packet)
+            return
+        else:
+            return
+        if isinstance(packet[slot], str):
+            yield packet, slot
@@ -0,0 +1,223 @@
+"""
+Speech recognition (ASR) and understanding (NLU) in a worker process.
+
+Kaldi decoding and snips parsing are CPU intensive and their models are
+large: running them in a separate process keeps them from competing for the
+GIL with nabd's event loop, and keeps their memory out of nabd. A crash of
+the worker only fails the current utterance: the worker is restarted.
+
+Recorded chunks are sent to the worker through a pipe as they are captured,
+so decoding still overlaps recording. nabd writes them to the pipe as
+captured, and the worker receives them in a preallocated buffer, so they
+are not copied on either side.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Optional, Tuple
+
+# 100ms of S16_LE samples at 16kHz (ASR.CHUNK_SAMPLES). ASR is not imported
+# here so that nabd does not load Kaldi.
+CHUNK_BYTES = 1600 * 2
+
+# Decoded string, NLU response, ASR time and NLU time in the worker
+Recognition = Tuple[str, Optional[Any], float, float]
+NOT_RECOGNIZED: Recognition = ("", None, 0.0, 0.0)
+
+
+def serve(conn: Connection, asr, nlu):
+    """
+    Worker loop: tell models are loaded, then decode chunks and reply to
+    recognize requests until the connection is closed.
+    """
+    conn.send(("ready",))
+    # Chunks are received into this buffer and decoded from views on it
+    chunk = bytearray(CHUNK_BYTES)
+    while True:
+        try:
+            message = conn.recv()
+            if message[0] == "decode":
+                frames = receive_chunk(conn, chunk)
+        except EOFError:
+            break
+        if message[0] == "decode":
+            try:
+                asr.decode(frames, message[1])
+            except Exception:
+                print(traceback.format_exc())
+        elif message[0] == "recognize":
+            start = time.monotonic()
+            decoded_str = asr.decoded_string()
+            asr_done = time.monotonic()
+            response = nlu.parse(decoded_str)
+            nlu_done = time.monotonic()
+            conn.send(
+                (
+                    "recognition",
+                    message[1],
+                    (
+                        decoded_str,
+                        response,
+                        asr_done - start,
+                        nlu_done - asr_done,
+                    ),
+                )
+            )
+
+
+def receive_chunk(conn: Connection, chunk: bytearray) -> Any:
+    """
+    Receive frames sent with send_bytes into chunk, and return a view on
+    them. Frames larger than chunk are returned as bytes.
+    """
+    try:
+        size = conn.recv_bytes_into(chunk)
+    except multiprocessing.BufferTooShort as err:
+        return err.args[0]
+    return memoryview(chunk)[:size]
+
+
+def recognizer_main(conn: Connection, locale: str):
+    """
+    Entry point of the worker process.
+    """
+    from .asr import ASR
+    from .nlu import NLU
+
+    serve(conn, ASR(locale), NLU(locale))
+
+
+class Recognizer:
+    """
+    Proxy to ASR and NLU running in a worker process.
+
+    decode_chunk() is called by the recording thread. Chunks are sent in
+    order from a dedicated thread, so the recording thread never blocks on
+    the pipe.
+
+    Utterances are not recognized while the worker loads its models, and
+    the worker is restarted if it does not respond in time.
+    """
+
+    # Maximum time for the worker to load models
+    LOAD_TIMEOUT = 60.0
+    # Maximum time to wait for the worker to recognize an utterance once
+    # chunks are sent, as decoding overlaps recording.
+    TIMEOUT = 10.0
+
+    def __init__(
+        self,
+        locale: str,
+        target: Callable[[Connection, str], None] = recognizer_main,
+    ):
+        self.locale = locale
+        self.target = target
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.start()
+
+    def start(self):
+        self.ready = False
+        self.started = time.monotonic()
+        # Sequence number of recognize requests, to ignore late responses
+        self.requests = 0
+        # Do not fork nabd, with its threads and event loop.
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=self.target,
+            args=(child_conn, self.locale),
+            name="nabd-recognizer",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        # Worker exits when connection is closed
+        self.conn.close()
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+
+    def restart(self, locale: Optional[str] = None):
+        if locale is not None:
+            self.locale = locale
+        self.stop()
+        self.start()
+
+    async def set_locale(self, locale: str):
+        """
+        Restart worker with models for locale, after pending chunks are sent.
+        """
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self.restart, locale)
+
+    def decode_chunk(self, frames: bytes, finalize: bool):
+        """
+        Submit recorded frames (S16_LE) for decoding.
+        Thread: recording thread
+        """
+        self.executor.submit(self._send_chunk, frames, finalize)
+
+    def _send_chunk(self, frames: bytes, finalize: bool):
+        try:
+            # Frames are written to the pipe as they were captured
+            self.conn.send(("decode", finalize))
+            self.conn.send_bytes(frames)
+        except OSError:
+            logging.error("recognizer worker is not running")
+
+    async def recognize(self) -> Recognition:
+        """
+        Return decoded string, NLU response (None if the utterance was not
+        understood) and ASR and NLU times, once every submitted chunk is
+        decoded.
+        """
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, self._recognize)
+
+    def _recognize(self) -> Recognition:
+        try:
+            self.requests += 1
+            self.conn.send(("recognize", self.requests))
+            while self.ready or self.conn.poll(0):
+                if not self.conn.poll(self.TIMEOUT):
+                    logging.error("recognizer worker timed out, restarting it")
+                    break
+                message = self.conn.recv()
+                if message[0] == "ready":
+                    self.ready = True
+                elif message[1] == self.requests:
+                    return message[2]
+            else:
+                if not self.process.is_alive():
+                    logging.error("recognizer worker crashed, restarting it")
+                elif time.monotonic() - self.started < self.LOAD_TIMEOUT:
+                    # Chunks will be decoded and the response ignored once
+                    # models are loaded.
+                    logging.warning("recognizer worker is loading models")
+                    return NOT_RECOGNIZED
+                else:
+                    logging.error(
+                        "recognizer worker did not load models, restarting it"
+                    )
+        except (EOFError, OSError):
+            logging.error("recognizer worker crashed, restarting it")
+        self.restart()
+        return NOT_RECOGNIZED
+
+    @staticmethod
+    def models(locale: str) -> Tuple[str, str]:
+        """
+        Return locales of ASR and NLU models loaded for locale.
+        """
+        from .asr import ASR
+        from .nlu import NLU
+
+        return ASR.get_locale(locale), NLU.get_locale(locale)
@@ -0,0 +1,113 @@
+import base64
+import binascii
+import collections
+import hashlib
+import json
+from typing import Any, Optional, OrderedDict
+
+from nabcommon.typing import AnyPacket
+
+from .choreography import ChoreographyInterpreter
+
+HASH_PREFIX = "sha256:"
+
+
+def resource_hash(payload: Any) -> str:
+    """
+    Compute the hash of an animation or a choreography, from its canonical
+    JSON serialization (sorted keys, no whitespace, ASCII only).
+    """
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(canonical.encode("ascii")).hexdigest()
+    return HASH_PREFIX + digest
+
+
+class UnknownResource(Exception):
+    pass
+
+
+class ResourceRegistry:
+    """
+    Content-addressed registry of animations and inline choreographies.
+
+    Services register a payload once and then reference it by hash in info,
+    command, message and batch packets. Identical payloads are stored once
+    and packets referencing them share the same validated object. Least
+    recently used payloads are evicted beyond MAX_ENTRIES: services should
+    register them again when a packet is rejected with UnknownResource.
+    """
+
+    MAX_ENTRIES = 128
+
+    def __init__(self):
+        self.entries: OrderedDict[str, Any] = collections.OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def register(self, payload: Any) -> str:
+        key = resource_hash(payload)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        else:
+            self.entries[key] = payload
+            if len(self.entries) > self.MAX_ENTRIES:
+                self.entries.popitem(last=False)
+        return key
+
+    def get(self, key: str, payload_type: type) -> Any:
+        """
+        Return the payload registered under key, which should be an instance
+        of payload_type (dict for animations, str for choreographies).
+        """
+        payload = self.entries.get(key)
+        if not isinstance(payload, payload_type):
+            raise UnknownResource(f"Unknown resource {key}")
+        self.entries.move_to_end(key)
+        return payload
+
+    @staticmethod
+    def check_choreography(choreography: str) -> Optional[str]:
+        """
+        Return an error message if choreography is not an inline
+        choreography.
+        """
+        scheme = ChoreographyInterpreter.DATA_MTL_BINARY_SCHEME + ";base64,"
+        if not choreography.startswith(scheme):
+            return "Only inline choreographies can be registered"
+        try:
+            base64.b64decode(choreography[len(scheme) :], validate=True)
+        except binascii.Error:
+            return "Invalid base64 data in choreography"
+        return None
+
+    def resolve(self, packet: AnyPacket):
+        """
+        Replace references by registered payloads in packet, in place.
+        Raise UnknownResource if a reference is not registered.
+        """
+        packet_type = packet["type"]
+        if packet_type == "info":
+            animation = packet.get("animation")
+            if isinstance(animation, str):
+                packet["animation"] = self.get(animation, dict)
+        elif packet_type in ("command", "prepare"):
+            self._resolve_sequence(packet["sequence"])
+        elif packet_type == "message":
+            if "signature" in packet:
+                self._resolve_choreography(packet["signature"])
+            self._resolve_sequence(packet["body"])
+        elif packet_type == "batch":
+            for sub_packet in packet["packets"]:
+                self.resolve(sub_packet)
+
+    def _resolve_sequence(self, sequence: Any):
+        # Handles of prepared sequences are resolved by PreparedSequences
+        if isinstance(sequence, list):
+            for item in sequence:
+                self._resolve_choreography(item)
+
+    def _resolve_choreography(self, item: AnyPacket):
+        choreography = item.get("choreography")
+        if choreography is not None and choreography.startswith(HASH_PREFIX):
+            item["choreography"] = self.get(choreography, str)
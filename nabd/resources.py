@@ -1,11 +1,152 @@
+import fnmatch
+import logging
 import os
 import random
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 
 from nabweb import settings
 
+from .inotify import Inotify
+
+
+class ResourcesIndex(object):
+    """
+    In-memory index of resources files, built once by walking the
+    <app>/<type>/ trees of every application.
+
+    The index is invalidated through inotify whenever a file or directory is
+    added, removed or renamed in one of the indexed trees, or a directory is
+    added, removed or renamed in the base directory or in an application
+    directory (new application or new <app>/<type>/ tree).
+    """
+
+    TYPES = ("sounds", "choreographies")
+
+    def __init__(self):
+        self.types = set(ResourcesIndex.TYPES)
+        self.inotify = None
+        if Inotify.is_available():
+            try:
+                self.inotify = Inotify()
+            except OSError as err:
+                logging.warning(f"resources index not watched: {err}")
+        self.built = False
+        # (type, relative path) -> (app index, path)
+        self.files = {}
+        # (type, relative directory) -> [(app index, path)]
+        self.dirs = {}
+        # (type, locale, relative path) -> path or None
+        self.lookups = {}
+        # (type, locale, relative directory, pattern) -> sorted paths
+        self.pools = {}
+
+    def invalidate(self):
+        self.built = False
+        self.files = {}
+        self.dirs = {}
+        self.lookups = {}
+        self.pools = {}
+
+    def _check(self, type):
+        if type not in self.types:
+            self.types.add(type)
+            self.built = False
+        if self.inotify is not None and self.inotify.has_events():
+            logging.debug("resources changed, invalidating index")
+            self.built = False
+        if not self.built:
+            self.invalidate()
+            self._build()
+
+    def _build(self):
+        if self.inotify is not None:
+            # Start afresh to drop watches of removed directories
+            self.inotify.close()
+            try:
+                self.inotify = Inotify()
+            except OSError as err:
+                logging.warning(f"resources index not watched: {err}")
+                self.inotify = None
+        basepath = Path(settings.BASE_DIR)
+        if self.inotify is not None:
+            self.inotify.add_watch(basepath, dirs_only=True)
+        for app_ix, app in enumerate(os.listdir(basepath)):
+            app_path = basepath.joinpath(app)
+            if not app_path.is_dir():
+                continue
+            if self.inotify is not None:
+                self.inotify.add_watch(app_path, dirs_only=True)
+            for type in self.types:
+                type_path = app_path.joinpath(type)
+                if not type_path.is_dir():
+                    continue
+                self._index_tree(app_ix, type, type_path)
+        self.built = True
+
+    def _index_tree(self, app_ix, type, type_path):
+        for dirpath, dirnames, filenames in os.walk(
+            type_path, followlinks=True
+        ):
+            if self.inotify is not None:
+                self.inotify.add_watch(dirpath)
+            reldir = Path(dirpath).relative_to(type_path).as_posix()
+            entries = self.dirs.setdefault((type, reldir), [])
+            for filename in filenames:
+                path = Path(dirpath, filename)
+                entries.append((app_ix, path))
+                relpath = PurePosixPath(reldir, filename).as_posix()
+                self.files.setdefault((type, relpath), (app_ix, path))
+
+    def find_file(self, type, locale, filename):
+        self._check(type)
+        key = (type, locale, filename)
+        if key in self.lookups:
+            return self.lookups[key]
+        relpath = PurePosixPath(filename).as_posix()
+        localized = self.files.get(
+            (type, PurePosixPath(locale, relpath).as_posix())
+        )
+        generic = self.files.get((type, relpath))
+        # Applications are scanned in order, localized version first.
+        if localized is not None and (
+            generic is None or localized[0] <= generic[0]
+        ):
+            result = localized[1]
+        elif generic is not None:
+            result = generic[1]
+        else:
+            result = None
+        self.lookups[key] = result
+        return result
+
+    def find_pool(self, type, locale, parent, pattern):
+        self._check(type)
+        key = (type, locale, parent, pattern)
+        if key in self.pools:
+            return self.pools[key]
+        pool = []
+        for reldir in [
+            PurePosixPath(locale, parent).as_posix(),
+            PurePosixPath(parent).as_posix(),
+        ]:
+            for _, path in self.dirs.get((type, reldir), []):
+                # Like Path.glob, hidden files match
+                if fnmatch.fnmatchcase(path.name, pattern):
+                    pool.append(path)
+        result = tuple(sorted(pool))
+        self.pools[key] = result
+        return result
+
 
 class Resources(object):
+    _index = None
+
+    @staticmethod
+    def index():
+        if Resources._index is None:
+            Resources._index = ResourcesIndex()
+        return Resources._index
+
     @staticmethod
     async def find(type, resources):
         """
@@ -44,38 +185,15 @@ class Resources(object):
     async def _find_file(type, filename):
         from .i18n import get_locale
 
-        basepath = Path(settings.BASE_DIR)
         locale = await get_locale()
-
-        for app in os.listdir(basepath):
-            if not os.path.isdir(app):
-                continue
-            for path in [
-                basepath.joinpath(app, type, locale, filename),
-                basepath.joinpath(app, type, filename),
-            ]:
-                if path.is_file():
-                    return path
-        return None
+        return Resources.index().find_file(type, locale, filename)
 
     @staticmethod
     async def _find_random(type, parent, pattern):
-
         from .i18n import get_locale
 
-        basepath = Path(settings.BASE_DIR)
         locale = await get_locale()
-
-        filelist = []
-        for app in os.listdir(basepath):
-            if not os.path.isdir(app):
-                continue
-            for path in [
-                basepath.joinpath(app, type, locale, parent),
-                basepath.joinpath(app, type, parent),
-            ]:
-                if path.is_dir():
-                    filelist = filelist + list(path.glob(pattern))
-        if filelist != []:
-            return random.choice(sorted(filelist))  # nosec B311
+        filelist = Resources.index().find_pool(type, locale, parent, pattern)
+        if filelist:
+            return random.choice(filelist)  # nosec B311
         return None
@@ -0,0 +1,121 @@
+import asyncio
+import bisect
+import itertools
+import time
+from typing import Any, Callable, Iterator, List, Optional
+
+from .idle_queue import IdleQueueItem, monotonic_deadline
+
+
+class _Entry:
+    __slots__ = ("key", "item", "handles", "task")
+
+    def __init__(self, key, item):
+        self.key = key
+        self.item = item
+        self.handles: List[asyncio.TimerHandle] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class Scheduler:
+    """
+    Command and message packets waiting for the date of their at slot.
+
+    Dates are parsed once, into deadlines on the loop's monotonic clock.
+    Once bound to a loop, items are prepared PREPARE_AHEAD seconds before
+    their deadline, and are released when it is reached, once prepared.
+    """
+
+    PREPARE_AHEAD = 2.0
+
+    def __init__(self):
+        self.entries: List[_Entry] = []
+        self.counter = itertools.count()
+        self.clock: Callable[[], float] = time.monotonic
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.prepare_callback: Optional[Callable[[IdleQueueItem], Any]] = None
+        self.due_callback: Optional[Callable[[IdleQueueItem], None]] = None
+
+    def bind(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        prepare_callback: Callable[[IdleQueueItem], Any],
+        due_callback: Callable[[IdleQueueItem], None],
+    ):
+        """
+        Run coroutine prepare_callback on loop with items which deadline is
+        near and call due_callback with items which deadline is reached.
+        """
+        self.loop = loop
+        self.clock = loop.time
+        self.prepare_callback = prepare_callback
+        self.due_callback = due_callback
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __iter__(self) -> Iterator[IdleQueueItem]:
+        return (entry.item for entry in self.entries)
+
+    def push(self, item: IdleQueueItem):
+        deadline = monotonic_deadline(item[0]["at"], self.clock)
+        entry = _Entry((deadline, next(self.counter)), item)
+        bisect.insort(self.entries, entry)
+        if self.loop is not None:
+            prepare_at = deadline - Scheduler.PREPARE_AHEAD
+            if prepare_at > self.clock():
+                # Otherwise, there is no time left to prepare it.
+                entry.handles.append(
+                    self.loop.call_at(prepare_at, self._prepare, entry)
+                )
+            entry.handles.append(self.loop.call_at(deadline, self._due, entry))
+
+    def _prepare(self, entry: _Entry):
+        assert self.loop is not None and self.prepare_callback is not None
+        if entry in self.entries:
+            entry.task = self.loop.create_task(
+                self.prepare_callback(entry.item)
+            )
+
+    def _due(self, entry: _Entry):
+        if entry in self.entries:
+            if entry.task is not None and not entry.task.done():
+                # Items are not changed once released
+                entry.task.add_done_callback(lambda task: self._due(entry))
+                return
+            self.entries.remove(entry)
+            if self.due_callback is not None:
+                self.due_callback(entry.item)
+
+    def remove(self, predicate: Callable[[IdleQueueItem], bool]):
+        """
+        Remove and return items matching predicate.
+        """
+        removed = []
+        kept = []
+        for entry in self.entries:
+            if predicate(entry.item):
+                for handle in entry.handles:
+                    handle.cancel()
+                if entry.task is not None:
+                    entry.task.cancel()
+                removed.append(entry.item)
+            else:
+                kept.append(entry)
+        self.entries = kept
+        return removed
+
+    def disown(self, writer: Any) -> bool:
+        """
+        Keep items of writer once it is disconnected, without writer.
+        Return whether there were any.
+        """
+        disowned = False
+        for entry in self.entries:
+            if entry.item[1] == writer:
+                entry.item = (entry.item[0], None)
+                disowned = True
+        return disowned
@@ -1,5 +1,6 @@
 import abc
 
+from .cancel import is_canceled
 from .resources import Resources
 
 
@@ -17,7 +18,17 @@ class Sound(object, metaclass=abc.ABCMeta):
         print(f"Warning : could not find resource {audio_resource}")
         return None
 
-    async def play_list(self, filenames, preloaded, event=None):
+    async def prepare(self, filename):
+        """
+        Prepare a preloaded sound for playback, e.g. by decoding its
+        beginning. Return what start_playing_preloaded() should be given.
+        """
+        return filename
+
+    async def play_list(self, filenames, preloaded, token=None):
+        """
+        Play sounds in sequence until they are played or token is canceled.
+        """
         preloaded_list = []
         if preloaded:
             preloaded_list = filenames
@@ -28,19 +39,33 @@ class Sound(object, metaclass=abc.ABCMeta):
                     preloaded_list.append(preloaded_file)
         await self.stop_playing()
         for filename in preloaded_list:
-            await self.start_playing_preloaded(filename)
-            await self.wait_until_done(event)
+            if is_canceled(token):
+                break
+            await self.start_playing_preloaded(filename, token)
+            await self.wait_until_done(token)
 
     async def start_playing(self, audio_resource):
         preloaded = await self.preload(audio_resource)
         if preloaded is not None:
             await self.start_playing_preloaded(preloaded)
 
+    async def suspend(self):
+        """
+        Release the sound device while the rabbit is asleep.
+        """
+        await self.stop_playing()
+
+    async def resume(self):
+        """
+        Resume after suspend().
+        """
+
     @abc.abstractmethod
-    async def start_playing_preloaded(self, filename):
+    async def start_playing_preloaded(self, filename, token=None):
         """
         Start to play a given sound.
         Stop currently playing sound if any.
+        Playback stops within one audio period once token is canceled.
         """
         raise NotImplementedError("Should have implemented")
 
@@ -1,6 +1,7 @@
 import asyncio
 import functools
 import io
+import itertools
 import logging
 import traceback
 import wave
@@ -10,10 +11,62 @@ from urllib.request import urlopen
 import alsaaudio  # type: ignore
 from mpg123 import Mpg123  # type: ignore
 
-from .cancel import wait_with_cancel_event
+from .cancel import is_canceled, wait_with_cancel_event
 from .sound import Sound
 
 
+class DecodedMp3:  # pragma: no cover
+    """
+    MP3 file being decoded into chunks of one period, the first ones being
+    decoded ahead of playback.
+    """
+
+    def __init__(self, filename, periods_ahead=0):
+        self.filename = filename
+        mp3 = Mpg123(filename)
+        self.rate, self.channels, encoding = mp3.get_format()
+        self.width = mp3.get_width_by_encoding(encoding)
+        self.periodsize = self.rate // SoundAlsa.PERIODS_PER_SECOND
+        self.periods = DecodedMp3._periods(
+            mp3, self.periodsize * self.width * self.channels
+        )
+        self.head = list(itertools.islice(self.periods, periods_ahead))
+
+    def __str__(self):
+        return self.filename
+
+    @staticmethod
+    def _periods(mp3, target_chunk_size):
+        chunk = io.BytesIO()
+        chunk_length = 0
+        for frames in mp3.iter_frames():
+            if (chunk_length + len(frames)) <= target_chunk_size:
+                # Chunk is still smaller than what ALSA device expects
+                # (one period)
+                chunk_length += chunk.write(frames)
+            else:
+                frames_view = memoryview(frames)
+                remaining = target_chunk_size - chunk_length
+                chunk_length += chunk.write(frames_view[:remaining])
+                yield chunk.getvalue()
+                chunk.seek(0)
+                chunk_length = 0
+                chunk_length += chunk.write(frames_view[remaining:])
+
+        # ALSA device expects chunks of fixed period size
+        # Pad the sound with silence to complete last chunk
+        if chunk_length > 0:
+            remaining = target_chunk_size - chunk_length
+            chunk.write(bytearray(remaining))
+            yield chunk.getvalue()
+
+    def chunks(self):
+        """
+        Iterate over chunks, starting with those decoded ahead.
+        """
+        return itertools.chain(self.head, self.periods)
+
+
 class SoundAlsa(Sound):  # pragma: no cover
     MODEL_2018_CARD_NAME = "sndrpihifiberry"
     MODEL_2019_CARD_NAME = "tagtagtagsound"
@@ -22,6 +75,14 @@ class SoundAlsa(Sound):  # pragma: no cover
         (MODEL_2018_CARD_NAME, MODEL_2019_CARD_NAME)
     )
 
+    # Playback is written one period (100ms) at a time, and cancellation is
+    # checked between periods. pyalsaaudio buffers 4 periods (400ms, which
+    # avoids underruns on a Pi Zero), dropped on cancellation: stopping
+    # takes at most one period.
+    PERIODS_PER_SECOND = 10
+    # Periods of prepared mp3 files decoded ahead of playback (500ms)
+    PERIODS_AHEAD = 5
+
     def __init__(self, hw_model):
         self.sound_card = ""
         self.playback_device = "null"
@@ -108,31 +169,41 @@ class SoundAlsa(Sound):  # pragma: no cover
         """
         return self.sound_card
 
-    def _play(self, filename):
+    def _playing(self, token):
+        return self.currently_playing and not is_canceled(token)
+
+    def _play(self, filename, token):
+        device = None
         try:
             device = alsaaudio.PCM(device=self.playback_device)
-            if (
+            if isinstance(filename, DecodedMp3):
+                self._play_decoded_mp3(device, filename, token)
+            elif (
                 filename.startswith("http://")
                 or filename.startswith("https://")
             ) and filename.endswith(".mp3"):
-                self._stream_mp3(device, filename)
+                self._stream_mp3(device, filename, token)
             elif filename.endswith(".wav"):
-                self._play_wav_file(device, filename)
+                self._play_wav_file(device, filename, token)
             elif filename.endswith(".mp3"):
-                self._play_mp3_file(device, filename)
+                self._play_mp3_file(device, filename, token)
         except Exception as err:
             logging.error(f"{filename}: {err}")
         finally:
+            if device is not None:
+                if not self._playing(token):
+                    # Discard buffered periods: close() would play them
+                    device.drop()
+                device.close()
             self.currently_playing = False
-            device.close()
 
-    def _play_wav_file(self, device, filename):
+    def _play_wav_file(self, device, filename, token):
         with wave.open(filename, "rb") as f:
             channels = f.getnchannels()
             width = f.getsampwidth()
             rate = f.getframerate()
             self._setup_device(device, channels, rate, width)
-            periodsize = rate // 10  # 1/10th of second
+            periodsize = rate // SoundAlsa.PERIODS_PER_SECOND
             device.setperiodsize(periodsize)
             target_chunk_size = periodsize * channels * width
 
@@ -141,7 +212,7 @@ class SoundAlsa(Sound):  # pragma: no cover
             # do it for consistency
             chunk_length = 0
             data = f.readframes(periodsize)
-            while data and self.currently_playing:
+            while data and self._playing(token):
                 chunk_length += chunk.write(data)
 
                 if chunk_length < target_chunk_size:
@@ -157,41 +228,18 @@ class SoundAlsa(Sound):  # pragma: no cover
                 chunk_length = 0
                 data = f.readframes(periodsize)
 
-    def _play_mp3_file(self, device, filename):
-        mp3 = Mpg123(filename)
-        rate, channels, encoding = mp3.get_format()
-        width = mp3.get_width_by_encoding(encoding)
-        self._setup_device(device, channels, rate, width)
-        periodsize = rate // 10  # 1/10th of second
-        device.setperiodsize(periodsize)
-        target_chunk_size = periodsize * width * channels
-        chunk = io.BytesIO()
-        chunk_length = 0
-        for frames in mp3.iter_frames():
-            if (chunk_length + len(frames)) <= target_chunk_size:
-                # Chunk is still smaller than what ALSA device expects
-                # (0.1 sec)
-                chunk_length += chunk.write(frames)
-            else:
-                frames_view = memoryview(frames)
-                remaining = target_chunk_size - chunk_length
-                chunk_length += chunk.write(frames_view[:remaining])
-                device.write(chunk.getvalue())
-                chunk.seek(0)
-                chunk_length = 0
-                chunk_length += chunk.write(frames_view[remaining:])
+    def _play_mp3_file(self, device, filename, token):
+        self._play_decoded_mp3(device, DecodedMp3(filename), token)
 
-            if not self.currently_playing:
+    def _play_decoded_mp3(self, device, mp3, token):
+        self._setup_device(device, mp3.channels, mp3.rate, mp3.width)
+        device.setperiodsize(mp3.periodsize)
+        for chunk in mp3.chunks():
+            if not self._playing(token):
                 break
+            device.write(chunk)
 
-        # ALSA device expects chunks of fixed period size
-        # Pad the sound with silence to complete last chunk
-        if chunk_length > 0:
-            remaining = target_chunk_size - chunk_length
-            chunk.write(bytearray(remaining))
-            device.write(chunk.getvalue())
-
-    def _stream_mp3(self, device, url):
+    def _stream_mp3(self, device, url, token):
         mp3 = Mpg123()
         # url begins with http:// or https:// (see above)
         response = urlopen(url)  # nosec B310
@@ -203,16 +251,16 @@ class SoundAlsa(Sound):  # pragma: no cover
         rate, channels, encoding = mp3.get_format()
         width = mp3.get_width_by_encoding(encoding)
         self._setup_device(device, channels, rate, width)
-        periodsize = rate // 10  # 1/10th of second
+        periodsize = rate // SoundAlsa.PERIODS_PER_SECOND
         device.setperiodsize(periodsize)
         target_chunk_size = periodsize * width * channels
         alsachunk = io.BytesIO()
         chunk_length = 0
-        while self.currently_playing:
+        while self._playing(token):
             for frames in mp3.iter_frames():
                 if (chunk_length + len(frames)) <= target_chunk_size:
                     # Chunk is still smaller than what ALSA device expects
-                    # (0.1 sec)
+                    # (one period)
                     chunk_length += alsachunk.write(frames)
                 else:
                     frames_view = memoryview(frames)
@@ -223,7 +271,7 @@ class SoundAlsa(Sound):  # pragma: no cover
                     chunk_length = 0
                     chunk_length += alsachunk.write(frames_view[remaining:])
 
-                if not self.currently_playing:
+                if not self._playing(token):
                     break
             mp3chunk = response.read(4096)
             if not mp3chunk:
@@ -232,7 +280,7 @@ class SoundAlsa(Sound):  # pragma: no cover
 
         # ALSA device expects chunks of fixed period size
         # Pad the sound with silence to complete last chunk
-        if chunk_length > 0:
+        if chunk_length > 0 and self._playing(token):
             remaining = target_chunk_size - chunk_length
             alsachunk.write(bytearray(remaining))
             device.write(alsachunk.getvalue())
@@ -253,6 +301,11 @@ class SoundAlsa(Sound):  # pragma: no cover
         await wait_with_cancel_event(self.future, event, self.stop_playing)
         self.future = None
 
+    async def suspend(self):
+        # The codec is powered down by ALSA once no PCM device is open
+        await self.stop_playing()
+        await self.stop_recording()
+
     async def start_recording(self, stream_cb):
         logging.debug("SoundAlsa: start recording")
         await self.stop_playing()
@@ -264,7 +317,7 @@ class SoundAlsa(Sound):  # pragma: no cover
             )
             self._recorded_raw = open("sound_alsa_recording.raw", "wb")
         self.future = asyncio.get_event_loop().run_in_executor(
-            self.executor, lambda cb=stream_cb: self._record(cb)
+            self.executor, self._record, stream_cb
         )
 
     def _record(self, cb):
@@ -360,11 +413,25 @@ class SoundAlsa(Sound):  # pragma: no cover
                 dev.close()
         return True
 
-    async def start_playing_preloaded(self, filename):
+    async def prepare(self, filename):
+        if filename.endswith(".mp3") and not (
+            filename.startswith("http://") or filename.startswith("https://")
+        ):
+            # Playback executor may be busy: decode in the default one
+            try:
+                return await asyncio.get_event_loop().run_in_executor(
+                    None, DecodedMp3, filename, SoundAlsa.PERIODS_AHEAD
+                )
+            except Exception as err:
+                # Errors are reported when it is played.
+                logging.debug(f"{filename}: {err}")
+        return filename
+
+    async def start_playing_preloaded(self, filename, token=None):
         await self.stop_playing()
         self.currently_playing = True
         self.future = asyncio.get_event_loop().run_in_executor(
-            self.executor, lambda f=filename: self._play(f)
+            self.executor, self._play, filename, token
         )
 
     __PCM_FORMAT_BY_WIDTH = {
@@ -10,6 +10,9 @@ from .sound import Sound
 
 
 class SoundVirtual(Sound):
+    # Playback is simulated one period at a time
+    PERIOD = 0.02
+
     def __init__(self, nabio_virtual):
         super().__init__()
         self.nabio_virtual = nabio_virtual
@@ -17,31 +20,46 @@ class SoundVirtual(Sound):
         self.future = None
         self.currently_playing = False
 
-    def _play(self, filename):
+    def _play(self, filename, token):
         try:
             if filename.endswith(".wav"):
                 with wave.open(filename, "rb") as f:
                     rate = f.getframerate()
                     frames = f.getnframes()
                     duration = frames / float(rate)
-                    time.sleep(duration)
+                    self._simulate(duration, token)
             elif filename.endswith(".mp3"):
                 mp3 = Mpg123(filename)
                 rate, channels, encoding = mp3.get_format()
                 frames = mp3.length()
                 duration = frames / float(rate)
-                time.sleep(duration)
+                self._simulate(duration, token)
         finally:
             self.currently_playing = False
             self.nabio_virtual.update_rabbit()
 
-    async def start_playing_preloaded(self, filename):
+    def _simulate(self, duration, token):
+        """
+        Wait for duration, or until playback is stopped or token is canceled.
+        """
+        end = time.monotonic() + duration
+        while self.currently_playing:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            period = min(remaining, SoundVirtual.PERIOD)
+            if token is None:
+                time.sleep(period)
+            elif token.sleep(period):
+                break
+
+    async def start_playing_preloaded(self, filename, token=None):
         await self.stop_playing()
         self.currently_playing = True
         self.sound_file = filename
         self.nabio_virtual.update_rabbit()
         self.future = asyncio.get_event_loop().run_in_executor(
-            self.executor, lambda f=filename: self._play(f)
+            self.executor, self._play, filename, token
         )
 
     async def wait_until_done(self, event=None):
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Optional
+
+StateSnapshot = Dict[str, Any]
+
+
+class StateFile:
+    """
+    Runtime state of nabd saved to a small local file, so it is restored
+    when nabd restarts.
+
+    Changes are saved at most every SAVE_DELAY seconds, and on shutdown.
+    The file is replaced atomically, so a crash leaves the previous state.
+    """
+
+    SAVE_DELAY = 1.0
+
+    def __init__(self, path: str):
+        self.path = path
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.snapshot: Optional[Callable[[], StateSnapshot]] = None
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.closed = False
+
+    def bind(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        snapshot: Callable[[], StateSnapshot],
+    ):
+        """
+        Save state returned by snapshot on loop, once changed.
+        """
+        self.loop = loop
+        self.snapshot = snapshot
+
+    def load(self) -> Optional[StateSnapshot]:
+        """
+        Return saved state, or None if there is none or it is unreadable.
+        """
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as err:
+            logging.warning(f"Ignoring state file {self.path}: {err}")
+            return None
+        if not isinstance(state, dict):
+            logging.warning(f"Ignoring state file {self.path}: not an object")
+            return None
+        return state
+
+    def changed(self):
+        """
+        Schedule a save of state, unless one is already scheduled.
+        """
+        if self.closed or self.handle is not None or self.loop is None:
+            return
+        self.handle = self.loop.call_later(StateFile.SAVE_DELAY, self.save)
+
+    def save(self):
+        """
+        Save state now.
+        """
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        assert self.snapshot is not None
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, self.path)
+        except OSError as err:
+            logging.error(f"Cannot save state to {self.path}: {err}")
+
+    def close(self):
+        """
+        Save state a last time and ignore later changes.
+        """
+        if not self.closed and self.snapshot is not None:
+            self.save()
+        self.closed = True
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Dict, Iterable, List, Tuple
+
+
+class EventSubscriptions:
+    """
+    Index of event subscriptions of services in idle mode.
+
+    Services subscribe to exact event types (e.g. "button", "rfid/nabclockd")
+    or to all event types with a given prefix (e.g. "rfid/*"). Writers
+    matching an event type are computed once and cached until subscriptions
+    change.
+    """
+
+    def __init__(self):
+        # writers by subscribed event type, in subscription order
+        self.index: Dict[str, Dict[asyncio.StreamWriter, None]] = {}
+        self.subscriptions: Dict[asyncio.StreamWriter, List[str]] = {}
+        self.cache: Dict[str, Tuple[asyncio.StreamWriter, ...]] = {}
+
+    def subscribe(self, writer: asyncio.StreamWriter, events: Iterable[str]):
+        """
+        Set the events writer is subscribed to, replacing previous ones.
+        """
+        self.unsubscribe(writer)
+        events = list(dict.fromkeys(events))
+        self.subscriptions[writer] = events
+        for event in events:
+            self.index.setdefault(event, {})[writer] = None
+        self.cache.clear()
+
+    def unsubscribe(self, writer: asyncio.StreamWriter):
+        for event in self.subscriptions.pop(writer, []):
+            writers = self.index[event]
+            writers.pop(writer, None)
+            if not writers:
+                del self.index[event]
+        self.cache.clear()
+
+    def match(self, event_type: str) -> Tuple[asyncio.StreamWriter, ...]:
+        """
+        Return writers subscribed to event_type.
+        """
+        writers = self.cache.get(event_type)
+        if writers is None:
+            matching = dict(self.index.get(event_type, {}))
+            prefix, slash, _ = event_type.partition("/")
+            if slash:
+                matching.update(self.index.get(prefix + "/*", {}))
+            writers = tuple(matching)
+            self.cache[event_type] = writers
+        return writers
@@ -0,0 +1,77 @@
+import unittest
+
+from nabd.admission import (
+    DEFAULT_SERVICE_CLASS,
+    TokenBucket,
+    admission_key,
+    admission_policy,
+    service_class,
+)
+
+
+class TestAdmission(unittest.TestCase):
+    def test_service_class(self):
+        self.assertEqual(service_class(None), "tcp")
+        self.assertEqual(
+            service_class(
+                ["/opt/pynab/venv/bin/python", "-m", "nabclockd.nabclockd"]
+            ),
+            "nabclockd",
+        )
+        self.assertEqual(
+            service_class(
+                [
+                    "/opt/pynab/venv/bin/python",
+                    "/opt/pynab/venv/bin/gunicorn",
+                    "--timeout",
+                    "60",
+                    "nabweb.wsgi",
+                ]
+            ),
+            "nabweb",
+        )
+        self.assertEqual(
+            service_class(["python3", "script.py"]), DEFAULT_SERVICE_CLASS
+        )
+        self.assertEqual(
+            admission_policy("nabclockd"),
+            admission_policy(DEFAULT_SERVICE_CLASS),
+        )
+
+    def test_admission_key(self):
+        self.assertEqual(admission_key("nabweb", 1000), "nabweb")
+        self.assertEqual(admission_key("tcp", "10.0.0.1"), "tcp:10.0.0.1")
+        self.assertEqual(
+            admission_key(DEFAULT_SERVICE_CLASS, 1000),
+            DEFAULT_SERVICE_CLASS + ":1000",
+        )
+
+    def test_framing(self):
+        self.assertEqual(
+            admission_key("nabweb", 1000, "msgpack"), "nabweb/msgpack"
+        )
+        self.assertEqual(
+            admission_key("tcp", "10.0.0.1", "msgpack"),
+            "tcp:10.0.0.1/msgpack",
+        )
+        policy = admission_policy("tcp", "msgpack")
+        self.assertGreater(policy.rate, admission_policy("tcp").rate)
+        self.assertEqual(policy.max_queued, admission_policy("tcp").max_queued)
+
+    def test_token_bucket(self):
+        now = [0.0]
+        bucket = TokenBucket(2.0, 3, lambda: now[0])
+        for i in range(3):
+            self.assertEqual(bucket.take(), 0.0)
+        self.assertAlmostEqual(bucket.take(), 0.5)
+        now[0] = 0.25
+        self.assertAlmostEqual(bucket.take(), 0.25)
+        now[0] = 0.5
+        self.assertEqual(bucket.take(), 0.0)
+        self.assertAlmostEqual(bucket.take(), 0.5)
+        self.assertFalse(bucket.is_full())
+        now[0] = 100.0
+        self.assertTrue(bucket.is_full())
+        for i in range(3):
+            self.assertEqual(bucket.take(), 0.0)
+        self.assertGreater(bucket.take(), 0.0)
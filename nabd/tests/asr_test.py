@@ -1,8 +1,10 @@
 import os
 import platform
+import struct
 import sys
 import unittest
 
+import numpy as np
 import pytest
 
 from nabd.asr import ASR
@@ -24,3 +26,17 @@ class TestASR(unittest.TestCase):
     def test_load_model_fr(self):
         asr = ASR("fr_FR")
         self.assertTrue(asr.model is not None)
+
+
+class TestConversion(unittest.TestCase):
+    def test_convert(self):
+        float_samples = np.zeros(ASR.CHUNK_SAMPLES, dtype=np.float32)
+        for _ in range(20):
+            frames = os.urandom(ASR.CHUNK_SAMPLES * 2)
+            samples = struct.unpack_from(f"<{ASR.CHUNK_SAMPLES}h", frames)
+            np.testing.assert_array_equal(
+                ASR.convert(frames, float_samples),
+                np.array(samples, dtype=np.float32),
+            )
+        # Shorter chunk
+        self.assertEqual(len(ASR.convert(b"\x01\x00", float_samples)), 1)
@@ -0,0 +1,135 @@
+import asyncio
+import base64
+import os
+import tempfile
+import time
+import unittest
+import wave
+
+from nabd.cancel import CancelToken
+from nabd.choreography import ChoreographyInterpreter
+from nabd.sound_virtual import SoundVirtual
+
+from .mock import NabIOMock
+
+
+class PathSoundVirtual(SoundVirtual):
+    """Virtual sound playing files given by their path"""
+
+    async def preload(self, audio_resource):
+        return audio_resource
+
+
+class NabIOSoundVirtual(NabIOMock):
+    def __init__(self):
+        super().__init__()
+        self.sound = PathSoundVirtual(self)
+
+    def update_rabbit(self):
+        pass
+
+
+class TestCancelToken(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_cancel(self):
+        token = CancelToken()
+        self.assertFalse(token.is_set())
+        self.assertFalse(token.sleep(0.01))
+        self.loop.call_later(0.05, token.cancel)
+        self.loop.run_until_complete(
+            asyncio.wait_for(token.wait(), timeout=1.0)
+        )
+        self.assertTrue(token.is_set())
+        self.assertTrue(token.sleep(1.0))
+
+
+class TestCancelPlayback(unittest.TestCase):
+    """
+    NabIO.cancel() ends play_sequence while sound or a choreography is
+    playing, long before they would end.
+    """
+
+    SOUND_DURATION = 5.0
+    # Shorter than the sound and the first frame of the choreography
+    CANCEL_TIMEOUT = 2.0
+    # Playback observes cancellation within one audio period (100ms), with
+    # some margin for slow CI machines
+    MAX_CANCEL_LATENCY = 0.3
+
+    @classmethod
+    def setUpClass(cls):
+        fd, cls.wav_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        with wave.open(cls.wav_path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(16000)
+            f.writeframes(bytes(int(32000 * cls.SOUND_DURATION)))
+        # Frame duration of 2.55 seconds, then four frames setting a led
+        chor_bin = bytes([0, 1, 255]) + bytes([1, 7, 0, 255, 0, 0, 0, 0]) * 4
+        cls.chor = (
+            ChoreographyInterpreter.DATA_MTL_BINARY_SCHEME
+            + ";base64,"
+            + base64.b64encode(chor_bin).decode()
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        os.remove(cls.wav_path)
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.nabio = NabIOSoundVirtual()
+
+    def tearDown(self):
+        self.nabio.sound.executor.shutdown()
+        self.loop.close()
+
+    async def play_and_cancel(self, sequence):
+        task = asyncio.ensure_future(self.nabio.play_sequence(sequence))
+        await asyncio.sleep(0.3)
+        self.assertFalse(task.done())
+        start = time.monotonic()
+        await self.nabio.cancel()
+        await asyncio.wait_for(task, timeout=self.CANCEL_TIMEOUT)
+        self.assertLess(time.monotonic() - start, self.MAX_CANCEL_LATENCY)
+
+    def cancel(self, sequence):
+        self.loop.run_until_complete(self.play_and_cancel(sequence))
+        self.assertFalse(self.nabio.sound.currently_playing)
+
+    def test_cancel_audio(self):
+        self.cancel([{"audio": [self.wav_path]}])
+
+    def test_cancel_choreography(self):
+        self.cancel([{"choreography": self.chor}])
+
+    def test_cancel_audio_and_choreography(self):
+        self.cancel(
+            [
+                {"audio": [self.wav_path], "choreography": self.chor},
+                {"audio": [self.wav_path]},
+            ],
+        )
+
+    def test_sound_thread_stops(self):
+        # Playback thread observes the token without the loop
+        token = CancelToken()
+        self.loop.run_until_complete(
+            self.nabio.sound.start_playing_preloaded(self.wav_path, token)
+        )
+        future = self.nabio.sound.future
+        time.sleep(0.1)
+        start = time.monotonic()
+        token.cancel()
+        self.loop.run_until_complete(
+            asyncio.wait_for(future, timeout=self.CANCEL_TIMEOUT)
+        )
+        self.assertLess(time.monotonic() - start, self.MAX_CANCEL_LATENCY)
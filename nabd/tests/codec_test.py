@@ -0,0 +1,186 @@
+import asyncio
+import json
+import time
+import unittest
+
+from nabcommon import codec
+from nabd import nabd
+
+from .mock import NabIOMock
+
+
+class CountingWriter:
+    """Stream writer only counting written packets"""
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, data):
+        self.written += 1
+
+
+class TestCodec(unittest.TestCase):
+    def test_encode_decode(self):
+        packet = {
+            "type": "rfid_event",
+            "uid": "d0:02:18:01:02:03:04:05",
+            "app": "nabtaichid",
+            "support": "formatted",
+            "picture": 42,
+            "locked": False,
+            "data": "été",
+            "time": 1.5,
+        }
+        line = codec.encode(packet)
+        self.assertTrue(line.endswith(b"\r\n"))
+        self.assertEqual(line.count(b"\r\n"), 1)
+        self.assertEqual(json.loads(line.decode("utf8")), packet)
+        self.assertEqual(codec.decode(line), packet)
+
+    def test_decode_error(self):
+        with self.assertRaises(codec.DecodeError):
+            codec.decode(b'{"type":\r\n')
+
+
+class TestMessagePackFrames(unittest.TestCase):
+    def setUp(self):
+        self.framing = codec.FRAMINGS["msgpack"]
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def read_all(self, data):
+        reader = asyncio.StreamReader(loop=self.loop)
+        reader.feed_data(data)
+        reader.feed_eof()
+        frames = []
+        while True:
+            frame = self.loop.run_until_complete(self.framing.read(reader))
+            if frame == b"":
+                return frames
+            frames.append(frame)
+
+    def test_encode_decode(self):
+        packets = [
+            {"type": "ears", "left": 3, "right": 5},
+            {"type": "info", "info_id": "été", "animation": None},
+        ]
+        data = b"".join(self.framing.encode(packet) for packet in packets)
+        frames = self.read_all(data)
+        self.assertEqual(
+            [self.framing.decode(frame) for frame in frames], packets
+        )
+
+    def test_decode_error(self):
+        with self.assertRaises(codec.DecodeError):
+            self.framing.decode(b"\xc1")
+        frames = self.read_all(b"\x00\x00\x00\x02\x81")
+        self.assertEqual(frames, [])
+
+    def test_frame_too_large(self):
+        with self.assertRaises(ConnectionAbortedError):
+            self.read_all(b"\x7f\xff\xff\xff")
+
+
+class TestBufferedReader(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def buffered_reader(self, data, unread=b""):
+        reader = asyncio.StreamReader(loop=self.loop)
+        reader.feed_data(data)
+        reader.feed_eof()
+        return codec.BufferedReader(reader, unread)
+
+    def test_readline(self):
+        buffered_reader = self.buffered_reader(b'"info"}\r\n{"type":', b"{")
+        line = self.loop.run_until_complete(buffered_reader.readline())
+        self.assertEqual(line, b'{"info"}\r\n')
+        self.assertEqual(buffered_reader.unread(), b'{"type":')
+        self.assertFalse(buffered_reader.at_eof())
+        # Data received before end of stream
+        line = self.loop.run_until_complete(buffered_reader.readline())
+        self.assertEqual(line, b'{"type":')
+        self.assertTrue(buffered_reader.at_eof())
+
+    def test_readexactly(self):
+        buffered_reader = self.buffered_reader(b"\x02\x03\x04", b"\x01")
+        data = self.loop.run_until_complete(buffered_reader.readexactly(3))
+        self.assertEqual(data, b"\x01\x02\x03")
+        with self.assertRaises(asyncio.IncompleteReadError):
+            self.loop.run_until_complete(buffered_reader.readexactly(2))
+        self.assertTrue(buffered_reader.at_eof())
+
+    def test_line_too_long(self):
+        buffered_reader = self.buffered_reader(
+            b"x" * (codec.BufferedReader.LIMIT + 1)
+        )
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(buffered_reader.readline())
+
+
+class TestFramings(unittest.TestCase):
+    """
+    Send many small packets with each framing.
+    """
+
+    PACKETS = 100
+
+    async def receive(self, framing, data):
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return [
+            framing.decode(await framing.read(reader))
+            for _ in range(self.PACKETS)
+        ]
+
+    def test_framings(self):
+        packet = {"type": "ears", "left": 3, "right": 5, "request_id": "id"}
+        loop = asyncio.new_event_loop()
+        try:
+            for framing in codec.FRAMINGS.values():
+                data = b"".join(
+                    framing.encode(packet) for _ in range(self.PACKETS)
+                )
+                packets = loop.run_until_complete(self.receive(framing, data))
+                self.assertEqual(packets, [packet] * self.PACKETS)
+        finally:
+            loop.close()
+
+
+class TestBroadcast(unittest.TestCase):
+    """
+    Broadcasting an event to many connected services.
+    """
+
+    SERVICES = 16
+    EVENTS = 20
+
+    def setUp(self):
+        self.nabd = nabd.Nabd(NabIOMock())
+        self.writers = [CountingWriter() for _ in range(self.SERVICES)]
+        for writer in self.writers:
+            events = ["button", "ears", "rfid/*"]
+            self.nabd.service_writers[writer] = events
+            self.nabd.event_subscriptions.subscribe(writer, events)
+        self.event = {
+            "type": "rfid_event",
+            "tech": "st25tb",
+            "uid": "d0:02:18:01:02:03:04:05",
+            "event": "detected",
+            "support": "formatted",
+            "picture": 42,
+            "app": "nabtaichid",
+            "time": time.time(),
+        }
+
+    def test_broadcast(self):
+        for _ in range(self.EVENTS):
+            self.nabd.broadcast_event("rfid/nabtaichid", self.event)
+        for writer in self.writers:
+            self.assertEqual(writer.written, self.EVENTS)
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import socket
+import threading
+import time
+import unittest
+
+from django.db import close_old_connections
+
+from nabd.fleet import create_fleet, rabbit_port, rabbit_socket
+from nabd.nabd import Nabd
+
+
+class TestFleet(unittest.TestCase):
+    """
+    Run a fleet of virtual rabbits in one process, each with its own
+    sockets and state.
+    """
+
+    RABBITS = 24
+    BASE_PORT = 20543
+    SOCKET_PREFIX = "@nabd-fleet-test"
+
+    def fleet_thread_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.rabbits = create_fleet(
+            self.RABBITS, self.BASE_PORT, self.SOCKET_PREFIX
+        )
+        self.loop = loop
+        with self.fleet_cv:
+            self.fleet_cv.notify()
+        Nabd.run_instances(loop, self.rabbits)
+        close_old_connections()
+
+    def setUp(self):
+        self.buffers = {}
+        self.fleet_cv = threading.Condition()
+        with self.fleet_cv:
+            self.fleet_thread = threading.Thread(target=self.fleet_thread_loop)
+            self.fleet_thread.start()
+            self.fleet_cv.wait()
+        time.sleep(1)  # make sure rabbits were started
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.fleet_thread.join(10)
+        if self.fleet_thread.is_alive():
+            raise RuntimeError("fleet_thread still running")
+
+    def read_packet(self, sock):
+        # Several packets may be received at once
+        data = self.buffers.get(sock, b"")
+        while b"\r\n" not in data:
+            data += sock.recv(4096)
+        line, self.buffers[sock] = data.split(b"\r\n", 1)
+        return json.loads(line.decode("utf8"))
+
+    def test_fleet(self):
+        sockets = []
+        try:
+            for index in range(self.RABBITS):
+                s = socket.socket(socket.AF_UNIX)
+                s.settimeout(5.0)
+                s.connect("\0" + rabbit_socket(index, self.SOCKET_PREFIX)[1:])
+                sockets.append(s)
+                packet = self.read_packet(s)
+                self.assertEqual(packet["state"], "idle")
+            # Rabbits are isolated
+            sockets[0].sendall(b'{"type":"sleep"}\r\n')
+            self.assertEqual(self.read_packet(sockets[0])["type"], "response")
+            self.assertEqual(self.read_packet(sockets[0])["state"], "asleep")
+            self.assertEqual(self.rabbits[0].state.value, "asleep")
+            self.assertEqual(self.rabbits[1].state.value, "idle")
+            s = socket.socket()
+            s.settimeout(5.0)
+            s.connect(("127.0.0.1", rabbit_port(1, self.BASE_PORT)))
+            sockets.append(s)
+            self.assertEqual(self.read_packet(s)["state"], "idle")
+        finally:
+            for s in sockets:
+                s.close()
@@ -0,0 +1,50 @@
+import asyncio
+import os
+import socket
+import tempfile
+import unittest
+
+from nabcommon import codec
+from nabd import handoff
+
+
+class TestHandoff(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = handoff.save({"services": []}, directory)
+            self.assertEqual(os.path.dirname(path), directory)
+            self.assertEqual(handoff.load(path), {"services": []})
+            self.assertFalse(os.path.exists(path))
+
+    def test_connection(self):
+        nabd_sock, service_sock = socket.socketpair()
+        try:
+            fd = handoff.inheritable_fd(nabd_sock)
+            self.assertTrue(os.get_inheritable(fd))
+            # Previous process closes its socket
+            nabd_sock.close()
+
+            async def take_over():
+                reader, writer = await handoff.open_connection(fd)
+                # Beginning of packet read by previous process
+                buffered_reader = codec.BufferedReader(reader, b'{"type":')
+                service_sock.sendall(b'"info"}\r\n{"type":')
+                line = await buffered_reader.readline()
+                unread = buffered_reader.unread()
+                writer.write(b"ok\r\n")
+                await writer.drain()
+                writer.close()
+                return line, unread
+
+            line, unread = self.loop.run_until_complete(take_over())
+            self.assertEqual(line, b'{"type":"info"}\r\n')
+            self.assertEqual(unread, b'{"type":')
+            self.assertEqual(service_sock.recv(4096), b"ok\r\n")
+        finally:
+            service_sock.close()
@@ -0,0 +1,107 @@
+import asyncio
+import datetime
+import unittest
+
+from nabd.idle_queue import IdleQueue
+
+
+class TestIdleQueue(unittest.TestCase):
+    def setUp(self):
+        self.queue = IdleQueue()
+
+    def command(self, request_id, **slots):
+        packet = {"type": "command", "request_id": request_id, "sequence": []}
+        packet.update(slots)
+        return packet
+
+    def pop_all(self):
+        request_ids = []
+        while len(self.queue) > 0:
+            packet, _writer = self.queue.pop()
+            request_ids.append(packet["request_id"])
+        return request_ids
+
+    def test_fifo(self):
+        for request_id in ["a", "b", "c"]:
+            self.assertEqual(
+                self.queue.push((self.command(request_id), 1)), []
+            )
+        self.assertEqual(
+            [p["request_id"] for p, _ in self.queue], ["a", "b", "c"]
+        )
+        self.assertEqual(self.pop_all(), ["a", "b", "c"])
+        self.assertEqual(self.queue.wait_time(), 0.0)
+
+    def test_wait_time(self):
+        now = [100.0]
+        self.queue.clock = lambda: now[0]
+        self.queue.push((self.command("a"), 1))
+        now[0] = 101.0
+        self.queue.defer((self.command("b"), 1))
+        now[0] = 103.5
+        self.assertEqual(self.queue.wait_time(), 3.5)
+        self.queue.pop()
+        self.assertEqual(self.queue.wait_time(), 2.5)
+
+    def test_priority_and_deadline(self):
+        soon = datetime.datetime.now() + datetime.timedelta(minutes=1)
+        later = soon + datetime.timedelta(minutes=1)
+        self.queue.push((self.command("a"), 1))
+        self.queue.push((self.command("b", expiration=later.isoformat()), 1))
+        self.queue.push((self.command("c", expiration=soon.isoformat()), 1))
+        self.queue.push((self.command("d", priority=1), 1))
+        self.queue.push((self.command("e", priority=-1), 1))
+        self.assertEqual(self.pop_all(), ["d", "c", "b", "a", "e"])
+
+    def test_defer(self):
+        self.queue.push((self.command("a", priority=1), 1))
+        self.queue.defer(({"type": "sleep", "request_id": "s"}, 1))
+        self.queue.push((self.command("b", priority=-1), 1))
+        self.assertEqual(self.pop_all(), ["a", "b", "s"])
+
+    def test_coalesce(self):
+        self.queue.push((self.command("a"), 1))
+        self.queue.push((self.command("clock/1"), 1))
+        self.queue.push((self.command("clock/2"), 2))
+        self.queue.push((self.command("weather/1"), 1))
+        self.queue.push(({"type": "message", "request_id": "clock/3"}, 1))
+        superseded = self.queue.push(
+            (self.command("clock/4", coalesce=True), 1)
+        )
+        self.assertEqual([p["request_id"] for p, _ in superseded], ["clock/1"])
+        superseded = self.queue.push((self.command("b", coalesce=True), 1))
+        self.assertEqual([p["request_id"] for p, _ in superseded], ["a"])
+        self.assertEqual(
+            self.pop_all(), ["clock/2", "weather/1", "clock/3", "clock/4", "b"]
+        )
+
+    def test_expire(self):
+        past = "2019-01-01T00:00:00"
+        future = (
+            datetime.datetime.now(datetime.timezone.utc)
+            + datetime.timedelta(minutes=1)
+        ).isoformat()
+        self.queue.push((self.command("a", expiration=past), 1))
+        self.queue.push((self.command("b", expiration=future), 1))
+        self.queue.push((self.command("c"), 1))
+        self.assertGreaterEqual(self.queue.wait_time(), 0.0)
+        expired = self.queue.expire()
+        self.assertEqual([p["request_id"] for p, _ in expired], ["a"])
+        self.assertEqual(self.queue.expire(), [])
+        self.assertEqual(self.pop_all(), ["b", "c"])
+
+    def test_expiration_timer(self):
+        loop = asyncio.new_event_loop()
+        expired = []
+        self.queue.bind_expiration(loop, expired.append)
+        soon = datetime.datetime.now() + datetime.timedelta(seconds=0.1)
+        self.queue.push((self.command("a", expiration=soon.isoformat()), 1))
+        self.queue.push((self.command("b", expiration=soon.isoformat()), 1))
+        self.queue.push((self.command("c"), 1))
+        self.queue.pop()
+        try:
+            loop.run_until_complete(asyncio.sleep(0.2))
+        finally:
+            loop.close()
+        self.assertEqual([p["request_id"] for p, _ in expired], ["b"])
+        self.assertEqual(self.pop_all(), ["c"])
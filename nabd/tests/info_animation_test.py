@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+
+from nabd.info_animation import InfoAnimation, InfoPlayer
+from nabd.leds import Led
+
+from .mock import LedsMock
+
+
+class TestInfoAnimation(unittest.TestCase):
+    def test_compile(self):
+        info = InfoAnimation(
+            {
+                "tempo": 25,
+                "colors": [
+                    {"left": "ffff00", "center": "ffff00"},
+                    {"right": "ffff00"},
+                ],
+            }
+        )
+        self.assertEqual(info.step, 0.25)
+        self.assertEqual(info.count, 2)
+        self.assertEqual(info.palette, [(255, 255, 0), (0, 0, 0)])
+        self.assertEqual(list(info.frames), [0, 0, 1, 1, 1, 0])
+
+    def test_colors(self):
+        self.assertEqual(InfoAnimation.rgb("#ff8000"), (255, 128, 0))
+        self.assertEqual(InfoAnimation.rgb("ff8000"), (255, 128, 0))
+        self.assertEqual(InfoAnimation.rgb(None), (0, 0, 0))
+        self.assertEqual(InfoAnimation.rgb(""), (0, 0, 0))
+        for color in (5, "orange", "#1000000", "-1"):
+            with self.assertRaises(ValueError):
+                InfoAnimation.rgb(color)
+        self.assertIsNone(
+            InfoAnimation.check({"tempo": 10, "colors": [{"left": "#ff8000"}]})
+        )
+        self.assertEqual(
+            InfoAnimation.check({"tempo": 10, "colors": [{"left": 5}]}),
+            "Unsupported palette color 5",
+        )
+
+    def test_player(self):
+        loop = asyncio.new_event_loop()
+        leds = LedsMock()
+        info = InfoAnimation(
+            {
+                "tempo": 10,
+                "colors": [
+                    {"left": "ff0000", "center": "00ff00"},
+                    {"left": "ff0000", "center": "0000ff"},
+                ],
+            }
+        )
+        player = InfoPlayer(leds, info, loop)
+        try:
+            # Three frames, without waiting for timers
+            player.start()
+            self.assertIsNotNone(player.handle)
+            player.show_frame()
+            player.show_frame()
+            player.stop()
+            self.assertIsNone(player.handle)
+        finally:
+            loop.close()
+        # Unchanged leds are not set again
+        self.assertEqual(
+            leds.called_list,
+            [
+                f"set1({Led.LEFT},255,0,0)",
+                f"set1({Led.CENTER},0,255,0)",
+                f"set1({Led.RIGHT},0,0,0)",
+                f"set1({Led.CENTER},0,0,255)",
+                f"set1({Led.CENTER},0,255,0)",
+            ],
+        )
@@ -0,0 +1,63 @@
+import unittest
+
+from nabd.info_rotation import InfoRotation
+
+
+class TestInfoRotation(unittest.TestCase):
+    def setUp(self):
+        self.rotation = InfoRotation()
+
+    def shown(self, count):
+        return [self.rotation.next()[0] for _ in range(count)]
+
+    def test_empty(self):
+        self.assertIsNone(self.rotation.next())
+
+    def test_rotation(self):
+        self.rotation.update("weather")
+        self.rotation.update("clock")
+        self.rotation.update("alert", 1)
+        # New infos first, then in turn
+        self.assertEqual(
+            self.shown(6),
+            ["alert", "clock", "weather", "alert", "clock", "weather"],
+        )
+
+    def test_fresh_first(self):
+        self.rotation.update("weather")
+        self.rotation.update("clock")
+        self.assertEqual(self.shown(3), ["clock", "weather", "clock"])
+        self.rotation.update("weather")
+        self.assertEqual(self.shown(2), ["weather", "weather"])
+        # Same animation: not shown immediately
+        self.rotation.update("clock", changed=False)
+        self.assertEqual(self.shown(2), ["weather", "clock"])
+
+    def test_low_priority(self):
+        self.rotation.update("weather")
+        self.rotation.update("airquality", -1)
+        self.assertEqual(self.shown(3), ["weather", "airquality", "weather"])
+        self.rotation.update("weather", -1, changed=False)
+        self.assertIsNone(self.rotation.next())
+        self.rotation.update("airquality", -1)
+        self.assertEqual(self.shown(1), ["airquality"])
+        self.assertIsNone(self.rotation.next())
+
+    def test_remove(self):
+        self.rotation.update("weather")
+        self.rotation.update("clock")
+        self.rotation.remove("clock")
+        self.assertEqual(self.shown(2), ["weather", "weather"])
+        self.assertEqual(len(self.rotation), 1)
+
+    def test_slot(self):
+        self.rotation.update("weather")
+        self.assertEqual(self.rotation.next()[1], InfoRotation.MAX_SLOT)
+        for index in range(4):
+            self.rotation.update(f"info{index}")
+        self.assertEqual(
+            self.rotation.next()[1], InfoRotation.CYCLE_LENGTH / 5
+        )
+        for index in range(100):
+            self.rotation.update(f"info{index}")
+        self.assertEqual(self.rotation.next()[1], InfoRotation.MIN_SLOT)
@@ -0,0 +1,46 @@
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from nabd.inotify import Inotify
+
+
+@unittest.skipUnless(sys.platform == "linux", "inotify is Linux-only")
+class TestInotify(unittest.TestCase):
+    def test_tree_events(self):
+        inotify = Inotify()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                self.assertIsNotNone(inotify.add_watch(tmpdir))
+                self.assertFalse(inotify.has_events())
+                Path(tmpdir, "file").write_bytes(b"")
+                self.assertTrue(inotify.has_events())
+                self.assertFalse(inotify.has_events())
+                Path(tmpdir, "file").write_bytes(b"data")
+                self.assertFalse(inotify.has_events())
+                Path(tmpdir, "file").unlink()
+                self.assertTrue(inotify.has_events())
+        finally:
+            inotify.close()
+
+    def test_dirs_only(self):
+        inotify = Inotify()
+        try:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                inotify.add_watch(tmpdir, dirs_only=True)
+                Path(tmpdir, "file").write_bytes(b"")
+                self.assertFalse(inotify.has_events())
+                Path(tmpdir, "dir").mkdir()
+                self.assertTrue(inotify.has_events())
+                Path(tmpdir, "dir").rmdir()
+                self.assertTrue(inotify.has_events())
+        finally:
+            inotify.close()
+
+    def test_watch_missing_directory(self):
+        inotify = Inotify()
+        try:
+            self.assertIsNone(inotify.add_watch("/nonexistent/directory"))
+        finally:
+            inotify.close()
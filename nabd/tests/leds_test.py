@@ -97,3 +97,35 @@ class TestLeds(unittest.TestCase):
                 "do_show",
             ],
         )
+
+    def test_suspend(self):
+        self.leds.set1(Led.NOSE, 10, 20, 30)
+        self.leds.suspend()
+        self.assertFalse(self.leds.thread.is_alive())
+        self.assertEqual(
+            self.leds.calls, [("do_set", Led.NOSE, 10, 20, 30), "do_show"]
+        )
+        self.leds.set1(Led.NOSE, 0, 0, 0)
+        time.sleep(0.1)
+        self.assertEqual(len(self.leds.calls), 2)
+        self.leds.resume()
+        time.sleep(0.1)
+        self.assertEqual(
+            self.leds.calls[2:], [("do_set", Led.NOSE, 0, 0, 0), "do_show"]
+        )
+
+    def test_resume_latency(self):
+        self.leds.suspend()
+        self.leds.set1(Led.NOSE, 10, 20, 30)
+        start = time.monotonic()
+        self.leds.resume()
+        # Command received while suspended is shown by the new thread
+        while "do_show" not in self.leds.calls:
+            self.assertLess(time.monotonic() - start, 1.0)
+            time.sleep(0.001)
+        latency = time.monotonic() - start
+        self.assertEqual(
+            self.leds.calls, [("do_set", Led.NOSE, 10, 20, 30), "do_show"]
+        )
+        # Generous bound, for slow CI machines
+        self.assertLess(latency, 0.1)
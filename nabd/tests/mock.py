@@ -67,10 +67,12 @@ class NabIOMock(NabIO):
     def bind_rfid_event(self, loop, callback):
         self.rfid.on_detect(loop, callback)
 
-    async def play_info(self, condvar, tempo, colors):
-        self.played_infos.append({"tempo": tempo, "colors": colors})
+    async def play_info(self, condvar, info, duration=None):
+        self.played_infos.append(info.source)
+        if duration is None:
+            duration = NabIO.INFO_LOOP_LENGTH
         try:
-            await asyncio.wait_for(condvar.wait(), NabIO.INFO_LOOP_LENGTH)
+            await asyncio.wait_for(condvar.wait(), duration)
         except asyncio.TimeoutError:
             pass
 
@@ -160,12 +162,18 @@ class LedsMock(Leds):
     def setall(self, red, green, blue):
         self.called_list.append(f"setall({red},{green},{blue})")
 
+    def suspend(self):
+        self.called_list.append("suspend()")
+
+    def resume(self):
+        self.called_list.append("resume()")
+
 
 class SoundMock(Sound):
     def __init__(self):
         self.called_list = []
 
-    async def start_playing_preloaded(self, filename):
+    async def start_playing_preloaded(self, filename, token=None):
         self.called_list.append(f"start_playing_preloaded({filename})")
 
     async def wait_until_done(self, event=None):
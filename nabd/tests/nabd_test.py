@@ -2,16 +2,22 @@ import asyncio
 import datetime
 import io
 import json
+import os
 import socket
+import struct
+import tempfile
 import threading
 import time
 import unittest
+import unittest.mock
 
+import msgpack
 import pytest
 from django.db import close_old_connections
 
 import nabtaichid
 from nabd import nabd
+from nabd.admission import admission_policy
 from nabd.rfid import TagFlags, TagTechnology
 
 from .mock import NabIOMock
@@ -42,13 +48,30 @@ class SocketIO(io.RawIOBase):
         return self.sock.settimeout(timeout)
 
 
+def msgpack_frame(packet):
+    data = msgpack.packb(packet)
+    return struct.pack(">I", len(data)) + data
+
+
+def read_msgpack_frame(sock):
+    (size,) = struct.unpack(">I", sock.read(4))
+    return msgpack.unpackb(sock.read(size))
+
+
 class TestNabdBase(unittest.TestCase):
+    state_file = None
+    handoff_file = None
+
     def nabd_thread_loop(self):
         nabd_loop = asyncio.new_event_loop()
         nabd_loop.set_debug(True)
         asyncio.set_event_loop(nabd_loop)
         self.nabio = NabIOMock()
-        self.nabd = nabd.Nabd(self.nabio)
+        self.nabd = nabd.Nabd(
+            self.nabio,
+            state_file=self.state_file,
+            handoff_file=self.handoff_file,
+        )
         with self.nabd_cv:
             self.nabd_cv.notify()
         self.nabd.run()
@@ -84,6 +107,12 @@ class TestNabdBase(unittest.TestCase):
         s.settimeout(5.0)
         return SocketIO(s)
 
+    def service_unix_socket(self):
+        s = socket.socket(socket.AF_UNIX)
+        s.connect("\0nabd")
+        s.settimeout(5.0)
+        return SocketIO(s)
+
 
 class TestNabd(TestNabdBase):
     def test_state(self):
@@ -222,6 +251,28 @@ class TestNabd(TestNabdBase):
         finally:
             s1.close()
 
+    def test_command_sequence_malformed(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"command","request_id":"test_id",'
+                b'"sequence":[{"audio":["test.mp3"]},{"audio":[42]}]}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "test_id")
+            self.assertEqual(packet_j["status"], "error")
+            self.assertEqual(packet_j["class"], "MalformedPacket")
+            self.assertEqual(
+                packet_j["message"],
+                "Invalid audio[0] slot in sequence[1], expected a string",
+            )
+            self.assertEqual(self.nabio.played_sequences, [])
+        finally:
+            s1.close()
+
     def test_info(self):
         s1 = self.service_socket()
         self.assertEqual(self.nabio.played_infos, [])
@@ -315,6 +366,70 @@ class TestNabd(TestNabdBase):
         finally:
             s1.close()
 
+    def test_info_expiration(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            expiration = datetime.datetime.now() + datetime.timedelta(
+                seconds=2
+            )
+            packet = (
+                '{"type":"info","info_id":"weather","request_id":"test_id",'
+                '"animation":{"tempo":25,"colors":[{"left":"ffff00"}]},'
+                '"expiration":"' + expiration.isoformat() + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["status"], "ok")
+            time.sleep(1)
+            self.assertNotEqual(self.nabio.played_infos, [])
+            self.assertIn("weather", self.nabd.info)
+            time.sleep(1.5)  # info is removed on time
+            self.assertEqual(self.nabd.info, {})
+            self.assertEqual(self.nabd.info_timers, {})
+            self.nabio.played_infos = []
+            time.sleep(1)
+            self.assertEqual(self.nabio.played_infos, [])
+        finally:
+            s1.close()
+
+    def test_info_colors(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"info","info_id":"weather","request_id":"html",'
+                b'"animation":{"tempo":25,"colors":[{"left":"#ffff00"}]}}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "html")
+            self.assertEqual(packet_j["status"], "ok")
+            s1.write(
+                b'{"type":"info","info_id":"weather","request_id":"palette",'
+                b'"animation":{"tempo":25,"colors":[{"left":5}]}}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "palette")
+            self.assertEqual(packet_j["status"], "error")
+            self.assertEqual(packet_j["class"], "MalformedPacket")
+            # Info is unchanged and connection is still open
+            self.assertEqual(
+                self.nabd.info["weather"]["colors"], [{"left": "#ffff00"}]
+            )
+            self.assertEqual(
+                self.nabd.info_animations["weather"].palette,
+                [(255, 255, 0), (0, 0, 0)],
+            )
+            s1.write(b'{"type":"gestalt","request_id":"gestalt"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "gestalt")
+        finally:
+            s1.close()
+
     def test_command(self):
         s1 = self.service_socket()
         try:
@@ -363,6 +478,298 @@ class TestNabd(TestNabdBase):
         finally:
             s1.close()
 
+    def test_batch(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"batch","request_id":"batch_id","packets":['
+                b'{"type":"info","info_id":"weather",'
+                b'"animation":{"tempo":25,"colors":[{"left":"ffff00"}]}},'
+                b'{"type":"command","request_id":"ignored",'
+                b'"sequence":[{"audio":["weather/fr/signature.mp3"]}]},'
+                b'{"type":"ears","left":5,"right":7},'
+                b'{"type":"message",'
+                b'"body":[{"audio":["weather/fr/today.mp3"]}]}]}\r\n'
+            )
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "state")
+            self.assertEqual(packet_j["state"], "playing")
+            s1.settimeout(15.0)
+            packet = s1.readline()  # single response packet
+            s1.settimeout(5.0)
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "batch_id")
+            self.assertEqual(packet_j["status"], "ok")
+            self.assertEqual(
+                self.nabio.played_sequences[0],
+                [{"audio": ["weather/fr/signature.mp3"]}],
+            )
+            self.assertIn("weather", self.nabd.info)
+            self.assertEqual(self.nabd.ears, {"left": 5, "right": 7})
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "state")
+            self.assertEqual(packet_j["state"], "idle")
+        finally:
+            s1.close()
+
+    def test_batch_malformed(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"batch","request_id":"batch_id","packets":['
+                b'{"type":"ears","left":5},'
+                b'{"type":"command","sequence":{}}]}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "batch_id")
+            self.assertEqual(packet_j["status"], "error")
+            self.assertEqual(packet_j["class"], "MalformedPacket")
+            self.assertEqual(
+                packet_j["message"],
+                "Invalid sequence slot in packets[1], "
+                "expected a list or a string",
+            )
+            self.assertEqual(self.nabd.ears, {"left": 0, "right": 0})
+        finally:
+            s1.close()
+
+    def test_register(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"register","request_id":"register_id",'
+                b'"animation":{"tempo":25,"colors":[{"left":"ffff00"}]}}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "register_id")
+            self.assertEqual(packet_j["status"], "ok")
+            animation_hash = packet_j["hash"]
+            self.assertTrue(animation_hash.startswith("sha256:"))
+            packet = (
+                '{"type":"info","info_id":"weather","request_id":"info_id",'
+                '"animation":"' + animation_hash + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "info_id")
+            self.assertEqual(packet_j["status"], "ok")
+            self.assertEqual(
+                self.nabd.info["weather"],
+                {"tempo": 25, "colors": [{"left": "ffff00"}]},
+            )
+            packet = (
+                '{"type":"info","info_id":"clock","request_id":"info_id",'
+                '"animation":"' + animation_hash + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            packet = s1.readline()  # response packet
+            # Animation is compiled once for both info
+            self.assertIs(
+                self.nabd.info_animations["clock"],
+                self.nabd.info_animations["weather"],
+            )
+            self.assertEqual(
+                list(self.nabd.compiled_animations), [animation_hash]
+            )
+            s1.write(
+                b'{"type":"info","info_id":"weather","request_id":"info_id",'
+                b'"animation":"sha256:0"}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["status"], "error")
+            self.assertEqual(packet_j["class"], "UnknownResource")
+            s1.write(
+                b'{"type":"register","request_id":"register_id",'
+                b'"choreography":"nabclockd/clock.chor"}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["status"], "error")
+            self.assertEqual(packet_j["class"], "MalformedPacket")
+        finally:
+            s1.close()
+
+    def test_prepare(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"prepare","request_id":"prepare_id",'
+                b'"sequence":[{"audio":["test.mp3"],"choreography":'
+                b'"data:application/x-nabaztag-mtl-choreography;base64,'
+                b'AAEHAA=="}]}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "prepare_id")
+            self.assertEqual(packet_j["status"], "ok")
+            handle = packet_j["handle"]
+            self.assertTrue(handle.startswith("prepared:"))
+            packet = (
+                '{"type":"command","request_id":"test_id",'
+                '"sequence":"' + handle + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "playing")
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "test_id")
+            self.assertEqual(packet_j["status"], "ok")
+            last_sequence = self.nabio.played_sequences.pop()
+            self.assertEqual(
+                last_sequence.items,
+                [{"audio": ["test.mp3"], "choreography": b"\0\1\7\0"}],
+            )
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "idle")
+            # Handles can only be played once
+            packet = (
+                '{"type":"command","request_id":"test_id",'
+                '"sequence":"' + handle + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["status"], "error")
+            self.assertEqual(packet_j["class"], "UnknownResource")
+        finally:
+            s1.close()
+
+    def test_throttled_rate(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            # Stop refilling the bucket while the burst is sent
+            (bucket,) = self.nabd.admission_buckets.values()
+            frozen = bucket.clock()
+            bucket.clock = lambda: frozen
+            burst = admission_policy("tcp").burst
+            s1.write(b'{"type":"wakeup"}\r\n' * burst)
+            s1.write(b'{"type":"wakeup","request_id":"throttled_id"}\r\n')
+            for i in range(burst):
+                packet = s1.readline()  # response packet
+                packet_j = json.loads(packet.decode("utf8"))
+                self.assertEqual(packet_j["status"], "ok")
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "throttled_id")
+            self.assertEqual(packet_j["status"], "throttled")
+            self.assertGreater(packet_j["retry_after"], 0)
+            # Connections from the same peer share the same limit
+            s2 = self.service_socket()
+            try:
+                packet = s2.readline()  # state packet
+                s2.write(b'{"type":"wakeup","request_id":"throttled_id"}\r\n')
+                packet = s2.readline()  # response packet
+                packet_j = json.loads(packet.decode("utf8"))
+                self.assertEqual(packet_j["status"], "throttled")
+            finally:
+                s2.close()
+            bucket.clock = time.monotonic
+            time.sleep(packet_j["retry_after"])
+            s1.write(b'{"type":"gestalt"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["throttled"], {"tcp": 2})
+        finally:
+            s1.close()
+
+    def test_throttled_msgpack(self):
+        s1 = self.service_socket()
+        try:
+            s1.readline()  # state packet
+            s1.write(b'{"type":"hello","framing":"msgpack"}\r\n')
+            s1.readline()  # response packet, still in JSON
+            time.sleep(0.1)  # framing is changed after the response
+            # Stop refilling the bucket while the burst is sent
+            (bucket,) = self.nabd.service_buckets.values()
+            self.assertEqual(
+                bucket.burst, admission_policy("tcp", "msgpack").burst
+            )
+            frozen = bucket.clock()
+            bucket.clock = lambda: frozen
+            s1.write(msgpack_frame({"type": "wakeup"}) * bucket.burst)
+            s1.write(
+                msgpack_frame({"type": "wakeup", "request_id": "throttled_id"})
+            )
+            for i in range(bucket.burst):
+                packet_j = read_msgpack_frame(s1)
+                self.assertEqual(packet_j["status"], "ok")
+            packet_j = read_msgpack_frame(s1)
+            self.assertEqual(packet_j["request_id"], "throttled_id")
+            self.assertEqual(packet_j["status"], "throttled")
+            self.assertGreater(packet_j["retry_after"], 0)
+        finally:
+            s1.close()
+
+    def test_interactive_not_throttled(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(b'{"type":"mode","mode":"interactive"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["status"], "ok")
+            packet = s1.readline()  # new state packet
+            burst = admission_policy("tcp").burst
+            s1.write(b'{"type":"ears","left":0,"right":0}\r\n' * burst * 2)
+            for i in range(burst * 2):
+                packet = s1.readline()  # response packet
+                packet_j = json.loads(packet.decode("utf8"))
+                self.assertEqual(packet_j["status"], "ok")
+        finally:
+            s1.close()
+
+    def test_throttled_queue(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(b'{"type":"sleep"}\r\n')
+            packet = s1.readline()  # response packet
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "asleep")
+            s1.write(
+                b'{"type":"prepare","request_id":"prepare_id",'
+                b'"sequence":[{"audio":["test.mp3"]}]}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            handle = json.loads(packet.decode("utf8"))["handle"]
+            max_queued = admission_policy("tcp").max_queued
+            command = b'{"type":"command","sequence":[]}\r\n'
+            s1.write(command * max_queued)
+            packet = (
+                '{"type":"command","request_id":"throttled_id",'
+                '"sequence":"' + handle + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "throttled_id")
+            self.assertEqual(packet_j["status"], "throttled")
+            self.assertNotIn("retry_after", packet_j)
+            self.assertEqual(len(self.nabd.idle_queue), max_queued)
+            # Prepared sequence can be played later
+            self.assertIn(handle, self.nabd.prepared.entries)
+        finally:
+            s1.close()
+
     def test_cancel(self):
         s1 = self.service_socket()
         try:
@@ -393,6 +800,107 @@ class TestNabd(TestNabdBase):
         finally:
             s1.close()
 
+    def test_at(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            with unittest.mock.patch.object(
+                nabd.Scheduler, "PREPARE_AHEAD", 0.3
+            ):
+                at = datetime.datetime.now() + datetime.timedelta(seconds=1)
+                packet = (
+                    '{"type":"command","request_id":"test_id",'
+                    '"sequence":[{"audio":["test.mp3"]}],'
+                    '"at":"' + at.isoformat() + '"}\r\n'
+                )
+                s1.write(packet.encode("utf8"))
+                packet = s1.readline()  # new state packet
+            started = datetime.datetime.now()
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "playing")
+            self.assertAlmostEqual(
+                (started - at).total_seconds(), 0.0, delta=0.1
+            )
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "test_id")
+            self.assertEqual(packet_j["status"], "ok")
+            # Sequence was prepared ahead
+            last_sequence = self.nabio.played_sequences.pop()
+            self.assertEqual(last_sequence.items, [{"audio": ["test.mp3"]}])
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "idle")
+        finally:
+            s1.close()
+
+    def test_at_cancel(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            at = datetime.datetime.now() + datetime.timedelta(minutes=1)
+            packet = (
+                '{"type":"message","request_id":"test_id",'
+                '"body":[{"audio":["test.mp3"]}],'
+                '"at":"' + at.isoformat() + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            s1.write(b'{"type":"cancel","request_id":"test_id"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "test_id")
+            self.assertEqual(packet_j["status"], "canceled")
+            self.assertEqual(len(self.nabd.scheduler), 0)
+        finally:
+            s1.close()
+
+    def test_at_quota(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            at = datetime.datetime.now() + datetime.timedelta(minutes=1)
+            packet = (
+                '{"type":"command","sequence":[],'
+                '"at":"' + at.isoformat() + '"}\r\n'
+            )
+            max_queued = admission_policy("tcp").max_queued
+            s1.write(packet.encode("utf8") * max_queued)
+            s1.write(b'{"type":"command","request_id":"throttled_id",')
+            s1.write(b'"sequence":[]}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "throttled_id")
+            self.assertEqual(packet_j["status"], "throttled")
+            self.assertEqual(len(self.nabd.scheduler), max_queued)
+        finally:
+            s1.close()
+
+    def test_at_disconnect(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            at = datetime.datetime.now() + datetime.timedelta(minutes=1)
+            packet = (
+                '{"type":"command","request_id":"test_id",'
+                '"sequence":[{"audio":["test.mp3"]}],'
+                '"at":"' + at.isoformat() + '"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            s1.write(b'{"type":"gestalt","request_id":"gestalt"}\r\n')
+            packet = s1.readline()  # response packet
+        finally:
+            s1.close()
+        time.sleep(0.5)
+        # Scheduled packet is played without response
+        self.assertEqual(
+            [
+                (packet["request_id"], writer)
+                for packet, writer in self.nabd.scheduler
+            ],
+            [("test_id", None)],
+        )
+
     def test_cancel_wrong_request_id(self):
         s1 = self.service_socket()
         try:
@@ -550,6 +1058,142 @@ class TestNabd(TestNabdBase):
         finally:
             s1.close()
 
+    def test_sleep_event(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"mode","mode":"idle","request_id":"mode_id",'
+                b'"events":["sleep","button"]}\r\n'
+            )
+            packet = s1.readline()  # response packet
+            s1.write(b'{"type":"sleep"}\r\n')
+            packet = s1.readline()  # response packet
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "asleep")
+            packet = s1.readline()  # sleep event
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "sleep_event")
+            self.assertEqual(packet_j["event"], "asleep")
+            self.assertIn("stop_playing()", self.nabio.sound.called_list)
+            self.assertEqual(self.nabio.leds.called_list[-1], "suspend()")
+            time.sleep(1)
+            # Button events are still delivered while asleep
+            start = time.monotonic()
+            self.nabio.button_event_cb["loop"].call_soon_threadsafe(
+                self.nabio.button_event_cb["callback"], "click", time.time()
+            )
+            packet = s1.readline()  # button event
+            button_latency = time.monotonic() - start
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "button_event")
+            start = time.monotonic()
+            s1.write(b'{"type":"wakeup"}\r\n')
+            packet = s1.readline()  # response packet
+            packet = s1.readline()  # sleep event
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "sleep_event")
+            self.assertEqual(packet_j["event"], "awake")
+            packet = s1.readline()  # new state packet
+            # Leds thread and sound were resumed
+            wakeup_latency = time.monotonic() - start
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "idle")
+            self.assertEqual(self.nabio.leds.called_list[-1], "resume()")
+            # Generous bounds, for slow CI machines
+            self.assertLess(button_latency, 1.0)
+            self.assertLess(wakeup_latency, 1.0)
+            s1.write(b'{"type":"gestalt"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertGreater(packet_j["asleep_time"], 1.0)
+            self.assertGreaterEqual(packet_j["asleep_cpu_time"], 0.0)
+        finally:
+            s1.close()
+
+    def test_gestalt_network(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(b'{"type":"gestalt","request_id":"gestalt"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "gestalt")
+            # mock interface has no IP address
+            self.assertEqual(packet_j["network"], "none")
+            self.assertEqual(packet_j["dropped_events"], 0)
+            self.assertEqual(packet_j["coalesced_states"], 0)
+            self.assertEqual(packet_j["queue_depth"], 0)
+            self.assertEqual(packet_j["queue_wait"], 0)
+            self.assertEqual(self.nabio.bottom_led, "pulse((255, 0, 0))")
+        finally:
+            s1.close()
+
+    def test_unix_socket(self):
+        s1 = self.service_unix_socket()
+        try:
+            packet = s1.readline()  # state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "state")
+            s1.write(b'{"type":"wakeup","request_id":"test_id"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "test_id")
+            self.assertEqual(packet_j["status"], "ok")
+        finally:
+            s1.close()
+
+    def test_hello_msgpack(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(
+                b'{"type":"hello","framing":"msgpack","request_id":"hello"}'
+                b"\r\n"
+            )
+            packet = s1.readline()  # response packet, still in JSON
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "hello")
+            self.assertEqual(packet_j["status"], "ok")
+            s1.write(
+                msgpack_frame(
+                    {"type": "ears", "left": 3, "right": 5, "request_id": "e"}
+                )
+            )
+            packet_j = read_msgpack_frame(s1)
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["request_id"], "e")
+            self.assertEqual(packet_j["status"], "ok")
+            self.assertEqual(self.nabio.left_ear, 3)
+            s1.write(msgpack_frame({"type": "cancel"}))
+            packet_j = read_msgpack_frame(s1)
+            self.assertEqual(packet_j["class"], "MalformedPacket")
+            s1.write(b"\x00\x00\x00\x01\xc1")
+            packet_j = read_msgpack_frame(s1)
+            self.assertEqual(packet_j["class"], "DecodeError")
+        finally:
+            s1.close()
+
+    def test_hello_unsupported(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(b'{"type":"hello","framing":"xml"}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["status"], "error")
+            self.assertEqual(packet_j["class"], "MalformedPacket")
+            s1.write(b'{"type":"wakeup","request_id":"test_id"}\r\n')
+            packet = s1.readline()  # response packet, still in JSON
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "test_id")
+        finally:
+            s1.close()
+
     def test_shutdown_api_method(self):
         s1 = self.service_socket()
         try:
@@ -641,6 +1285,228 @@ class TestNabd(TestNabdBase):
             s2.close()
 
 
+class TestNabdStateFile(TestNabdBase):
+    def setUp(self):
+        self.state_dir = tempfile.TemporaryDirectory()
+        self.state_file = os.path.join(self.state_dir.name, "nabd.state")
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        self.state_dir.cleanup()
+
+    def test_restore(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            expiration = datetime.datetime.now() + datetime.timedelta(hours=1)
+            at = datetime.datetime.now() + datetime.timedelta(minutes=1)
+            s1.write(
+                b'{"type":"info","info_id":"weather","priority":2,'
+                b'"animation":{"tempo":42,"colors":[{"left":"ff0000"}]},'
+                b'"expiration":"'
+                + expiration.isoformat().encode("utf8")
+                + b'"}\r\n'
+            )
+            s1.write(b'{"type":"ears","left":4,"right":6}\r\n')
+            s1.write(
+                b'{"type":"command","request_id":"test_id",'
+                b'"sequence":[{"audio":["test.mp3"]}],'
+                b'"at":"' + at.isoformat().encode("utf8") + b'"}\r\n'
+            )
+            s1.readline()  # info response packet
+            s1.readline()  # ears response packet
+            time.sleep(0.1)
+            # Stop nabd while service is connected, so that the scheduled
+            # packet is saved with the state at shutdown.
+            super().tearDown()
+        finally:
+            s1.close()
+        with open(self.state_file) as f:
+            state = json.load(f)
+        self.assertEqual(state["ears"], {"left": 4, "right": 6})
+        self.assertEqual(len(state["info"]), 1)
+        self.assertEqual(len(state["scheduled"]), 1)
+        super().setUp()
+        self.assertEqual(
+            self.nabd.info,
+            {"weather": {"tempo": 42, "colors": [{"left": "ff0000"}]}},
+        )
+        self.assertEqual(
+            self.nabd.info_rotation.entries["weather"].priority, 2
+        )
+        expires_in = (
+            self.nabd.info_timers["weather"].when() - self.nabd.loop.time()
+        )
+        self.assertAlmostEqual(expires_in, 3600, delta=5)
+        self.assertEqual(self.nabd.ears, {"left": 4, "right": 6})
+        scheduled = list(self.nabd.scheduler)
+        self.assertEqual(len(scheduled), 1)
+        packet, writer = scheduled[0]
+        self.assertEqual(packet["request_id"], "test_id")
+        self.assertEqual(packet["sequence"], [{"audio": ["test.mp3"]}])
+        self.assertIsNone(writer)
+
+    def test_info_unchanged(self):
+        changes = []
+        state_file_changed = self.nabd.state_file.changed
+
+        def changed():
+            changes.append(packet_j["request_id"])
+            state_file_changed()
+
+        self.nabd.state_file.changed = changed
+        s1 = self.service_socket()
+        try:
+            s1.readline()  # state packet
+            for request_id, priority in [
+                ("new", 0),
+                ("same", 0),
+                ("priority", 1),
+                ("same_priority", 1),
+            ]:
+                packet_j = {
+                    "type": "info",
+                    "info_id": "weather",
+                    "request_id": request_id,
+                    "priority": priority,
+                    "animation": {"tempo": 42, "colors": [{"left": "ff0000"}]},
+                }
+                s1.write(json.dumps(packet_j).encode("utf8") + b"\r\n")
+                s1.readline()  # response packet
+            packet_j = {
+                "type": "info",
+                "info_id": "weather",
+                "request_id": "removed",
+            }
+            s1.write(json.dumps(packet_j).encode("utf8") + b"\r\n")
+            s1.readline()  # response packet
+            packet_j = {
+                "type": "info",
+                "info_id": "weather",
+                "request_id": "removed_again",
+            }
+            s1.write(json.dumps(packet_j).encode("utf8") + b"\r\n")
+            s1.readline()  # response packet
+        finally:
+            s1.close()
+        self.assertEqual(changes, ["new", "priority", "removed"])
+
+    def test_invalid_state_file(self):
+        super().tearDown()
+        with open(self.state_file, "w") as f:
+            json.dump(
+                {
+                    "info": [
+                        {"type": "info", "animation": 42},
+                        {
+                            "type": "info",
+                            "info_id": "palette",
+                            "animation": {
+                                "tempo": 42,
+                                "colors": [{"left": 5}],
+                            },
+                        },
+                        {
+                            "type": "info",
+                            "info_id": "weather",
+                            "animation": {
+                                "tempo": 42,
+                                "colors": [{"left": "ff0000"}],
+                            },
+                        },
+                    ],
+                    "ears": {"left": "up"},
+                    "scheduled": 42,
+                },
+                f,
+            )
+        super().setUp()
+        # Bad entries are dropped, others are restored
+        self.assertEqual(list(self.nabd.info), ["weather"])
+        self.assertEqual(list(self.nabd.info_animations), ["weather"])
+        self.assertEqual(self.nabd.ears, {"left": 0, "right": 0})
+        self.assertEqual(len(self.nabd.scheduler), 0)
+
+
+class TestNabdHandoff(TestNabdBase):
+    def handoff(self):
+        """
+        Hand off to a new instance, as a new process would after exec.
+        """
+        future = asyncio.run_coroutine_threadsafe(
+            self.nabd.handoff_to_new_process(), self.nabd.loop
+        )
+        future.result(5)
+        self.nabd_thread.join(10)
+        if self.nabd_thread.is_alive():
+            raise RuntimeError("nabd_thread still running")
+        self.handoff_file = self.nabd.handoff_path
+        self.assertIsNotNone(self.handoff_file)
+        TestNabdBase.setUp(self)
+
+    def test_handoff(self):
+        s1 = self.service_socket()
+        s2 = self.service_unix_socket()
+        try:
+            packet = s1.readline()  # state packet
+            packet = s2.readline()  # state packet
+            s1.write(b'{"type":"mode","mode":"idle","events":["button"]}\r\n')
+            packet = s1.readline()  # response packet
+            s2.write(b'{"type":"mode","mode":"interactive"}\r\n')
+            packet = s2.readline()  # response packet
+            packet = s2.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "interactive")
+            packet = s1.readline()  # new state packet
+            at = datetime.datetime.now() + datetime.timedelta(minutes=1)
+            s1.write(
+                b'{"type":"command","request_id":"scheduled",'
+                b'"sequence":[{"audio":["test.mp3"]}],'
+                b'"at":"' + at.isoformat().encode("utf8") + b'"}\r\n'
+            )
+            # Beginning of a packet, read by new instance
+            s1.write(b'{"type":"info","info_id":"clock",')
+            time.sleep(0.1)
+            self.handoff()
+            s1.write(b'"animation":{"tempo":10,"colors":[]}}\r\n')
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+            self.assertEqual(packet_j["status"], "ok")
+            self.assertEqual(list(self.nabd.info), ["clock"])
+            self.assertEqual(self.nabd.state, nabd.State.INTERACTIVE)
+            self.assertEqual(
+                self.nabd.interactive_service_events, ["ears", "button"]
+            )
+            self.assertEqual(
+                [events for events in self.nabd.service_writers.values()],
+                [["button"], []],
+            )
+            scheduled = list(self.nabd.scheduler)
+            self.assertEqual(len(scheduled), 1)
+            self.assertEqual(scheduled[0][0]["request_id"], "scheduled")
+            self.assertIn(scheduled[0][1], self.nabd.service_writers)
+            # Listening sockets were taken over too
+            s3 = self.service_socket()
+            try:
+                packet = s3.readline()  # state packet
+                packet_j = json.loads(packet.decode("utf8"))
+                self.assertEqual(packet_j["state"], "interactive")
+            finally:
+                s3.close()
+            s2.write(b'{"type":"mode","mode":"idle"}\r\n')
+            packet = s2.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "idle")
+            packet = s2.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["type"], "response")
+        finally:
+            s1.close()
+            s2.close()
+
+
 @pytest.mark.django_db(transaction=True)
 class TestRfid(TestNabdBase):
     def tearDown(self):
@@ -724,6 +1590,45 @@ class TestRfid(TestNabdBase):
         finally:
             s1.close()
 
+    def test_write_rfid_asleep(self):
+        s1 = self.service_socket()
+        try:
+            packet = s1.readline()  # state packet
+            s1.write(b'{"type":"sleep"}\r\n')
+            packet = s1.readline()  # response packet
+            packet = s1.readline()  # new state packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["state"], "asleep")
+            leds = self.nabio.leds.called_list
+            resumed = []
+
+            def write_handler(*args):
+                states = [call for call in leds if call.endswith("()")]
+                resumed.append(states[-1] == "resume()")
+                return True
+
+            self.nabio.rfid.write_handler = write_handler
+            packet = (
+                '{"type":"rfid_write",'
+                '"tech":"st25tb",'
+                '"uid":"d0:02:18:01:02:03:04:05",'
+                '"picture":42,'
+                '"app":"nabtaichid",'
+                '"request_id":"rfid_write_id"}\r\n'
+            )
+            s1.write(packet.encode("utf8"))
+            packet = s1.readline()  # response packet
+            packet_j = json.loads(packet.decode("utf8"))
+            self.assertEqual(packet_j["request_id"], "rfid_write_id")
+            # Leds were resumed to show the nose while writing, and are
+            # suspended again once response was sent
+            self.assertEqual(resumed, [True])
+            time.sleep(0.1)
+            self.assertEqual(leds[-1], "suspend()")
+            self.assertEqual(self.nabd.state.value, "asleep")
+        finally:
+            s1.close()
+
     def test_write_rfid(self):
         s1 = self.service_socket()
         try:
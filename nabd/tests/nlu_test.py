@@ -1,4 +1,3 @@
-import asyncio
 import datetime
 import unittest
 
@@ -6,14 +5,8 @@ from nabd.nlu import NLU
 
 
 class TestNLU(unittest.TestCase):
-    def setUp(self):
-        self.loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(self.loop)
-
     def interpret(self, nlu, str):
-        task = self.loop.create_task(nlu.interpret(str))
-        self.loop.run_until_complete(task)
-        return task.result()
+        return nlu.parse(str)
 
     def test_en(self):
         nlu = NLU("en_US")
@@ -0,0 +1,82 @@
+import asyncio
+import unittest
+
+from nabd.outbound import OutboundQueue, PacketKind
+
+
+class TransportMock:
+    def __init__(self):
+        self.buffer_size = 0
+
+    def is_closing(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return self.buffer_size
+
+
+class WriterMock:
+    """Writer of a service which is not reading until drained is set"""
+
+    def __init__(self):
+        self.transport = TransportMock()
+        self.written = []
+        self.drained = asyncio.Event()
+
+    def write(self, data):
+        self.written.append(data)
+
+    async def drain(self):
+        if self.transport.buffer_size >= OutboundQueue.HIGH_WATER:
+            await self.drained.wait()
+            self.transport.buffer_size = 0
+
+
+class TestOutboundQueue(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.writer = WriterMock()
+        self.queue = OutboundQueue(self.writer)
+        self.queue.start(self.loop)
+
+    def tearDown(self):
+        self.loop.run_until_complete(self.queue.stop())
+        self.loop.close()
+
+    def run_loop(self):
+        self.loop.run_until_complete(asyncio.sleep(0.01))
+
+    def test_direct_write(self):
+        self.queue.put(PacketKind.STATE, b"state1")
+        self.queue.put(PacketKind.EVENT, b"event1")
+        self.queue.put(PacketKind.RESPONSE, b"response1")
+        self.assertEqual(
+            self.writer.written, [b"state1", b"event1", b"response1"]
+        )
+        self.assertEqual(len(self.queue.queue), 0)
+
+    def test_backpressure(self):
+        self.writer.transport.buffer_size = OutboundQueue.HIGH_WATER
+        self.queue.put(PacketKind.STATE, b"state1")
+        self.queue.put(PacketKind.RESPONSE, b"response1")
+        self.queue.put(PacketKind.STATE, b"state2")
+        for i in range(OutboundQueue.MAX_QUEUED + 5):
+            self.queue.put(PacketKind.EVENT, f"event{i}".encode("utf8"))
+        self.queue.put(PacketKind.RESPONSE, b"response2")
+        self.queue.put(PacketKind.STATE, b"state3")
+        self.run_loop()
+        self.assertEqual(self.writer.written, [])
+        self.assertEqual(self.queue.coalesced, 2)
+        self.assertEqual(self.queue.dropped, 7)
+        self.writer.drained.set()
+        self.run_loop()
+        self.assertEqual(
+            self.writer.written,
+            [b"response1"]
+            + [f"event{i}".encode("utf8") for i in range(30)]
+            + [b"response2", b"state3"],
+        )
+        self.assertEqual(len(self.queue.queue), 0)
+        self.queue.put(PacketKind.EVENT, b"event")
+        self.assertEqual(self.writer.written[-1], b"event")
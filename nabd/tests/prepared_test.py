@@ -0,0 +1,67 @@
+import unittest
+
+from nabd.prepared import PreparedSequence, PreparedSequences
+from nabd.registry import UnknownResource
+
+
+class TestPreparedSequences(unittest.TestCase):
+    def setUp(self):
+        self.prepared = PreparedSequences()
+
+    def test_take(self):
+        sequence = PreparedSequence([{"audio": ["test.mp3"]}])
+        handle = self.prepared.add(sequence)
+        self.assertTrue(handle.startswith("prepared:"))
+        self.assertNotEqual(self.prepared.add(sequence), handle)
+        self.assertIs(self.prepared.take(handle), sequence)
+        with self.assertRaises(UnknownResource):
+            self.prepared.take(handle)
+
+    def test_eviction(self):
+        first = self.prepared.add(PreparedSequence([]))
+        for index in range(PreparedSequences.MAX_ENTRIES):
+            self.prepared.add(PreparedSequence([]))
+        self.assertEqual(len(self.prepared), PreparedSequences.MAX_ENTRIES)
+        with self.assertRaises(UnknownResource):
+            self.prepared.take(first)
+
+    def test_restore(self):
+        sequence = PreparedSequence([])
+        self.prepared.restore("prepared:7", sequence)
+        self.assertEqual(self.prepared.add(PreparedSequence([])), "prepared:8")
+        self.assertIs(self.prepared.take("prepared:7"), sequence)
+
+    def test_resolve(self):
+        command = PreparedSequence([])
+        message = PreparedSequence([])
+        command_handle = self.prepared.add(command)
+        message_handle = self.prepared.add(message)
+        packet = {
+            "type": "batch",
+            "packets": [
+                {"type": "command", "sequence": command_handle},
+                {"type": "message", "body": message_handle},
+                {"type": "command", "sequence": []},
+            ],
+        }
+        self.prepared.resolve(packet)
+        self.assertIs(packet["packets"][0]["sequence"], command)
+        self.assertIs(packet["packets"][1]["body"], message)
+        self.assertEqual(packet["packets"][2]["sequence"], [])
+        self.assertEqual(len(self.prepared), 0)
+
+    def test_resolve_unknown(self):
+        handle = self.prepared.add(PreparedSequence([]))
+        packet = {
+            "type": "batch",
+            "packets": [
+                {"type": "command", "sequence": handle},
+                {"type": "command", "sequence": "prepared:0"},
+            ],
+        }
+        with self.assertRaises(UnknownResource):
+            self.prepared.check(packet)
+        with self.assertRaises(UnknownResource):
+            self.prepared.resolve(packet)
+        # Known handles are kept
+        self.assertEqual(len(self.prepared), 1)
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+import unittest
+
+from nabd.recognizer import CHUNK_BYTES, NOT_RECOGNIZED, Recognizer, serve
+
+
+class FakeASR:
+    """Decoder spending some CPU time on each chunk"""
+
+    def __init__(self):
+        self.chunks = 0
+        self.length = 0
+
+    def decode(self, frames, finalize):
+        sum(frames)
+        self.chunks += 1
+        self.length += len(frames)
+
+    def decoded_string(self):
+        decoded_str = f"{self.chunks} chunks, {self.length} bytes"
+        self.chunks = 0
+        self.length = 0
+        return decoded_str
+
+
+class FakeNLU:
+    def parse(self, string):
+        if string == "":
+            return None
+        return {"intent": "nabweatherd/forecast", "text": string}
+
+
+def fake_recognizer_main(conn, locale):
+    serve(conn, FakeASR(), FakeNLU())
+
+
+def crashing_recognizer_main(conn, locale):
+    conn.send(("ready",))
+    conn.recv()
+    os._exit(1)
+
+
+def hanging_recognizer_main(conn, locale):
+    conn.send(("ready",))
+    while True:
+        conn.recv()
+
+
+def loading_recognizer_main(conn, locale):
+    time.sleep(60)
+
+
+class TestRecognizer(unittest.TestCase):
+    CHUNKS = 30  # 3 seconds utterance
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def wait_ready(self, recognizer):
+        self.assertTrue(recognizer.conn.poll(30))
+
+    def utterance(self, recognizer, chunk_bytes=CHUNK_BYTES):
+        for i in range(self.CHUNKS):
+            frames = bytes(chunk_bytes)
+            recognizer.decode_chunk(frames, i == self.CHUNKS - 1)
+        return self.loop.run_until_complete(recognizer.recognize())
+
+    def test_recognize(self):
+        recognizer = Recognizer("fr_FR", fake_recognizer_main)
+        try:
+            self.wait_ready(recognizer)
+            decoded_str, response, asr_time, nlu_time = self.utterance(
+                recognizer
+            )
+            self.assertEqual(
+                decoded_str,
+                f"{self.CHUNKS} chunks, {self.CHUNKS * CHUNK_BYTES} bytes",
+            )
+            self.assertEqual(response["intent"], "nabweatherd/forecast")
+            self.assertGreaterEqual(asr_time, 0.0)
+            # Chunks larger than the worker's buffer
+            decoded_str, _, _, _ = self.utterance(recognizer, CHUNK_BYTES * 2)
+            self.assertEqual(
+                decoded_str,
+                f"{self.CHUNKS} chunks, {self.CHUNKS * CHUNK_BYTES * 2} bytes",
+            )
+            self.loop.run_until_complete(recognizer.set_locale("en_US"))
+            self.assertEqual(recognizer.locale, "en_US")
+            self.wait_ready(recognizer)
+            decoded_str, _, _, _ = self.utterance(recognizer)
+            self.assertEqual(
+                decoded_str,
+                f"{self.CHUNKS} chunks, {self.CHUNKS * CHUNK_BYTES} bytes",
+            )
+        finally:
+            recognizer.stop()
+
+    def test_crash(self):
+        recognizer = Recognizer("fr_FR", crashing_recognizer_main)
+        try:
+            self.wait_ready(recognizer)
+            result = self.loop.run_until_complete(recognizer.recognize())
+            self.assertEqual(result, NOT_RECOGNIZED)
+            # Worker was restarted
+            self.assertTrue(recognizer.process.is_alive())
+        finally:
+            recognizer.stop()
+
+    def test_timeout(self):
+        recognizer = Recognizer("fr_FR", hanging_recognizer_main)
+        recognizer.TIMEOUT = 0.5
+        try:
+            self.wait_ready(recognizer)
+            process = recognizer.process
+            result = self.loop.run_until_complete(recognizer.recognize())
+            self.assertEqual(result, NOT_RECOGNIZED)
+            self.assertIsNot(recognizer.process, process)
+        finally:
+            recognizer.stop()
+
+    def test_loading(self):
+        recognizer = Recognizer("fr_FR", loading_recognizer_main)
+        try:
+            process = recognizer.process
+            result = self.loop.run_until_complete(recognizer.recognize())
+            self.assertEqual(result, NOT_RECOGNIZED)
+            # Worker is not restarted while loading models
+            self.assertIs(recognizer.process, process)
+            recognizer.started -= Recognizer.LOAD_TIMEOUT
+            self.loop.run_until_complete(recognizer.recognize())
+            self.assertIsNot(recognizer.process, process)
+        finally:
+            recognizer.stop()
+
+    def test_models(self):
+        self.assertEqual(Recognizer.models("en_GB"), ("en_GB", "en_GB"))
+        self.assertEqual(Recognizer.models("de_DE"), ("fr_FR", "fr_FR"))
@@ -0,0 +1,80 @@
+import unittest
+
+from nabd.registry import ResourceRegistry, UnknownResource, resource_hash
+
+CHOREOGRAPHY = "data:application/x-nabaztag-mtl-choreography;base64,AAEHAA=="
+
+
+class TestResourceRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = ResourceRegistry()
+        self.animation = {"tempo": 25, "colors": [{"left": "ffff00"}]}
+
+    def test_hash(self):
+        self.assertEqual(
+            resource_hash(self.animation),
+            resource_hash({"colors": [{"left": "ffff00"}], "tempo": 25}),
+        )
+        self.assertTrue(resource_hash(CHOREOGRAPHY).startswith("sha256:"))
+
+    def test_register(self):
+        key = self.registry.register(self.animation)
+        self.assertEqual(self.registry.register(dict(self.animation)), key)
+        self.assertEqual(len(self.registry), 1)
+        self.assertIs(self.registry.get(key, dict), self.animation)
+        with self.assertRaises(UnknownResource):
+            self.registry.get(key, str)
+        with self.assertRaises(UnknownResource):
+            self.registry.get("sha256:0", dict)
+
+    def test_eviction(self):
+        first = self.registry.register({"tempo": 0, "colors": []})
+        second = self.registry.register({"tempo": 1, "colors": []})
+        self.registry.get(first, dict)
+        for tempo in range(2, ResourceRegistry.MAX_ENTRIES + 1):
+            self.registry.register({"tempo": tempo, "colors": []})
+        self.assertEqual(len(self.registry), ResourceRegistry.MAX_ENTRIES)
+        self.registry.get(first, dict)
+        with self.assertRaises(UnknownResource):
+            self.registry.get(second, dict)
+
+    def test_check_choreography(self):
+        self.assertIsNone(ResourceRegistry.check_choreography(CHOREOGRAPHY))
+        self.assertIsNotNone(
+            ResourceRegistry.check_choreography("nabclockd/clock.chor")
+        )
+        self.assertIsNotNone(
+            ResourceRegistry.check_choreography(CHOREOGRAPHY[:-3] + "!")
+        )
+
+    def test_resolve(self):
+        animation_key = self.registry.register(self.animation)
+        choreography_key = self.registry.register(CHOREOGRAPHY)
+        packet = {
+            "type": "batch",
+            "packets": [
+                {"type": "info", "info_id": "a", "animation": animation_key},
+                {
+                    "type": "message",
+                    "signature": {"choreography": choreography_key},
+                    "body": [
+                        {"audio": ["a.mp3"], "choreography": "streaming"}
+                    ],
+                },
+            ],
+        }
+        self.registry.resolve(packet)
+        self.assertIs(packet["packets"][0]["animation"], self.animation)
+        self.assertEqual(
+            packet["packets"][1]["signature"]["choreography"], CHOREOGRAPHY
+        )
+        self.assertEqual(
+            packet["packets"][1]["body"][0]["choreography"], "streaming"
+        )
+        with self.assertRaises(UnknownResource):
+            self.registry.resolve(
+                {
+                    "type": "command",
+                    "sequence": [{"choreography": animation_key}],
+                }
+            )
@@ -1,12 +1,15 @@
 import asyncio
+import tempfile
 import unittest
+from pathlib import Path
 
 import pytest
 
 from nabd.choreography import ChoreographyInterpreter
-from nabd.i18n import Config
+from nabd.i18n import Config, invalidate_locale
 from nabd.resources import Resources
 from nabd.tests.utils import close_old_async_connections
+from nabweb import settings
 
 
 @pytest.mark.django_db(transaction=True)
@@ -16,6 +19,7 @@ class TestResources(unittest.TestCase):
         asyncio.set_event_loop(self.loop)
 
     def tearDown(self):
+        invalidate_locale()
         close_old_async_connections()
 
     def test_find_existing(self):
@@ -90,3 +94,69 @@ class TestResources(unittest.TestCase):
             task = self.loop.create_task(Resources.find("sounds", midi))
             path = self.loop.run_until_complete(task)
             self.assertNotEqual(path, None)
+
+    def test_index_invalidation(self):
+        sounds_dir = Path(settings.BASE_DIR, "nabd", "sounds")
+        with tempfile.TemporaryDirectory(dir=sounds_dir) as tmpdir:
+            tmpname = Path(tmpdir).name
+            task = self.loop.create_task(
+                Resources.find("sounds", f"{tmpname}/test.wav")
+            )
+            path = self.loop.run_until_complete(task)
+            self.assertEqual(path, None)
+            Path(tmpdir, "test.wav").write_bytes(b"")
+            task = self.loop.create_task(
+                Resources.find("sounds", f"{tmpname}/test.wav")
+            )
+            path = self.loop.run_until_complete(task)
+            self.assertEqual(path, Path(tmpdir, "test.wav"))
+            task = self.loop.create_task(
+                Resources.find("sounds", f"{tmpname}/*.wav")
+            )
+            path = self.loop.run_until_complete(task)
+            self.assertEqual(path, Path(tmpdir, "test.wav"))
+            Path(tmpdir, "test.wav").unlink()
+            task = self.loop.create_task(
+                Resources.find("sounds", f"{tmpname}/*.wav")
+            )
+            path = self.loop.run_until_complete(task)
+            self.assertEqual(path, None)
+
+    def test_index_new_app(self):
+        task = self.loop.create_task(
+            Resources.find("sounds", "nabtestd/test.wav")
+        )
+        path = self.loop.run_until_complete(task)
+        self.assertEqual(path, None)
+        with tempfile.TemporaryDirectory(dir=settings.BASE_DIR) as tmpdir:
+            # New application, then its sounds directory
+            sounds_dir = Path(tmpdir, "sounds", "nabtestd")
+            sounds_dir.mkdir(parents=True)
+            Path(sounds_dir, "test.wav").write_bytes(b"")
+            Path(sounds_dir, ".hidden.wav").write_bytes(b"")
+            task = self.loop.create_task(
+                Resources.find("sounds", "nabtestd/test.wav")
+            )
+            path = self.loop.run_until_complete(task)
+            self.assertEqual(path, Path(sounds_dir, "test.wav"))
+            # Like Path.glob, random lookups include hidden files
+            task = self.loop.create_task(
+                Resources.find("sounds", "nabtestd/.*.wav")
+            )
+            path = self.loop.run_until_complete(task)
+            self.assertEqual(path, Path(sounds_dir, ".hidden.wav"))
+
+    def test_find_after_locale_change(self):
+        task = self.loop.create_task(
+            Resources.find("sounds", "nabclockd/0/1.mp3")
+        )
+        path = self.loop.run_until_complete(task)
+        self.assertNotEqual(path, None)
+        config = Config.load()
+        config.locale = "tlh_TLH"
+        config.save()
+        task = self.loop.create_task(
+            Resources.find("sounds", "nabclockd/0/1.mp3")
+        )
+        path = self.loop.run_until_complete(task)
+        self.assertEqual(path, None)
@@ -0,0 +1,93 @@
+import asyncio
+import datetime
+import unittest
+from unittest import mock
+
+from nabd.scheduler import Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.scheduler = Scheduler()
+        self.prepared = []
+        self.prepare_delay = 0.0
+        self.due = []
+        self.scheduler.bind(self.loop, self.prepare, self.due_at)
+
+    def tearDown(self):
+        self.loop.close()
+
+    async def prepare(self, item):
+        await asyncio.sleep(self.prepare_delay)
+        self.prepared.append(item[0]["request_id"])
+
+    def due_at(self, item):
+        self.due.append((item[0]["request_id"], self.loop.time()))
+
+    def command(self, request_id, delay):
+        at = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+        return {
+            "type": "command",
+            "request_id": request_id,
+            "sequence": [],
+            "at": at.isoformat(),
+        }
+
+    def test_due(self):
+        start = self.loop.time()
+        self.scheduler.push((self.command("b", 0.2), 1))
+        self.scheduler.push((self.command("a", 0.1), 1))
+        self.assertEqual(
+            [p["request_id"] for p, _ in self.scheduler], ["a", "b"]
+        )
+        self.loop.run_until_complete(asyncio.sleep(0.3))
+        self.assertEqual(
+            [request_id for request_id, _ in self.due], ["a", "b"]
+        )
+        self.assertAlmostEqual(self.due[0][1] - start, 0.1, delta=0.05)
+        self.assertAlmostEqual(self.due[1][1] - start, 0.2, delta=0.05)
+        self.assertEqual(len(self.scheduler), 0)
+        # Too late to prepare them
+        self.assertEqual(self.prepared, [])
+
+    def test_prepare(self):
+        with mock.patch.object(Scheduler, "PREPARE_AHEAD", 0.1):
+            self.scheduler.push((self.command("a", 0.2), 1))
+            self.loop.run_until_complete(asyncio.sleep(0.15))
+            self.assertEqual(self.prepared, ["a"])
+            self.assertEqual(self.due, [])
+            self.loop.run_until_complete(asyncio.sleep(0.1))
+            self.assertEqual([request_id for request_id, _ in self.due], ["a"])
+
+    def test_remove(self):
+        self.scheduler.push((self.command("a", 0.1), 1))
+        self.scheduler.push((self.command("b", 0.1), 2))
+        removed = self.scheduler.remove(lambda item: item[1] == 2)
+        self.assertEqual([p["request_id"] for p, _ in removed], ["b"])
+        self.loop.run_until_complete(asyncio.sleep(0.2))
+        self.assertEqual([request_id for request_id, _ in self.due], ["a"])
+
+    def test_prepare_late(self):
+        self.prepare_delay = 0.2
+        with mock.patch.object(Scheduler, "PREPARE_AHEAD", 0.1):
+            self.scheduler.push((self.command("a", 0.2), 1))
+            self.loop.run_until_complete(asyncio.sleep(0.25))
+            # Item is released once prepared
+            self.assertEqual(self.due, [])
+            self.assertEqual(len(self.scheduler), 1)
+            self.loop.run_until_complete(asyncio.sleep(0.15))
+            self.assertEqual(self.prepared, ["a"])
+            self.assertEqual([request_id for request_id, _ in self.due], ["a"])
+            self.assertEqual(len(self.scheduler), 0)
+
+    def test_disown(self):
+        self.scheduler.push((self.command("a", 0.1), 1))
+        self.scheduler.push((self.command("b", 0.1), 2))
+        self.assertTrue(self.scheduler.disown(2))
+        self.assertFalse(self.scheduler.disown(3))
+        self.assertEqual([writer for _, writer in self.scheduler], [1, None])
+        self.loop.run_until_complete(asyncio.sleep(0.2))
+        self.assertEqual(
+            [request_id for request_id, _ in self.due], ["a", "b"]
+        )
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from nabd.state_file import StateFile
+
+
+class TestStateFile(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.state_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.state_dir.name, "nabd.state")
+        self.state_file = StateFile(self.path)
+        self.snapshots = 0
+        self.state_file.bind(self.loop, self.snapshot)
+
+    def tearDown(self):
+        self.loop.close()
+        self.state_dir.cleanup()
+
+    def snapshot(self):
+        self.snapshots += 1
+        return {"snapshots": self.snapshots}
+
+    def test_load(self):
+        self.assertIsNone(self.state_file.load())
+        self.state_file.save()
+        self.assertEqual(self.state_file.load(), {"snapshots": 1})
+        self.assertEqual(os.listdir(self.state_dir.name), ["nabd.state"])
+        with open(self.path, "w") as f:
+            f.write('{"snapshots":')
+        self.assertIsNone(self.state_file.load())
+        with open(self.path, "w") as f:
+            json.dump([], f)
+        self.assertIsNone(self.state_file.load())
+
+    def test_changed(self):
+        with mock.patch.object(StateFile, "SAVE_DELAY", 0.1):
+            self.state_file.changed()
+            self.state_file.changed()
+            self.assertIsNone(self.state_file.load())
+            self.loop.run_until_complete(asyncio.sleep(0.15))
+            # Changes are saved once
+            self.assertEqual(self.state_file.load(), {"snapshots": 1})
+            self.state_file.changed()
+            self.loop.run_until_complete(asyncio.sleep(0.15))
+            self.assertEqual(self.state_file.load(), {"snapshots": 2})
+
+    def test_close(self):
+        self.state_file.changed()
+        self.state_file.close()
+        self.assertEqual(self.state_file.load(), {"snapshots": 1})
+        self.assertIsNone(self.state_file.handle)
+        self.state_file.changed()
+        self.state_file.close()
+        self.assertIsNone(self.state_file.handle)
+        self.assertEqual(self.snapshots, 1)
@@ -0,0 +1,37 @@
+import unittest
+
+from nabd.subscriptions import EventSubscriptions
+
+
+class TestEventSubscriptions(unittest.TestCase):
+    def test_match(self):
+        subscriptions = EventSubscriptions()
+        subscriptions.subscribe("w1", ["button", "rfid/*"])
+        subscriptions.subscribe("w2", ["rfid/nabclockd", "asr/nabclockd"])
+        subscriptions.subscribe("w3", [])
+        self.assertEqual(subscriptions.match("button"), ("w1",))
+        self.assertEqual(subscriptions.match("ears"), ())
+        self.assertEqual(subscriptions.match("rfid/nabtaichid"), ("w1",))
+        self.assertEqual(
+            set(subscriptions.match("rfid/nabclockd")), {"w1", "w2"}
+        )
+        self.assertEqual(subscriptions.match("asr/nabclockd"), ("w2",))
+        self.assertEqual(subscriptions.match("asr/nabweatherd"), ())
+        # "rfid/*" does not match "rfid"
+        self.assertEqual(subscriptions.match("rfid"), ())
+
+    def test_update(self):
+        subscriptions = EventSubscriptions()
+        subscriptions.subscribe("w1", ["button", "button"])
+        self.assertEqual(subscriptions.match("button"), ("w1",))
+        subscriptions.subscribe("w1", ["ears"])
+        self.assertEqual(subscriptions.match("button"), ())
+        self.assertEqual(subscriptions.match("ears"), ("w1",))
+        subscriptions.subscribe("w2", ["ears"])
+        self.assertEqual(subscriptions.match("ears"), ("w1", "w2"))
+        subscriptions.unsubscribe("w1")
+        self.assertEqual(subscriptions.match("ears"), ("w2",))
+        subscriptions.unsubscribe("w2")
+        subscriptions.unsubscribe("w3")
+        self.assertEqual(subscriptions.match("ears"), ())
+        self.assertEqual(subscriptions.index, {})
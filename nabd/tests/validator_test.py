@@ -0,0 +1,174 @@
+import unittest
+
+from nabcommon.typing import ServicePacket
+from nabcommon.validator import compile_validators
+
+
+class TestValidator(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.validators = compile_validators(ServicePacket)
+
+    def validate(self, packet):
+        return self.validators[packet["type"]](packet)
+
+    def test_packet_types(self):
+        self.assertEqual(
+            set(self.validators.keys()),
+            {
+                "info",
+                "ears",
+                "command",
+                "message",
+                "batch",
+                "register",
+                "prepare",
+                "cancel",
+                "wakeup",
+                "sleep",
+                "mode",
+                "rfid_write",
+                "test",
+                "hello",
+            },
+        )
+
+    def test_valid(self):
+        self.assertIsNone(self.validate({"type": "wakeup"}))
+        self.assertIsNone(
+            self.validate(
+                {
+                    "type": "info",
+                    "info_id": "weather",
+                    "animation": {
+                        "tempo": 25,
+                        "colors": [{"left": "ffff00", "center": 3}],
+                    },
+                }
+            )
+        )
+        self.assertIsNone(
+            self.validate(
+                {
+                    "type": "message",
+                    "request_id": "test_id",
+                    "signature": {"audio": ["nabclockd/signature.mp3"]},
+                    "body": [
+                        {"audio": ["nabclockd/10/*.mp3"]},
+                        {"choreography": "urn:x-chor:streaming"},
+                        {"audio": "nabd/abort.wav"},
+                    ],
+                    "expiration": "2019-01-01T00:00:00",
+                    "cancelable": False,
+                }
+            )
+        )
+        self.assertIsNone(
+            self.validate(
+                {"type": "mode", "mode": "idle", "events": ["rfid/*"]}
+            )
+        )
+
+    def test_missing_slot(self):
+        self.assertEqual(
+            self.validate({"type": "info"}), "Missing required info_id slot"
+        )
+        self.assertEqual(
+            self.validate(
+                {"type": "info", "info_id": "a", "animation": {"tempo": 1}}
+            ),
+            "Missing required colors slot in animation",
+        )
+        self.assertEqual(
+            self.validate({"type": "cancel"}),
+            "Missing required request_id slot",
+        )
+
+    def test_invalid_slot(self):
+        self.assertEqual(
+            self.validate({"type": "ears", "left": "up"}),
+            "Invalid left slot, expected an int",
+        )
+        self.assertEqual(
+            self.validate({"type": "ears", "event": 1}),
+            "Invalid event slot, expected a bool",
+        )
+        self.assertEqual(
+            self.validate({"type": "mode", "mode": "busy"}),
+            "Invalid mode slot, expected one of 'idle', 'interactive'",
+        )
+        self.assertEqual(
+            self.validate(
+                {
+                    "type": "info",
+                    "info_id": "a",
+                    "animation": {"tempo": "fast", "colors": []},
+                }
+            ),
+            "Invalid tempo slot in animation, expected a number",
+        )
+        self.assertEqual(
+            self.validate(
+                {
+                    "type": "info",
+                    "info_id": "a",
+                    "animation": {"tempo": 1, "colors": [{}, {"left": []}]},
+                }
+            ),
+            "Invalid left slot in animation.colors[1], "
+            "expected an int or a string",
+        )
+
+    def test_command_sequence(self):
+        self.assertEqual(
+            self.validate({"type": "command", "sequence": {}}),
+            "Invalid sequence slot, expected a list or a string",
+        )
+        self.assertIsNone(
+            self.validate({"type": "command", "sequence": "prepared:1"})
+        )
+        self.assertEqual(
+            self.validate({"type": "command", "sequence": ["test.mp3"]}),
+            "Invalid sequence[0] slot, expected a dict",
+        )
+        self.assertEqual(
+            self.validate(
+                {"type": "command", "sequence": [{"choreography": 3}]}
+            ),
+            "Invalid choreography slot in sequence[0], expected a string",
+        )
+        self.assertEqual(
+            self.validate(
+                {
+                    "type": "command",
+                    "sequence": [{"audio": ["a.mp3"]}],
+                    "expiration": 0,
+                }
+            ),
+            "Invalid expiration slot, expected an ISO 8601 date string",
+        )
+
+    def test_batch(self):
+        self.assertIsNone(
+            self.validate(
+                {
+                    "type": "batch",
+                    "packets": [
+                        {"type": "info", "info_id": "weather"},
+                        {"type": "ears", "left": 3},
+                        {"type": "message", "body": []},
+                    ],
+                }
+            )
+        )
+        self.assertEqual(
+            self.validate(
+                {"type": "batch", "packets": [{"type": "ears", "left": "3"}]}
+            ),
+            "Invalid left slot in packets[0], expected an int",
+        )
+        self.assertEqual(
+            self.validate({"type": "batch", "packets": [{"type": "sleep"}]}),
+            "Invalid packets[0] slot, expected a packet of type "
+            "'info', 'ears', 'command', 'message'",
+        )
@@ -320,26 +320,26 @@ class NabMastodond(NabService, asyncio.Protocol, StreamListener):
             )
         else:
             return
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     async def send_start_listening_to_ears(self):
         if self.listening_to_ears is False:
             packet = '{"type":"mode","mode":"idle","events":["ears"]}\r\n'
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
             await self.writer.drain()
             self.listening_to_ears = True
 
     async def send_stop_listening_to_ears(self):
         if self.listening_to_ears:
             packet = '{"type":"mode","mode":"idle","events":[]}\r\n'
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
             await self.writer.drain()
             self.listening_to_ears = False
 
     async def send_ears(self, left_ear, right_ear):
         packet = f'{{"type":"ears","left":{left_ear},"right":{right_ear}}}\r\n'
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     @staticmethod
@@ -24,7 +24,7 @@ class NabRadio(NabService):
             f'"body":[{{"audio":["{streaming_url}"]}}],'
             f'"expiration":"{expiration.isoformat()}"}}\r\n'
         )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     async def process_nabd_packet(self, packet):
@@ -66,7 +66,7 @@ class NabSurprised(NabRandomService):
             f'"body":[{{"audio":["{path}"]}}],'
             f'"expiration":"{expiration.isoformat()}"}}\r\n'
         )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     def compute_random_delta(self, frequency):
@@ -28,7 +28,7 @@ class NabTaichid(NabRandomService):
             '"sequence":[{"choreography":"nabtaichid/taichi.chor"}],'
             '"expiration":"' + expiration.isoformat() + '"}\r\n'
         )
-        self.writer.write(packet.encode("utf8"))
+        self.write_packet(packet)
         await self.writer.drain()
 
     def compute_random_delta(self, frequency):
@@ -478,7 +478,7 @@ class NabWeatherd(NabInfoService):
                 )
             else:
                 packet = '{"type":"info",' '"info_id":"nabweatherd_rain"}\r\n'
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
 
         # Weather
         if (info_data["weather_animation_type"] == "weather_and_rain") or (
@@ -488,7 +488,7 @@ class NabWeatherd(NabInfoService):
             # si weather on supprime l'animation rain
             if info_data["weather_animation_type"] == "weather_only":
                 packet = '{"type":"info",' '"info_id":"nabweatherd_rain"}\r\n'
-                self.writer.write(packet.encode("utf8"))
+                self.write_packet(packet)
 
             (weather_class, info_animation) = NabWeatherd.WEATHER_CLASSES[
                 info_data["today_forecast_weather_class"]
@@ -498,7 +498,7 @@ class NabWeatherd(NabInfoService):
         if info_data["weather_animation_type"] == "nothing":
             # Return mais avant on supprime l'animation rain
             packet = '{"type":"info",' '"info_id":"nabweatherd_rain"}\r\n'
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
             logging.debug("get_animation: no visual information")
             return None
 
@@ -520,7 +520,7 @@ class NabWeatherd(NabInfoService):
                 '"body":[{"audio":["nabweatherd/no-location-error.mp3"]}],'
                 '"expiration":"' + expiration.isoformat() + '"}\r\n'
             )
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
         elif info_data is None:
             logging.debug("No data available")
             packet = (
@@ -530,7 +530,7 @@ class NabWeatherd(NabInfoService):
                 '"body":[{"audio":["nabweatherd/no-data-error.mp3"]}],'
                 '"expiration":"' + expiration.isoformat() + '"}\r\n'
             )
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
         else:
             if type == "today":
                 (weather_class, info_animation) = NabWeatherd.WEATHER_CLASSES[
@@ -559,7 +559,7 @@ class NabWeatherd(NabInfoService):
                 '"nabweatherd/' + unit_sound_file + '"]}],'
                 '"expiration":"' + expiration.isoformat() + '"}\r\n'
             )
-            self.writer.write(packet.encode("utf8"))
+            self.write_packet(packet)
         await self.writer.drain()
 
     async def _do_perform(self, type):
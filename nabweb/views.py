@@ -24,7 +24,7 @@ from nabd.i18n import Config
 
 class NabdConnection:
     async def __aenter__(self):
-        conn = asyncio.open_connection(NabService.HOST, NabService.PORT_NUMBER)
+        conn = NabService.open_connection()
         self.reader, self.writer = await asyncio.wait_for(conn, 0.5)
         return self
 